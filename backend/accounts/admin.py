@@ -6,7 +6,7 @@ from .models import APIKey, Organization, User
 
 @admin.register(Organization)
 class OrganizationAdmin(admin.ModelAdmin):
-    list_display = ['name', 'member_count', 'created_at']
+    list_display = ['name', 'member_count', 'send_weight', 'max_in_flight', 'ingest_rate_limit', 'created_at']
     search_fields = ['name']
     readonly_fields = ['created_at']
 
@@ -27,6 +27,6 @@ class CustomUserAdmin(UserAdmin):
 
 @admin.register(APIKey)
 class APIKeyAdmin(admin.ModelAdmin):
-    list_display = ['name', 'prefix', 'user', 'is_active', 'last_used_at', 'created_at']
+    list_display = ['name', 'prefix', 'user', 'is_active', 'rate_limit', 'last_used_at', 'request_count', 'created_at']
     list_filter = ['is_active']
-    readonly_fields = ['key', 'prefix', 'created_at']
+    readonly_fields = ['key', 'prefix', 'last_used_at', 'request_count', 'created_at']
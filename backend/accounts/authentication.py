@@ -1,10 +1,41 @@
 import hashlib
 
-from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
 from rest_framework.authentication import BaseAuthentication
 from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
 
-from .models import APIKey
+from .cache import api_key_cache, user_cache
+from .usage import usage_tracker
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    simplejwt's JWTAuthentication, but the token's user (with organization
+    id and role) comes from accounts/cache.py instead of a query per request.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_('Token contained no recognizable user identification')) from e
+
+        user = user_cache.get(user_id)
+        if user is None:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+
+        return user
 
 
 class APIKeyAuthentication(BaseAuthentication):
@@ -14,15 +45,12 @@ class APIKeyAuthentication(BaseAuthentication):
             return None
 
         key_hash = hashlib.sha256(api_key.encode()).hexdigest()
-        try:
-            api_key_obj = APIKey.objects.select_related('user').get(
-                key=key_hash,
-                is_active=True
-            )
-        except APIKey.DoesNotExist:
+        api_key_obj = api_key_cache.get(key_hash)
+        if api_key_obj is None:
             raise AuthenticationFailed('Invalid or inactive API key.')
 
-        APIKey.objects.filter(pk=api_key_obj.pk).update(last_used_at=timezone.now())
+        # last_used_at and request_count are written in bulk (accounts/usage.py)
+        usage_tracker.record(api_key_obj.pk)
 
         return (api_key_obj.user, api_key_obj)
 
@@ -0,0 +1,28 @@
+from django.db import transaction
+from django.db.models import Max, Min, OuterRef, Subquery
+
+
+def backfill_organization(model, user_model, batch_size=10000) -> int:
+    """
+    Copy each row's user.organization_id onto its own organization column,
+    one primary-key range per transaction so large tables are never locked
+    as a whole. Rows that already have an organization are left alone.
+    Works with both live and migration (historical) models.
+    """
+    manager = model._default_manager
+    bounds = manager.aggregate(lo=Min('pk'), hi=Max('pk'))
+    if bounds['lo'] is None:
+        return 0
+
+    organization_of_user = Subquery(
+        user_model._default_manager.filter(pk=OuterRef('user_id')).values('organization_id')[:1]
+    )
+    updated = 0
+    for start in range(bounds['lo'], bounds['hi'] + 1, batch_size):
+        with transaction.atomic():
+            updated += manager.filter(
+                pk__gte=start,
+                pk__lt=start + batch_size,
+                organization__isnull=True,
+            ).update(organization_id=organization_of_user)
+    return updated
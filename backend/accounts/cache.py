@@ -0,0 +1,147 @@
+"""
+In-process caches for request authentication.
+
+APIKeyCache maps a key hash to the active APIKey with its user loaded, and
+UserCache maps a JWT's user id to the User with its organization loaded,
+so a warm process authenticates without a query. Each process keeps its
+own bounded LRU with a short TTL, and a per-entry version counter in the
+shared Django cache (Redis) lets a change in any process (a deactivated
+or deleted key, an edited user) invalidate the entry everywhere.
+"""
+import copy
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+
+class VersionedCache(ABC):
+    version_key = None
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    @abstractmethod
+    def ttl(self) -> int:
+        """Seconds an entry is trusted, read per call so settings overrides apply."""
+
+    @property
+    @abstractmethod
+    def max_size(self) -> int:
+        """Entries kept before the least recently used are evicted."""
+
+    @abstractmethod
+    def load(self, key):
+        """Load the object for `key` from the database, or None."""
+
+    def get(self, key):
+        version = self._get_version(key)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and version is not None and entry[1] == version and entry[2] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        obj = self.load(key)
+        if obj is None or version is None:
+            return obj
+        with self._lock:
+            self._entries[key] = (obj, version, now + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return obj
+
+    def invalidate(self, keys):
+        """Drop these entries here and in every other process."""
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+        for key in keys:
+            try:
+                cache.add(self.version_key.format(key=key), 0, timeout=None)
+                cache.incr(self.version_key.format(key=key))
+            except Exception as exc:
+                logger.warning(f"Could not bump {type(self).__name__} version: {exc}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def _get_version(self, key):
+        # None means the shared counter is unreachable: go to the database
+        # and skip caching rather than trust a possibly revoked entry.
+        try:
+            return cache.get(self.version_key.format(key=key), 0)
+        except Exception as exc:
+            logger.warning(f"{type(self).__name__} version lookup failed: {exc}")
+            return None
+
+
+class APIKeyCache(VersionedCache):
+    version_key = 'accounts:api-key-version:{key}'
+
+    @property
+    def ttl(self) -> int:
+        return settings.API_KEY_CACHE_TTL
+
+    @property
+    def max_size(self) -> int:
+        return settings.API_KEY_CACHE_MAX_SIZE
+
+    def load(self, key_hash: str):
+        """Return the active APIKey (with `user` and `organization` loaded) for this hash."""
+        from .models import APIKey
+
+        return APIKey.objects.select_related('user', 'organization').filter(key=key_hash, is_active=True).first()
+
+    def get(self, key_hash: str):
+        # The key becomes request.auth and its user request.user; a shallow
+        # copy would still share the cached user, so that is copied too
+        api_key = super().get(key_hash)
+        if api_key is None:
+            return None
+        api_key = copy.copy(api_key)
+        api_key.user = copy.copy(api_key.user)
+        return api_key
+
+
+class UserCache(VersionedCache):
+    version_key = 'accounts:user-version:{key}'
+
+    @property
+    def ttl(self) -> int:
+        return settings.USER_CACHE_TTL
+
+    @property
+    def max_size(self) -> int:
+        return settings.USER_CACHE_MAX_SIZE
+
+    def load(self, user_id):
+        from .models import User
+
+        return User.objects.select_related('organization').filter(pk=user_id).first()
+
+    def get(self, user_id):
+        # Views may modify request.user, so each request gets its own copy
+        user = super().get(user_id)
+        return copy.copy(user) if user is not None else None
+
+
+api_key_cache = APIKeyCache()
+user_cache = UserCache()
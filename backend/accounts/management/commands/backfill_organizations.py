@@ -0,0 +1,27 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from accounts.backfill import backfill_organization
+from accounts.models import APIKey
+from brand_components.models import BrandComponent
+from events.models import Event
+from integrations.models import SESIntegration
+from logs.models import EmailLog
+from templates_app.models import EmailTemplate
+
+User = get_user_model()
+
+MODELS = [APIKey, BrandComponent, EmailTemplate, SESIntegration, Event, EmailLog]
+
+
+class Command(BaseCommand):
+    help = 'Fill the denormalized organization column on tenant-scoped tables from their owning user'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        for model in MODELS:
+            updated = backfill_organization(model, User, batch_size=options['batch_size'])
+            self.stdout.write(f'{model._meta.label}: {updated} rows updated')
+        self.stdout.write(self.style.SUCCESS('Done.'))
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.15 on 2026-10-17 11:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_organization(apps, schema_editor):
+    from accounts.backfill import backfill_organization as backfill
+
+    backfill(apps.get_model('accounts', 'APIKey'), apps.get_model('accounts', 'User'))
+
+
+class Migration(migrations.Migration):
+    # Backfill commits per batch
+    atomic = False
+
+    dependencies = [
+        ('accounts', '0007_bootstrap_eximpe_org'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='apikey',
+            name='organization',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='api_keys', to='accounts.organization'),
+        ),
+        migrations.AddIndex(
+            model_name='apikey',
+            index=models.Index(fields=['organization', '-created_at'], name='accounts_ap_organiz_d9266a_idx'),
+        ),
+        migrations.RunPython(backfill_organization, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-17 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_apikey_organization_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='apikey',
+            name='request_count',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
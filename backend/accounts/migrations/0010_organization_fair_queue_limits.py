@@ -0,0 +1,23 @@
+# Generated by Django 5.1.15 on 2026-10-17 16:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0009_apikey_request_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='organization',
+            name='max_in_flight',
+            field=models.PositiveIntegerField(blank=True, help_text='Unfinished sends allowed at once; blank uses FAIR_QUEUE_MAX_IN_FLIGHT.', null=True),
+        ),
+        migrations.AddField(
+            model_name='organization',
+            name='send_weight',
+            field=models.PositiveSmallIntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.15 on 2026-10-17 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0010_organization_fair_queue_limits'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='apikey',
+            name='rate_limit',
+            field=models.PositiveIntegerField(blank=True, help_text='Blank uses INGEST_RATE_LIMIT_PER_KEY; 0 means unlimited.', null=True),
+        ),
+        migrations.AddField(
+            model_name='organization',
+            name='ingest_rate_limit',
+            field=models.PositiveIntegerField(blank=True, help_text='Blank uses INGEST_RATE_LIMIT_PER_ORG; 0 means unlimited.', null=True),
+        ),
+    ]
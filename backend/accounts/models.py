@@ -10,6 +10,15 @@ from django.utils import timezone
 
 class Organization(models.Model):
     name = models.CharField(max_length=255, unique=True)
+    # Fair-queue share of send capacity (events/fair_queue.py)
+    send_weight = models.PositiveSmallIntegerField(default=1)
+    max_in_flight = models.PositiveIntegerField(
+        null=True, blank=True, help_text='Unfinished sends allowed at once; blank uses FAIR_QUEUE_MAX_IN_FLIGHT.',
+    )
+    # Trigger calls per INGEST_RATE_LIMIT_PERIOD across all keys (accounts/ratelimit.py)
+    ingest_rate_limit = models.PositiveIntegerField(
+        null=True, blank=True, help_text='Blank uses INGEST_RATE_LIMIT_PER_ORG; 0 means unlimited.',
+    )
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -49,6 +58,13 @@ class APIKey(models.Model):
     prefix = models.CharField(max_length=8)
     name = models.CharField(max_length=255)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='api_keys')
+    organization = models.ForeignKey(
+        Organization,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='api_keys',
+    )
     environment = models.CharField(
         max_length=20,
         choices=ENVIRONMENT_CHOICES,
@@ -57,14 +73,27 @@ class APIKey(models.Model):
     )
     is_active = models.BooleanField(default=True)
     last_used_at = models.DateTimeField(null=True, blank=True)
+    request_count = models.BigIntegerField(default=0)
+    # Trigger calls per INGEST_RATE_LIMIT_PERIOD (accounts/ratelimit.py)
+    rate_limit = models.PositiveIntegerField(
+        null=True, blank=True, help_text='Blank uses INGEST_RATE_LIMIT_PER_KEY; 0 means unlimited.',
+    )
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['organization', '-created_at']),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.prefix}...)"
 
+    def save(self, *args, **kwargs):
+        if self.organization_id is None:
+            self.organization_id = self.user.organization_id
+        super().save(*args, **kwargs)
+
     @classmethod
     def generate_key(cls):
         return secrets.token_urlsafe(48)
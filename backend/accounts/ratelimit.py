@@ -0,0 +1,210 @@
+"""
+Ingest rate limits for API-key trigger calls.
+
+Each API key and each organization has a GCRA bucket (a "theoretical
+arrival time" per scope): a limit of N requests per INGEST_RATE_LIMIT_PERIOD
+lets a client burst up to N at once and then refill at N per period. A
+request is admitted only when every scope has room, and is then charged to
+all of them, so a key cannot use more than its own limit nor more than its
+organization's share. A batch trigger costs one unit per item; a batch
+larger than the smallest limit could never be admitted and is rejected with
+400 instead of 429.
+
+Limits come from `APIKey.rate_limit` and `Organization.ingest_rate_limit`,
+falling back to INGEST_RATE_LIMIT_PER_KEY / INGEST_RATE_LIMIT_PER_ORG; 0
+turns a scope off. Both arrive with the cached API key, so the only extra
+work per request is one Redis script call that checks and charges every
+scope atomically. If Redis is unreachable the request is let through.
+MemoryRateLimiter stands in for tests.
+"""
+import logging
+import math
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from rest_framework.exceptions import ValidationError
+from rest_framework.throttling import BaseThrottle
+
+logger = logging.getLogger(__name__)
+
+BUCKET_KEY = 'ratelimit:{scope}:{id}'
+EPSILON = 1e-6
+
+# `remaining` and `reset` describe the scope closest to its limit (or, when
+# refused, the one that has to wait longest); `retry_after` is 0 if allowed.
+RateLimit = namedtuple('RateLimit', ['allowed', 'scope', 'limit', 'remaining', 'retry_after', 'reset'])
+
+# KEYS: one bucket per scope
+# ARGV: cost, period, then the emission interval of each scope
+# Returns the current time and each bucket's arrival time before the call
+HIT_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local cost = tonumber(ARGV[1])
+local period = tonumber(ARGV[2])
+
+local allowed = 1
+local tats = {}
+local result = {tostring(now)}
+for i, key in ipairs(KEYS) do
+    local tat = math.max(tonumber(redis.call('GET', key)) or now, now)
+    tats[i] = tat + tonumber(ARGV[i + 2]) * cost
+    if tats[i] - now > period + 0.000001 then
+        allowed = 0
+    end
+    result[i + 1] = tostring(tat)
+end
+if allowed == 1 then
+    for i, key in ipairs(KEYS) do
+        redis.call('SET', key, tostring(tats[i]), 'PX', math.ceil((tats[i] - now) * 1000))
+    end
+end
+return result
+"""
+
+
+def ingest_scopes(api_key) -> list[tuple[str, str, int]]:
+    """(scope, bucket key, limit) for every limited scope of an API key."""
+    scopes = []
+    key_limit = api_key.rate_limit
+    if key_limit is None:
+        key_limit = settings.INGEST_RATE_LIMIT_PER_KEY
+    if key_limit:
+        scopes.append(('key', BUCKET_KEY.format(scope='key', id=api_key.pk), key_limit))
+
+    organization = api_key.organization
+    if organization is not None:
+        org_limit = organization.ingest_rate_limit
+        if org_limit is None:
+            org_limit = settings.INGEST_RATE_LIMIT_PER_ORG
+        if org_limit:
+            scopes.append(('organization', BUCKET_KEY.format(scope='org', id=organization.pk), org_limit))
+    return scopes
+
+
+def _decide(scopes, now: float, tats: list[float], cost: int, period: float) -> RateLimit:
+    states = []
+    for (scope, _, limit), tat in zip(scopes, tats):
+        interval = period / limit
+        new_tat = tat + interval * cost
+        states.append((scope, limit, interval, tat, new_tat, max(0.0, new_tat - now - period)))
+    allowed = all(over <= EPSILON for *_, over in states)
+
+    reports = []
+    for scope, limit, interval, tat, new_tat, over in states:
+        after = new_tat if allowed else tat
+        remaining = max(0, int((period - (after - now)) / interval + EPSILON))
+        reports.append(RateLimit(allowed, scope, limit, remaining, 0.0 if allowed else over, after - now))
+    if allowed:
+        return min(reports, key=lambda r: r.remaining)
+    return max(reports, key=lambda r: r.retry_after)
+
+
+class RedisRateLimiter:
+    def __init__(self):
+        self._hit = None
+
+    def hit(self, scopes, cost: int = 1) -> RateLimit:
+        from xyno.redis import get_redis
+
+        if self._hit is None:
+            self._hit = get_redis().register_script(HIT_SCRIPT)
+        period = settings.INGEST_RATE_LIMIT_PERIOD
+        now, *tats = self._hit(
+            keys=[bucket for _, bucket, _ in scopes],
+            args=[cost, period, *[period / limit for _, _, limit in scopes]],
+        )
+        return _decide(scopes, float(now), [float(tat) for tat in tats], cost, period)
+
+
+class MemoryRateLimiter:
+    def __init__(self):
+        self._tats = {}
+        self._lock = threading.Lock()
+        self.clock = time.time
+
+    def hit(self, scopes, cost: int = 1) -> RateLimit:
+        period = settings.INGEST_RATE_LIMIT_PERIOD
+        with self._lock:
+            now = self.clock()
+            tats = [max(self._tats.get(bucket, now), now) for _, bucket, _ in scopes]
+            decision = _decide(scopes, now, tats, cost, period)
+            if decision.allowed:
+                for (_, bucket, limit), tat in zip(scopes, tats):
+                    self._tats[bucket] = tat + period / limit * cost
+            return decision
+
+    def clear(self):
+        with self._lock:
+            self._tats.clear()
+        self.clock = time.time
+
+
+_limiters = {}
+
+
+def get_rate_limiter():
+    backend = settings.INGEST_RATE_LIMIT_BACKEND
+    if backend not in _limiters:
+        _limiters[backend] = MemoryRateLimiter() if backend == 'memory' else RedisRateLimiter()
+    return _limiters[backend]
+
+
+class IngestRateThrottle(BaseThrottle):
+    """
+    Throttle for API-key authenticated views. A view may define
+    `get_rate_limit_cost(request)`; the default cost is 1. The decision is
+    kept on `request.rate_limit` for IngestRateLimitMixin's headers.
+    """
+
+    def __init__(self):
+        self._wait = None
+
+    def allow_request(self, request, view):
+        from .models import APIKey
+
+        if not settings.INGEST_RATE_LIMIT_ENABLED or not isinstance(request.auth, APIKey):
+            return True
+        scopes = ingest_scopes(request.auth)
+        if not scopes:
+            return True
+
+        get_cost = getattr(view, 'get_rate_limit_cost', None)
+        cost = max(1, get_cost(request)) if get_cost else 1
+        limit = min(limit for _, _, limit in scopes)
+        if cost > limit:
+            # Would never fit, so it is a bad request rather than one to retry later
+            raise ValidationError({
+                'items': [f'Batch of {cost} items exceeds the rate limit of {limit} '
+                          f'per {settings.INGEST_RATE_LIMIT_PERIOD} seconds.'],
+            })
+
+        try:
+            decision = get_rate_limiter().hit(scopes, cost)
+        except Exception as exc:
+            logger.warning(f"Rate limit check failed for API key {request.auth.pk}, allowing request: {exc}")
+            return True
+        request.rate_limit = decision
+        self._wait = decision.retry_after
+        return decision.allowed
+
+    def wait(self):
+        return self._wait
+
+
+class IngestRateLimitMixin:
+    """Rate limits an APIView per API key and organization and reports X-RateLimit-* headers."""
+
+    throttle_classes = [IngestRateThrottle]
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        decision = getattr(request, 'rate_limit', None)
+        if decision is not None:
+            response['X-RateLimit-Limit'] = str(decision.limit)
+            response['X-RateLimit-Remaining'] = str(decision.remaining)
+            response['X-RateLimit-Reset'] = str(math.ceil(decision.reset - EPSILON))
+            response['X-RateLimit-Scope'] = decision.scope
+        return response
@@ -108,11 +108,19 @@ class ResetPasswordSerializer(serializers.Serializer):
 class APIKeyCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = APIKey
-        fields = ['id', 'name', 'prefix', 'environment', 'is_active', 'last_used_at', 'created_at']
-        read_only_fields = ['id', 'prefix', 'is_active', 'last_used_at', 'created_at']
+        fields = [
+            'id', 'name', 'prefix', 'environment', 'is_active', 'rate_limit', 'last_used_at', 'request_count',
+            'created_at',
+        ]
+        read_only_fields = [
+            'id', 'prefix', 'is_active', 'rate_limit', 'last_used_at', 'request_count', 'created_at',
+        ]
 
 
 class APIKeyListSerializer(serializers.ModelSerializer):
     class Meta:
         model = APIKey
-        fields = ['id', 'name', 'prefix', 'environment', 'is_active', 'last_used_at', 'created_at']
+        fields = [
+            'id', 'name', 'prefix', 'environment', 'is_active', 'rate_limit', 'last_used_at', 'request_count',
+            'created_at',
+        ]
@@ -0,0 +1,50 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import api_key_cache, user_cache
+from .models import APIKey, Organization, User
+
+
+@receiver(post_save, sender=APIKey)
+@receiver(post_delete, sender=APIKey)
+def invalidate_api_key(sender, instance, **kwargs):
+    _invalidate(api_key_cache, [instance.key])
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user(sender, instance, created=False, **kwargs):
+    """
+    Drop the cached user and the cached keys that carry it, e.g. after a
+    role or organization change through UserManagementViewSet.
+    """
+    if created:
+        return
+    update_fields = kwargs.get('update_fields')
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    _invalidate(user_cache, [instance.pk])
+    key_hashes = list(APIKey.objects.filter(user_id=instance.pk).values_list('key', flat=True))
+    if key_hashes:
+        _invalidate(api_key_cache, key_hashes)
+
+
+@receiver(post_save, sender=Organization)
+def invalidate_organization_members(sender, instance, created=False, **kwargs):
+    """Cached users and API keys carry their organization."""
+    if created:
+        return
+    member_ids = list(User.objects.filter(organization_id=instance.pk).values_list('pk', flat=True))
+    if member_ids:
+        _invalidate(user_cache, member_ids)
+    key_hashes = list(APIKey.objects.filter(organization_id=instance.pk).values_list('key', flat=True))
+    if key_hashes:
+        _invalidate(api_key_cache, key_hashes)
+
+
+def _invalidate(cache, keys):
+    cache.invalidate(keys)
+    # Bump again once the write is visible, so a reader that raced the
+    # transaction cannot keep the old row cached under the new version.
+    transaction.on_commit(lambda: cache.invalidate(keys))
@@ -0,0 +1,99 @@
+"""
+Coalesced API key usage writes.
+
+Authenticating used to run `UPDATE ... SET last_used_at` on every request,
+so a busy key meant one write per request on a single hot row. The tracker
+keeps the latest use time and a request count per key in memory and flushes
+all keys with one UPDATE every API_KEY_USAGE_FLUSH_INTERVAL seconds, from a
+background thread in each process. The UPDATE takes the greater of the
+stored and buffered last_used_at, so processes flushing out of order never
+move it backwards. Usage recorded in the last interval before a process is
+killed is lost; it is only bookkeeping.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Case, DateTimeField, F, IntegerField, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class APIKeyUsageTracker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._usage = {}
+        self._timer_pid = None
+
+    def record(self, api_key_id: int):
+        now = timezone.now()
+        with self._lock:
+            entry = self._usage.get(api_key_id)
+            if entry is None:
+                self._usage[api_key_id] = [now, 1]
+            else:
+                entry[0] = now
+                entry[1] += 1
+        self._ensure_timer()
+
+    def __len__(self):
+        return len(self._usage)
+
+    def clear(self):
+        with self._lock:
+            self._usage = {}
+
+    def flush(self):
+        from .models import APIKey
+
+        with self._lock:
+            usage, self._usage = self._usage, {}
+        if not usage:
+            return
+        try:
+            APIKey.objects.filter(pk__in=list(usage)).update(
+                last_used_at=Greatest(
+                    F('last_used_at'),
+                    Case(*[When(pk=pk, then=Value(used_at)) for pk, (used_at, _) in usage.items()],
+                         output_field=DateTimeField()),
+                ),
+                request_count=F('request_count') + Case(
+                    *[When(pk=pk, then=Value(count)) for pk, (_, count) in usage.items()],
+                    default=Value(0), output_field=IntegerField(),
+                ),
+            )
+        except Exception:
+            logger.exception(f"API key usage flush failed; keeping {len(usage)} keys for the next attempt")
+            with self._lock:
+                for pk, (used_at, count) in usage.items():
+                    entry = self._usage.setdefault(pk, [used_at, 0])
+                    entry[0] = max(entry[0], used_at)
+                    entry[1] += count
+
+    def _ensure_timer(self):
+        # Threads do not survive a fork, so each worker process starts its own
+        pid = os.getpid()
+        if self._timer_pid == pid:
+            return
+        with self._lock:
+            if self._timer_pid == pid:
+                return
+            self._timer_pid = pid
+        threading.Thread(target=self._run_timer, name='api-key-usage', daemon=True).start()
+
+    def _run_timer(self):
+        while True:
+            time.sleep(settings.API_KEY_USAGE_FLUSH_INTERVAL)
+            if self._usage:
+                close_old_connections()
+                self.flush()
+
+
+usage_tracker = APIKeyUsageTracker()
+atexit.register(usage_tracker.flush)
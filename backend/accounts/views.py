@@ -108,7 +108,7 @@ class APIKeyViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return APIKey.objects.filter(user__organization=self.request.user.organization)
+        return APIKey.objects.filter(organization_id=self.request.user.organization_id)
 
     def get_serializer_class(self):
         if self.action == 'create':
@@ -162,7 +162,7 @@ class UserManagementViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         return User.objects.filter(
-            organization=self.request.user.organization
+            organization_id=self.request.user.organization_id
         ).exclude(id=self.request.user.id).order_by('created_at')
 
 
@@ -190,7 +190,7 @@ class InviteUserView(APIView):
             last_name=data['last_name'],
             phone=data.get('phone', ''),
             role=data['role'],
-            organization=request.user.organization,
+            organization_id=request.user.organization_id,
             is_active=False,
         )
         invited_user.set_unusable_password()
@@ -337,7 +337,7 @@ class ForgotPasswordView(APIView):
         ses = PlatformSESConfig.objects.filter(is_active=True).first()
         if not ses:
             ses = SESIntegration.objects.filter(
-                user__organization=user.organization,
+                organization_id=user.organization_id,
                 environment='sandbox',
                 is_active=True,
                 is_verified=True,
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.15 on 2026-10-17 11:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_organization(apps, schema_editor):
+    from accounts.backfill import backfill_organization as backfill
+
+    backfill(apps.get_model('brand_components', 'BrandComponent'), apps.get_model('accounts', 'User'))
+
+
+class Migration(migrations.Migration):
+    # Backfill commits per batch
+    atomic = False
+
+    dependencies = [
+        ('accounts', '0008_apikey_organization_and_more'),
+        ('brand_components', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='brandcomponent',
+            name='organization',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='brand_components', to='accounts.organization'),
+        ),
+        migrations.AddIndex(
+            model_name='brandcomponent',
+            index=models.Index(fields=['organization', '-updated_at'], name='brand_compo_organiz_4f60c5_idx'),
+        ),
+        migrations.RunPython(backfill_organization, migrations.RunPython.noop),
+    ]
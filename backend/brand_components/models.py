@@ -31,6 +31,13 @@ class BrandComponent(models.Model):
         on_delete=models.CASCADE,
         related_name='brand_components',
     )
+    organization = models.ForeignKey(
+        'accounts.Organization',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='brand_components',
+    )
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -38,6 +45,14 @@ class BrandComponent(models.Model):
     class Meta:
         ordering = ['-updated_at']
         unique_together = ['user', 'name']
+        indexes = [
+            models.Index(fields=['organization', '-updated_at']),
+        ]
 
     def __str__(self):
         return f'{self.name} ({self.get_category_display()})'
+
+    def save(self, *args, **kwargs):
+        if self.organization_id is None:
+            self.organization_id = self.user.organization_id
+        super().save(*args, **kwargs)
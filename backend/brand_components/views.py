@@ -9,7 +9,7 @@ class BrandComponentViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        qs = BrandComponent.objects.filter(user__organization=self.request.user.organization)
+        qs = BrandComponent.objects.filter(organization_id=self.request.user.organization_id)
         category = self.request.query_params.get('category')
         if category:
             qs = qs.filter(category=category)
@@ -1,10 +1,32 @@
 from django.contrib import admin
 
-from .models import Event
+from .models import Event, OutboxMessage, ScheduledSend, SendJob
 
 
 @admin.register(Event)
 class EventAdmin(admin.ModelAdmin):
-    list_display = ['name', 'slug', 'user', 'template', 'integration', 'is_active', 'created_at']
-    list_filter = ['is_active']
+    list_display = ['name', 'slug', 'user', 'template', 'integration', 'lane', 'is_active', 'created_at']
+    list_filter = ['is_active', 'lane']
     readonly_fields = ['slug', 'created_at', 'updated_at']
+
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = ['task_id', 'task_name', 'created_at', 'dispatched_at', 'failed_at']
+    list_filter = ['dispatched_at', 'failed_at']
+    readonly_fields = ['task_id', 'task_name', 'kwargs', 'created_at', 'dispatched_at', 'failed_at', 'error']
+
+
+@admin.register(SendJob)
+class SendJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'event', 'organization', 'environment', 'status', 'rows_processed', 'created_at']
+    list_filter = ['status', 'environment']
+    readonly_fields = ['rows_processed', 'progress', 'errors', 'created_at', 'started_at', 'finished_at']
+
+
+@admin.register(ScheduledSend)
+class ScheduledSendAdmin(admin.ModelAdmin):
+    list_display = ['task_id', 'event', 'organization', 'recipient', 'send_at', 'status']
+    list_filter = ['status', 'environment']
+    search_fields = ['task_id', 'recipient']
+    readonly_fields = ['task_id', 'kwargs', 'bucket', 'error', 'created_at', 'dispatched_at']
@@ -0,0 +1,133 @@
+"""
+In-process cache for resolving trigger slugs to active events.
+
+Entries are keyed by (organization_id, slug, environment) and hold the Event
+with its template and integration already loaded. Each process keeps its own
+bounded LRU; a per-organization version counter in the shared Django cache
+(Redis) lets a write in any process invalidate entries everywhere.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'events:resolution-version:{org_id}'
+
+
+def _version_key(org_id) -> str:
+    return VERSION_KEY.format(org_id=org_id)
+
+
+class EventResolutionCache:
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def max_size(self) -> int:
+        return settings.EVENT_CACHE_MAX_SIZE
+
+    @property
+    def ttl(self) -> int:
+        return settings.EVENT_CACHE_TTL
+
+    def get(self, org_id, slug: str, environment: str):
+        """Return the active Event for this slug, or None if there is none."""
+        return self.get_many(org_id, [slug], environment).get(slug)
+
+    def get_many(self, org_id, slugs, environment: str) -> dict:
+        """
+        Resolve several slugs at once. Cached entries are served locally and
+        all misses are loaded with a single query. Returns {slug: Event} for
+        the slugs that resolve to an active event.
+        """
+        from .models import Event
+
+        version = self._get_version(org_id)
+        now = time.monotonic()
+        found = {}
+        missing = []
+
+        with self._lock:
+            for slug in set(slugs):
+                key = (org_id, slug, environment)
+                entry = self._entries.get(key)
+                if entry and version is not None and entry[1] == version and entry[2] > now:
+                    self._entries.move_to_end(key)
+                    found[slug] = entry[0]
+                    self.hits += 1
+                else:
+                    missing.append(slug)
+                    self.misses += 1
+
+        if not missing:
+            return found
+
+        loaded = Event.objects.select_related('template', 'integration').filter(
+            organization_id=org_id,
+            slug__in=missing,
+            environment=environment,
+            is_active=True,
+        )
+        expires_at = now + self.ttl
+        with self._lock:
+            for event in loaded:
+                found[event.slug] = event
+                if version is None:
+                    continue
+                key = (org_id, event.slug, environment)
+                self._entries[key] = (event, version, expires_at)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+        return found
+
+    def invalidate(self, org_id):
+        """Drop this organization's entries here and in every other process."""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == org_id]:
+                del self._entries[key]
+        try:
+            cache.add(_version_key(org_id), 0, timeout=None)
+            cache.incr(_version_key(org_id))
+        except Exception as exc:
+            logger.warning(f"Could not bump event cache version for org {org_id}: {exc}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = len(self._entries)
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'size': size,
+            'max_size': self.max_size,
+            'ttl': self.ttl,
+        }
+
+    def _get_version(self, org_id):
+        # None means the shared counter is unreachable: fall back to the
+        # database and skip caching rather than serve possibly stale events.
+        try:
+            return cache.get(_version_key(org_id), 0)
+        except Exception as exc:
+            logger.warning(f"Event cache version lookup failed for org {org_id}: {exc}")
+            return None
+
+
+event_cache = EventResolutionCache()
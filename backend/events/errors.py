@@ -0,0 +1,84 @@
+"""
+Classification of send failures for send_event_email.
+
+PERMANENT failures can never succeed on retry (rejected message, unverified
+sender, missing template, bad credentials) and go straight to a failed log.
+TRANSIENT failures (network errors, SES 5xx, database hiccups) are retried
+with capped exponential backoff and full jitter against SEND_MAX_RETRIES.
+THROTTLED failures (SES rate limiting, or the send-rate governor) back off on
+their own schedule and do not consume the retry budget.
+"""
+import random
+
+from botocore.exceptions import (
+    BotoCoreError,
+    ClientError,
+    NoCredentialsError,
+    ParamValidationError,
+    PartialCredentialsError,
+)
+from cryptography.fernet import InvalidToken
+
+PERMANENT = 'permanent'
+TRANSIENT = 'transient'
+THROTTLED = 'throttled'
+
+PERMANENT_ERROR_CODES = {
+    'AccessDenied',
+    'AccessDeniedException',
+    'AccountSendingPausedException',
+    'ConfigurationSetDoesNotExist',
+    'ConfigurationSetSendingPausedException',
+    'IncompleteSignature',
+    'InvalidClientTokenId',
+    'InvalidParameterValue',
+    'MailFromDomainNotVerifiedException',
+    'MessageRejected',
+    'MissingParameter',
+    'SignatureDoesNotMatch',
+    'UnrecognizedClientException',
+    'ValidationError',
+}
+
+THROTTLING_ERROR_CODES = {
+    'Throttling',
+    'ThrottlingException',
+    'TooManyRequestsException',
+    'RequestLimitExceeded',
+}
+
+
+class PermanentSendError(Exception):
+    """A local failure that retrying cannot fix (e.g. the event has no template)."""
+
+
+def error_code(exc) -> str | None:
+    if isinstance(exc, ClientError):
+        return exc.response.get('Error', {}).get('Code')
+    return None
+
+
+def classify_send_error(exc) -> str:
+    if isinstance(exc, (PermanentSendError, InvalidToken)):
+        return PERMANENT
+    if isinstance(exc, ClientError):
+        code = error_code(exc)
+        if code in THROTTLING_ERROR_CODES:
+            # SES reports an exhausted 24h quota with the same code; waiting
+            # seconds will not help, so treat it as an ordinary retry.
+            message = exc.response.get('Error', {}).get('Message', '')
+            return TRANSIENT if 'quota' in message.lower() else THROTTLED
+        if code in PERMANENT_ERROR_CODES:
+            return PERMANENT
+        return TRANSIENT
+    if isinstance(exc, (NoCredentialsError, PartialCredentialsError, ParamValidationError)):
+        return PERMANENT
+    if isinstance(exc, BotoCoreError):
+        # Endpoint/connection/read timeouts
+        return TRANSIENT
+    return TRANSIENT
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2**attempt)]."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
@@ -0,0 +1,347 @@
+"""
+Per-organization fair queuing for send_event_email.
+
+Instead of going straight to the shared Celery queue, sends are pushed onto
+a Redis list per (lane, organization). `manage.py dispatch_sends` drains the
+lists in rounds: each backlogged organization may publish up to
+FAIR_QUEUE_QUANTUM x its `send_weight` messages per round, and never more
+than its `max_in_flight` (default FAIR_QUEUE_MAX_IN_FLIGHT) unfinished
+sends at once. One tenant's burst therefore only ever occupies its own
+share of the Celery queue, and other tenants' sends are published in the
+next round instead of behind the whole burst. Lanes are scheduled
+separately, so an organization's bulk backlog never holds back its own
+transactional sends.
+
+A send counts as in flight from dispatch until the task finishes without
+retrying. Its body is kept with the in-flight entry until Celery has
+accepted the publish, so a dispatcher that dies in between loses nothing.
+Entries older than FAIR_QUEUE_INFLIGHT_TIMEOUT free their slot so they
+cannot pin an organization at its limit. One still holding its body was
+never published, so it goes back to the head of its list. One that was
+published is the broker's to redeliver (send tasks ack late), so it is
+only released. The Redis backend pops and reserves in one atomic script,
+so several dispatchers can run side by side; MemoryFairQueue stands in for
+tests.
+"""
+import json
+import logging
+import threading
+import time
+from collections import deque
+
+from celery import current_app
+from celery.signals import task_postrun
+from django.conf import settings
+
+from .lanes import LANES, SEND_TASK, TRANSACTIONAL
+
+logger = logging.getLogger(__name__)
+
+QUEUE_KEY = 'fair:{lane}:queue:{org}'
+IN_FLIGHT_KEY = 'fair:{lane}:in-flight:{org}'
+UNPUBLISHED_KEY = 'fair:{lane}:unpublished:{org}'
+ACTIVE_KEY = 'fair:{lane}:active'
+NO_ORG = 0
+
+# KEYS: queue, in-flight zset, active set, unpublished hash
+# ARGV: count, max in flight, now, stale before, org
+POP_SCRIPT = """
+local stale = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[4])
+for i = #stale, 1, -1 do
+    local body = redis.call('HGET', KEYS[4], stale[i])
+    if body then
+        redis.call('LPUSH', KEYS[1], body)
+        redis.call('HDEL', KEYS[4], stale[i])
+    end
+    redis.call('ZREM', KEYS[2], stale[i])
+end
+local room = tonumber(ARGV[2]) - redis.call('ZCARD', KEYS[2])
+local count = math.min(tonumber(ARGV[1]), room)
+local items = {}
+if count > 0 then
+    items = redis.call('LPOP', KEYS[1], count) or {}
+    for _, item in ipairs(items) do
+        local task_id = cjson.decode(item)['task_id']
+        redis.call('ZADD', KEYS[2], ARGV[3], task_id)
+        redis.call('HSET', KEYS[4], task_id, item)
+    end
+end
+-- Stays active while a reservation may still need to be put back
+if redis.call('LLEN', KEYS[1]) == 0 and redis.call('HLEN', KEYS[4]) == 0 then
+    redis.call('SREM', KEYS[3], ARGV[5])
+end
+return items
+"""
+
+
+def _lane(kwargs: dict) -> str:
+    return kwargs.get('lane') or TRANSACTIONAL
+
+
+def _org(kwargs: dict) -> int:
+    return kwargs.get('org') or NO_ORG
+
+
+def push_sends(messages):
+    """Queue (task_id, kwargs) pairs of send_event_email on their organizations' lists."""
+    grouped = {}
+    now = time.time()
+    for task_id, kwargs in messages:
+        body = json.dumps({'task_id': task_id, 'kwargs': kwargs, 'queued_at': now})
+        grouped.setdefault((_lane(kwargs), _org(kwargs)), []).append(body)
+    if grouped:
+        get_fair_queue().push(grouped)
+
+
+class RedisFairQueue:
+    def __init__(self):
+        self._pop = None
+
+    def push(self, grouped: dict):
+        from xyno.redis import get_redis
+
+        pipe = get_redis().pipeline()
+        for (lane, org), bodies in grouped.items():
+            pipe.rpush(QUEUE_KEY.format(lane=lane, org=org), *bodies)
+            pipe.sadd(ACTIVE_KEY.format(lane=lane), org)
+        pipe.execute()
+
+    def active(self, lane: str) -> list[int]:
+        from xyno.redis import get_redis
+
+        return sorted(int(org) for org in get_redis().smembers(ACTIVE_KEY.format(lane=lane)))
+
+    def pop(self, lane: str, org: int, count: int, max_in_flight: int) -> list[str]:
+        from xyno.redis import get_redis
+
+        if self._pop is None:
+            self._pop = get_redis().register_script(POP_SCRIPT)
+        now = time.time()
+        items = self._pop(
+            keys=[
+                QUEUE_KEY.format(lane=lane, org=org),
+                IN_FLIGHT_KEY.format(lane=lane, org=org),
+                ACTIVE_KEY.format(lane=lane),
+                UNPUBLISHED_KEY.format(lane=lane, org=org),
+            ],
+            args=[count, max_in_flight, now, now - settings.FAIR_QUEUE_INFLIGHT_TIMEOUT, org],
+        )
+        return [item.decode() for item in items]
+
+    def published(self, lane: str, org: int, task_ids: list[str]):
+        """Drop the kept bodies of sends Celery has accepted."""
+        from xyno.redis import get_redis
+
+        get_redis().hdel(UNPUBLISHED_KEY.format(lane=lane, org=org), *task_ids)
+
+    def requeue(self, lane: str, org: int, bodies: list[str]):
+        """Put unpublished messages back at the head of the list and release their slots."""
+        from xyno.redis import get_redis
+
+        task_ids = [json.loads(b)['task_id'] for b in bodies]
+        pipe = get_redis().pipeline()
+        pipe.lpush(QUEUE_KEY.format(lane=lane, org=org), *reversed(bodies))
+        pipe.sadd(ACTIVE_KEY.format(lane=lane), org)
+        pipe.zrem(IN_FLIGHT_KEY.format(lane=lane, org=org), *task_ids)
+        pipe.hdel(UNPUBLISHED_KEY.format(lane=lane, org=org), *task_ids)
+        pipe.execute()
+
+    def release(self, lane: str, org: int, task_id: str):
+        from xyno.redis import get_redis
+
+        get_redis().zrem(IN_FLIGHT_KEY.format(lane=lane, org=org), task_id)
+
+    def backlog(self, lane: str) -> dict:
+        from xyno.redis import get_redis
+
+        orgs = self.active(lane)
+        pipe = get_redis().pipeline(transaction=False)
+        for org in orgs:
+            pipe.llen(QUEUE_KEY.format(lane=lane, org=org))
+            pipe.lindex(QUEUE_KEY.format(lane=lane, org=org), 0)
+            pipe.zcard(IN_FLIGHT_KEY.format(lane=lane, org=org))
+        results = pipe.execute()
+        return {
+            org: (results[3 * i], results[3 * i + 1], results[3 * i + 2])
+            for i, org in enumerate(orgs)
+            if results[3 * i]
+        }
+
+
+class MemoryFairQueue:
+    def __init__(self):
+        self._queues = {}
+        self._in_flight = {}
+        self._unpublished = {}
+        self._lock = threading.Lock()
+
+    def push(self, grouped: dict):
+        with self._lock:
+            for key, bodies in grouped.items():
+                self._queues.setdefault(key, deque()).extend(bodies)
+
+    def active(self, lane: str) -> list[int]:
+        with self._lock:
+            # Like the Redis active set, includes reservations not yet published
+            return sorted(
+                org for queue_lane, org in set(self._queues) | set(self._unpublished)
+                if queue_lane == lane and (self._queues.get((lane, org)) or self._unpublished.get((lane, org)))
+            )
+
+    def pop(self, lane: str, org: int, count: int, max_in_flight: int) -> list[str]:
+        now = time.time()
+        stale_before = now - settings.FAIR_QUEUE_INFLIGHT_TIMEOUT
+        with self._lock:
+            in_flight = self._in_flight.setdefault((lane, org), {})
+            unpublished = self._unpublished.setdefault((lane, org), {})
+            queue = self._queues.setdefault((lane, org), deque())
+            stale = [t for t, at in in_flight.items() if at <= stale_before]
+            queue.extendleft(reversed([unpublished.pop(t) for t in stale if t in unpublished]))
+            for task_id in stale:
+                del in_flight[task_id]
+            count = max(0, min(count, max_in_flight - len(in_flight), len(queue)))
+            items = [queue.popleft() for _ in range(count)]
+            for item in items:
+                task_id = json.loads(item)['task_id']
+                in_flight[task_id] = now
+                unpublished[task_id] = item
+            return items
+
+    def published(self, lane: str, org: int, task_ids: list[str]):
+        with self._lock:
+            unpublished = self._unpublished.get((lane, org), {})
+            for task_id in task_ids:
+                unpublished.pop(task_id, None)
+
+    def requeue(self, lane: str, org: int, bodies: list[str]):
+        with self._lock:
+            self._queues.setdefault((lane, org), deque()).extendleft(reversed(bodies))
+            in_flight = self._in_flight.get((lane, org), {})
+            unpublished = self._unpublished.get((lane, org), {})
+            for body in bodies:
+                task_id = json.loads(body)['task_id']
+                in_flight.pop(task_id, None)
+                unpublished.pop(task_id, None)
+
+    def release(self, lane: str, org: int, task_id: str):
+        with self._lock:
+            self._in_flight.get((lane, org), {}).pop(task_id, None)
+
+    def backlog(self, lane: str) -> dict:
+        with self._lock:
+            return {
+                org: (len(queue), queue[0] if queue else None, len(self._in_flight.get((lane, org), {})))
+                for (queue_lane, org), queue in self._queues.items()
+                if queue_lane == lane and queue
+            }
+
+    def clear(self):
+        with self._lock:
+            self._queues.clear()
+            self._in_flight.clear()
+            self._unpublished.clear()
+
+
+_queues = {}
+
+
+def get_fair_queue():
+    backend = settings.FAIR_QUEUE_BACKEND
+    if backend not in _queues:
+        _queues[backend] = MemoryFairQueue() if backend == 'memory' else RedisFairQueue()
+    return _queues[backend]
+
+
+class Dispatcher:
+    """
+    Publishes fair-queued sends to Celery, one round at a time. Organization
+    weights and limits are reloaded every FAIR_QUEUE_SETTINGS_TTL seconds.
+    """
+
+    def __init__(self):
+        self._limits = {}
+        self._limits_loaded_at = None
+        self._start = 0
+
+    def limits(self, orgs) -> dict:
+        """Return {org: (weight, max_in_flight)}."""
+        from accounts.models import Organization
+
+        now = time.monotonic()
+        stale = self._limits_loaded_at is None or now - self._limits_loaded_at > settings.FAIR_QUEUE_SETTINGS_TTL
+        missing = [org for org in orgs if org not in self._limits]
+        if stale or missing:
+            rows = Organization.objects.filter(pk__in=orgs).values_list('pk', 'send_weight', 'max_in_flight')
+            self._limits = {
+                pk: (max(1, weight), max_in_flight or settings.FAIR_QUEUE_MAX_IN_FLIGHT)
+                for pk, weight, max_in_flight in rows
+            }
+            self._limits_loaded_at = now
+        default = (1, settings.FAIR_QUEUE_MAX_IN_FLIGHT)
+        return {org: self._limits.get(org, default) for org in orgs}
+
+    def dispatch_round(self) -> int:
+        """Give every backlogged organization one turn. Returns how many sends were published."""
+        queue = get_fair_queue()
+        task = current_app.tasks[SEND_TASK]
+        published = 0
+        self._start += 1
+        with current_app.producer_or_acquire() as producer:
+            for lane in LANES:
+                orgs = queue.active(lane)
+                if not orgs:
+                    continue
+                limits = self.limits(orgs)
+                # Rotate the starting organization so no tenant always goes first
+                offset = self._start % len(orgs)
+                for org in orgs[offset:] + orgs[:offset]:
+                    weight, max_in_flight = limits[org]
+                    bodies = queue.pop(lane, org, settings.FAIR_QUEUE_QUANTUM * weight, max_in_flight)
+                    sent = []
+                    for i, body in enumerate(bodies):
+                        message = json.loads(body)
+                        try:
+                            task.apply_async(
+                                kwargs=message['kwargs'], task_id=message['task_id'], producer=producer,
+                            )
+                        except Exception as exc:
+                            logger.error(f"Dispatch failed for org {org} ({lane}): {exc}")
+                            if sent:
+                                queue.published(lane, org, sent)
+                            queue.requeue(lane, org, bodies[i:])
+                            raise
+                        sent.append(message['task_id'])
+                    if sent:
+                        queue.published(lane, org, sent)
+                    published += len(sent)
+        return published
+
+
+def backlog_stats(org_id=None) -> dict:
+    """
+    Per lane, {org: {queued, in_flight, oldest_age}} for backlogged
+    organizations, optionally only `org_id`.
+    """
+    queue = get_fair_queue()
+    now = time.time()
+    stats = {}
+    for lane in LANES:
+        stats[lane] = {}
+        for org, (depth, head, in_flight) in queue.backlog(lane).items():
+            if org_id is not None and org != org_id:
+                continue
+            oldest_age = round(max(0.0, now - json.loads(head)['queued_at']), 3) if head else None
+            stats[lane][org] = {'queued': depth, 'in_flight': in_flight, 'oldest_age': oldest_age}
+    return stats
+
+
+@task_postrun.connect
+def release_in_flight(sender=None, task_id=None, task=None, kwargs=None, state=None, **extra):
+    # A retry keeps its slot: the send is still unfinished
+    if task is None or task.name != SEND_TASK or state == 'RETRY' or not settings.FAIR_QUEUE_ENABLED:
+        return
+    kwargs = kwargs or {}
+    try:
+        get_fair_queue().release(_lane(kwargs), _org(kwargs), task_id)
+    except Exception as exc:
+        logger.warning(f"Could not release fair queue slot of {task_id}: {exc}")
@@ -0,0 +1,171 @@
+"""
+Idempotency-Key handling for the trigger endpoint.
+
+A claim maps (API key, Idempotency-Key) to the task id of the first request
+and a fingerprint of its body, for IDEMPOTENCY_KEY_TTL seconds. The claim is
+a single cache.add (SET NX in Redis), so a first-time request costs one
+round-trip; a replay costs one more to read the original task id. If the
+cache is unreachable the claim is made in the IdempotencyKey table instead.
+
+While database claims may still be live, a new cache claim also looks the
+key up in that table, so a request retried after the cache comes back
+still finds a claim made during the outage. A process that wrote such a
+claim checks for IDEMPOTENCY_KEY_TTL afterwards, and once the cache
+answers again it sets a shared marker for as long. Other processes read
+the marker at most every MARKER_CHECK_INTERVAL seconds, so outside that
+window a first-time claim stays one round-trip and no query. The relay
+prunes expired rows hourly.
+"""
+import hashlib
+import json
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY = 'events:idempotency:{api_key_id}:{key}'
+FALLBACK_MARKER_KEY = 'events:idempotency:fallback'
+MARKER_CHECK_INTERVAL = 5.0
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyConflict(Exception):
+    """The key was already used with a different request body."""
+
+
+class FallbackWindow:
+    """Whether claims made in the IdempotencyKey table may still be live."""
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        # This process wrote a database claim; check until then
+        self._until = 0.0
+        self._unpublished = False
+        self._marker = False
+        self._marker_read_at = None
+
+    def opened(self):
+        self._until = time.monotonic() + settings.IDEMPOTENCY_KEY_TTL
+        self._unpublished = True
+
+    def active(self) -> bool:
+        """Call only after the cache has answered; may raise if it stops answering."""
+        now = time.monotonic()
+        if self._unpublished:
+            cache.set(FALLBACK_MARKER_KEY, True, max(1, int(self._until - now)))
+            self._unpublished = False
+        if now < self._until:
+            return True
+        if self._marker_read_at is None or now - self._marker_read_at >= MARKER_CHECK_INTERVAL:
+            self._marker = bool(cache.get(FALLBACK_MARKER_KEY))
+            self._marker_read_at = now
+        return self._marker
+
+
+fallback_window = FallbackWindow()
+
+
+def request_fingerprint(data) -> str:
+    return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _hash_key(key: str) -> str:
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def claim(api_key, key: str, fingerprint: str, task_id: str) -> str | None:
+    """
+    Claim `key` for `task_id`. Returns None if the claim is new, or the task
+    id of the earlier request if this is a replay.
+    """
+    hashed = _hash_key(key)
+    cache_key = CACHE_KEY.format(api_key_id=api_key.pk, key=hashed)
+    value = {'task_id': task_id, 'fingerprint': fingerprint}
+    try:
+        if cache.add(cache_key, value, settings.IDEMPOTENCY_KEY_TTL):
+            if not fallback_window.active():
+                return None
+            # The key may have been claimed in the database while the cache was down
+            fallback = _live_db_claim(api_key, hashed)
+            if fallback is None:
+                return None
+            existing, ttl = fallback
+            cache.set(cache_key, existing, ttl)
+        else:
+            existing = cache.get(cache_key)
+    except Exception as exc:
+        logger.warning(f"Idempotency cache unavailable, using the database: {exc}")
+        return _claim_db(api_key, hashed, fingerprint, task_id)
+
+    if existing is None:
+        # Expired between add and get; treat as a fresh claim
+        cache.set(cache_key, value, settings.IDEMPOTENCY_KEY_TTL)
+        return None
+    if existing['fingerprint'] != fingerprint:
+        raise IdempotencyConflict
+    return existing['task_id']
+
+
+def release(api_key, key: str):
+    """Forget a claim whose request failed, so the caller can retry it."""
+    hashed = _hash_key(key)
+    try:
+        cache.delete(CACHE_KEY.format(api_key_id=api_key.pk, key=hashed))
+    except Exception as exc:
+        logger.warning(f"Could not release idempotency key: {exc}")
+    IdempotencyKey.objects.filter(api_key=api_key, key=hashed).delete()
+
+
+def prune_expired() -> int:
+    """Delete database claims older than IDEMPOTENCY_KEY_TTL."""
+    deleted, _ = IdempotencyKey.objects.filter(created_at__lt=_cutoff()).delete()
+    return deleted
+
+
+def _cutoff():
+    return timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+
+
+def _live_db_claim(api_key, hashed: str) -> tuple[dict, int] | None:
+    """An unexpired database claim as a cache value, with its remaining TTL in seconds."""
+    row = (
+        IdempotencyKey.objects.filter(api_key=api_key, key=hashed, created_at__gte=_cutoff())
+        .values('task_id', 'fingerprint', 'created_at').first()
+    )
+    if row is None:
+        return None
+    expires_at = row.pop('created_at') + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+    return row, max(1, int((expires_at - timezone.now()).total_seconds()))
+
+
+def _claim_db(api_key, hashed: str, fingerprint: str, task_id: str) -> str | None:
+    cutoff = _cutoff()
+    fallback_window.opened()
+    try:
+        with transaction.atomic():
+            IdempotencyKey.objects.create(api_key=api_key, key=hashed, fingerprint=fingerprint, task_id=task_id)
+        return None
+    except IntegrityError:
+        pass
+
+    existing = IdempotencyKey.objects.get(api_key=api_key, key=hashed)
+    if existing.created_at < cutoff:
+        reclaimed = IdempotencyKey.objects.filter(pk=existing.pk, created_at=existing.created_at).update(
+            fingerprint=fingerprint, task_id=task_id, created_at=timezone.now(),
+        )
+        if reclaimed:
+            return None
+        existing.refresh_from_db()
+    if existing.fingerprint != fingerprint:
+        raise IdempotencyConflict
+    return existing.task_id
@@ -0,0 +1,404 @@
+"""
+Send jobs: fan an uploaded audience out to send_event_email.
+
+The audience is read as a stream straight from storage (csv.DictReader, or
+one JSON object per line, over a text wrapper of the file), so a fan-out
+holds one chunk of rows in memory however large the file is. Rows are
+validated against the event template's placeholders and queued
+SEND_JOB_CHUNK_SIZE at a time. Each chunk is queued in the same transaction
+that advances the job's `rows_processed` checkpoint, so with the outbox
+enabled a fan-out that dies part-way resumes without queueing a row twice.
+
+Live counters are a Redis hash per job: the fan-out counts `queued`,
+`invalid` and `suppressed` rows, and send_event_email counts `sent` and
+`failed` once a row reaches its final state. The fan-out totals are also
+saved on the job with each checkpoint and written to Redis as absolute
+values, so a fan-out that dies between the two restores them on resume.
+All counters are copied onto the job when it completes. If the hash is gone
+(expired after SEND_JOB_PROGRESS_TTL, or Redis lost it) the counts are
+unknown rather than zero: the job's status is left alone and readers fall
+back to the copy stored on the job. MemoryJobProgress stands in for tests.
+"""
+import csv
+import io
+import json
+import logging
+import threading
+from collections import Counter
+from itertools import islice
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.utils import timezone
+
+from suppressions.index import suppression_index
+from suppressions.models import normalize_email
+
+from .lanes import BULK
+from .models import Event, SendJob
+
+logger = logging.getLogger(__name__)
+
+COUNTERS = ('queued', 'sent', 'failed', 'invalid', 'suppressed')
+FAN_OUT_COUNTERS = ('queued', 'invalid', 'suppressed')
+PROGRESS_KEY = 'send-job:{job_id}:progress'
+RECIPIENT_FIELD = 'recipient'
+FORMAT_BY_EXTENSION = {'csv': 'csv', 'ndjson': 'ndjson', 'jsonl': 'ndjson'}
+ACTIVE_STATUSES = ('pending', 'running', 'queued')
+MAX_HEADER_LENGTH = 64 * 1024
+
+
+class AudienceError(Exception):
+    """The audience file cannot be fanned out at all."""
+
+
+def detect_format(filename: str) -> str | None:
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    return FORMAT_BY_EXTENSION.get(extension)
+
+
+def placeholder_names(template) -> tuple[list[str], list[str]]:
+    """Return (all placeholder names, names without a default value) of a template."""
+    defaults = template._get_defaults_map()
+    names = sorted(name for name in defaults if name)
+    return names, [name for name in names if not defaults[name]]
+
+
+def check_header(fileobj, fmt: str, template):
+    """
+    Reject a CSV audience whose header lacks the recipient column or a
+    placeholder without a default. Only the first line is read, and the file
+    is rewound afterwards. NDJSON has no header; its rows are checked one by
+    one during the fan-out.
+    """
+    if fmt != 'csv':
+        return
+    fileobj.seek(0)
+    first_line = fileobj.readline(MAX_HEADER_LENGTH)
+    fileobj.seek(0)
+    try:
+        header = next(csv.reader([first_line.decode('utf-8-sig')]), [])
+    except UnicodeDecodeError:
+        raise AudienceError('Audience must be UTF-8 encoded.')
+    columns = {column.strip() for column in header}
+    _, required = placeholder_names(template)
+    missing = [name for name in [RECIPIENT_FIELD, *required] if name not in columns]
+    if missing:
+        raise AudienceError(f'Audience is missing columns: {", ".join(missing)}.')
+
+
+def iter_rows(fileobj, fmt: str):
+    """
+    Yield (row_number, fields, error) for each data row of a binary file
+    object, reading it line by line. `fields` is None when the row itself
+    could not be parsed.
+    """
+    text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+    try:
+        if fmt == 'csv':
+            reader = csv.DictReader(text, skipinitialspace=True)
+            if reader.fieldnames is None or RECIPIENT_FIELD not in [f.strip() for f in reader.fieldnames]:
+                raise AudienceError(f'Audience has no "{RECIPIENT_FIELD}" column.')
+            reader.fieldnames = [f.strip() for f in reader.fieldnames]
+            for number, fields in enumerate(reader, start=1):
+                yield number, fields, None
+        else:
+            number = 0
+            for line in text:
+                if not line.strip():
+                    continue
+                number += 1
+                try:
+                    fields = json.loads(line)
+                except ValueError:
+                    yield number, None, 'Row is not valid JSON.'
+                    continue
+                if not isinstance(fields, dict):
+                    yield number, None, 'Row is not a JSON object.'
+                    continue
+                yield number, fields, None
+    except UnicodeDecodeError:
+        raise AudienceError('Audience must be UTF-8 encoded.')
+    finally:
+        # The caller owns the underlying file
+        text.detach()
+
+
+def validate_row(fields: dict, names: list[str], required: list[str]) -> tuple[str, dict]:
+    """
+    Return (recipient, context) for one row. Only template placeholders are
+    kept in the context; a blank value falls back to the placeholder default.
+    Raises ValueError for an invalid recipient or a missing required value.
+    """
+    recipient = str(fields.get(RECIPIENT_FIELD) or '').strip()
+    try:
+        validate_email(recipient)
+    except ValidationError:
+        raise ValueError(f'Invalid recipient "{recipient[:254]}".')
+
+    context = {}
+    for name in names:
+        value = fields.get(name)
+        if value is not None and value != '':
+            context[name] = value if isinstance(value, str) else str(value)
+    missing = [name for name in required if name not in context]
+    if missing:
+        raise ValueError(f'Missing values for: {", ".join(missing)}.')
+    return recipient, context
+
+
+def _chunks(iterable, size: int):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def fan_out(job: SendJob):
+    """
+    Queue the rows of a pending or interrupted job. Rows before
+    `rows_processed` were queued by an earlier run and are skipped.
+    """
+    from .tasks import send_kwargs
+
+    started = SendJob.objects.filter(pk=job.pk, status='pending').update(
+        status='running', started_at=timezone.now(),
+    )
+    job.refresh_from_db()
+    if job.status != 'running':
+        return
+    if not started:
+        logger.info(f"Resuming send job {job.pk} after row {job.rows_processed}")
+
+    event = Event.objects.select_related('template', 'integration').filter(pk=job.event_id).first()
+    if event is None or not event.is_active or event.template is None or event.integration is None:
+        fail(job, 'Event is inactive or has no template or SES integration configured.')
+        return
+
+    names, required = placeholder_names(event.template)
+    # Every send shares the same plan; only recipient and context vary.
+    # Job sends are bulk traffic whatever the event's own lane.
+    base_kwargs = {**send_kwargs(event, '', {}), 'job': job.pk, 'lane': BULK}
+    with job.audience.open('rb') as fileobj:
+        rows = iter_rows(fileobj, job.format)
+        try:
+            _queue_rows(job, islice(rows, job.rows_processed, None), base_kwargs, names, required)
+        finally:
+            rows.close()
+    if job.status == 'cancelled':
+        return
+
+    SendJob.objects.filter(pk=job.pk, status='running').update(status='queued', audience='')
+    job.audience.delete(save=False)
+    job.refresh_from_db()
+    refresh_status(job, get_job_progress().get(job.pk))
+
+
+def _queue_rows(job, rows, base_kwargs, names, required):
+    from .outbox import queue_event_emails
+
+    progress = get_job_progress()
+    errors = list(job.errors)
+    # Checkpointed with rows_processed; Redis may be missing the last chunk
+    totals = Counter({name: job.progress.get(name, 0) for name in FAN_OUT_COUNTERS})
+    progress.set(job.pk, **totals)
+    for chunk in _chunks(rows, settings.SEND_JOB_CHUNK_SIZE):
+        counts = Counter()
+        valid = []
+        for number, fields, error in chunk:
+            if error is None:
+                try:
+                    valid.append(validate_row(fields, names, required))
+                    continue
+                except ValueError as exc:
+                    error = str(exc)
+            counts['invalid'] += 1
+            if len(errors) < settings.SEND_JOB_MAX_ERRORS:
+                errors.append({'row': number, 'error': error})
+
+        suppressed = suppression_index.suppressed(job.organization_id, [r for r, _ in valid])
+        sends = []
+        for recipient, context in valid:
+            if normalize_email(recipient) in suppressed:
+                counts['suppressed'] += 1
+            else:
+                sends.append({**base_kwargs, 'recipient': recipient, 'context_data': context})
+        counts['queued'] = len(sends)
+        totals.update(counts)
+
+        with transaction.atomic():
+            checkpoint = job.rows_processed + len(chunk)
+            if not SendJob.objects.filter(pk=job.pk, status='running').update(
+                rows_processed=checkpoint, errors=errors, progress=dict(totals),
+            ):
+                logger.info(f"Send job {job.pk} was cancelled; stopping fan-out")
+                job.status = 'cancelled'
+                return
+            queue_event_emails(sends)
+        job.rows_processed, job.progress = checkpoint, dict(totals)
+        progress.set(job.pk, **totals)
+
+
+def fail(job: SendJob, message: str):
+    logger.error(f"Send job {job.pk} failed: {message}")
+    SendJob.objects.filter(pk=job.pk, status__in=ACTIVE_STATUSES).update(
+        status='failed',
+        error_message=message,
+        progress=current_counts(job),
+        finished_at=timezone.now(),
+    )
+
+
+def current_counts(job: SendJob) -> dict:
+    """The job's live counters, or the copy stored on it if they are gone."""
+    counts = get_job_progress().get(job.pk)
+    return counts if counts is not None else stored_counts(job)
+
+
+def stored_counts(job: SendJob) -> dict:
+    return {name: job.progress.get(name, 0) for name in COUNTERS}
+
+
+def refresh_status(job: SendJob, counts: dict | None) -> bool:
+    """
+    Mark a fully queued job completed once every queued row was sent or
+    failed. Missing counters (None) leave the job as it is.
+    """
+    if counts is None or job.status != 'queued' or counts['sent'] + counts['failed'] < counts['queued']:
+        return False
+    finished_at = timezone.now()
+    if SendJob.objects.filter(pk=job.pk, status='queued').update(
+        status='completed', progress=counts, finished_at=finished_at,
+    ):
+        job.status, job.progress, job.finished_at = 'completed', counts, finished_at
+    return True
+
+
+def record_outcome(job_id: int, outcome: str):
+    """Count a row's final state ('sent' or 'failed') against its job."""
+    try:
+        counts = get_job_progress().incr(job_id, **{outcome: 1})
+    except Exception as exc:
+        logger.warning(f"Could not update progress of send job {job_id}: {exc}")
+        return
+    if counts is None:
+        logger.warning(f"Progress of send job {job_id} is gone; leaving its status as is")
+        return
+    # Only touches the database when this may have been the job's last row
+    if counts['sent'] + counts['failed'] >= counts['queued']:
+        try:
+            job = SendJob.objects.filter(pk=job_id, status='queued').first()
+            if job is not None:
+                refresh_status(job, counts)
+        except Exception as exc:
+            # The next read of the job (attach_progress) finishes it instead
+            logger.warning(f"Could not finish send job {job_id}: {exc}")
+
+
+def attach_progress(jobs):
+    """
+    Set `job.counts` on each job: live counters for active jobs (one Redis
+    round-trip for all of them), the stored copy for finished ones.
+    """
+    active = [job for job in jobs if job.status in ACTIVE_STATUSES]
+    live = get_job_progress().get_many([job.pk for job in active]) if active else {}
+    for job in jobs:
+        if live.get(job.pk) is not None:
+            job.counts = live[job.pk]
+            refresh_status(job, job.counts)
+        else:
+            job.counts = stored_counts(job)
+    return jobs
+
+
+def _counts(values: dict) -> dict:
+    return {name: int(values.get(name, 0)) for name in COUNTERS}
+
+
+class RedisJobProgress:
+    def incr(self, job_id: int, **counts) -> dict | None:
+        """Add to the counters. Returns them all, or None if the hash was gone."""
+        from xyno.redis import get_redis
+
+        key = PROGRESS_KEY.format(job_id=job_id)
+        pipe = get_redis().pipeline()
+        pipe.exists(key)
+        for name, amount in counts.items():
+            if amount:
+                pipe.hincrby(key, name, amount)
+        pipe.expire(key, settings.SEND_JOB_PROGRESS_TTL)
+        pipe.hgetall(key)
+        results = pipe.execute()
+        if not results[0]:
+            # A partial hash would read as a job with nothing queued
+            get_redis().delete(key)
+            return None
+        return _counts({k.decode(): v for k, v in results[-1].items()})
+
+    def set(self, job_id: int, **counts):
+        """Overwrite the given counters; the others are left alone."""
+        from xyno.redis import get_redis
+
+        key = PROGRESS_KEY.format(job_id=job_id)
+        pipe = get_redis().pipeline()
+        pipe.hset(key, mapping=counts)
+        pipe.expire(key, settings.SEND_JOB_PROGRESS_TTL)
+        pipe.execute()
+
+    def get(self, job_id: int) -> dict | None:
+        return self.get_many([job_id])[job_id]
+
+    def get_many(self, job_ids) -> dict:
+        """{job_id: counters}, with None for jobs whose hash is gone."""
+        from xyno.redis import get_redis
+
+        pipe = get_redis().pipeline()
+        for job_id in job_ids:
+            pipe.hgetall(PROGRESS_KEY.format(job_id=job_id))
+        return {
+            job_id: _counts({k.decode(): v for k, v in values.items()}) if values else None
+            for job_id, values in zip(job_ids, pipe.execute())
+        }
+
+
+class MemoryJobProgress:
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def incr(self, job_id: int, **counts) -> dict | None:
+        with self._lock:
+            entry = self._counts.get(job_id)
+            if entry is None:
+                return None
+            entry.update(counts)
+            return _counts(entry)
+
+    def set(self, job_id: int, **counts):
+        with self._lock:
+            entry = self._counts.setdefault(job_id, Counter())
+            for name, value in counts.items():
+                entry[name] = value
+
+    def get(self, job_id: int) -> dict | None:
+        with self._lock:
+            entry = self._counts.get(job_id)
+            return _counts(entry) if entry is not None else None
+
+    def get_many(self, job_ids) -> dict:
+        return {job_id: self.get(job_id) for job_id in job_ids}
+
+    def clear(self):
+        with self._lock:
+            self._counts.clear()
+
+
+_progress = {}
+
+
+def get_job_progress():
+    backend = settings.SEND_JOB_PROGRESS_BACKEND
+    if backend not in _progress:
+        _progress[backend] = MemoryJobProgress() if backend == 'memory' else RedisJobProgress()
+    return _progress[backend]
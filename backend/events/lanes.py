@@ -0,0 +1,179 @@
+"""
+Send lanes: one Celery queue per Event.lane.
+
+send_event_email carries its event's lane in its kwargs, and `route_task`
+(CELERY_TASK_ROUTES) sends it to that lane's queue, so the outbox relay and
+direct publishes route the same way. Send-job fan-outs and their sends always
+use the bulk lane. Transactional queues get dedicated workers (see the
+compose files), so a large bulk backlog cannot delay them.
+
+Every published task is stamped with a `published_at` header (its ETA for
+delayed retries). When a send starts, the time it spent queued is recorded
+per lane, and `lane_stats()` reports wait percentiles along with the current
+depth and oldest message age of each queue, read from the Redis broker.
+"""
+import json
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from celery.signals import before_task_publish, task_prerun
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+TRANSACTIONAL = 'transactional'
+BULK = 'bulk'
+LANES = (TRANSACTIONAL, BULK)
+SEND_TASK = 'events.tasks.send_event_email'
+FAN_OUT_TASK = 'events.tasks.run_send_job'
+WAITS_KEY = 'send-lane:{lane}:waits'
+
+
+def lane_queue(lane: str | None) -> str:
+    if lane == BULK:
+        return settings.SEND_BULK_QUEUE
+    return settings.SEND_TRANSACTIONAL_QUEUE
+
+
+def route_task(name, args, kwargs, options, task=None, **kw):
+    """Celery router: pick the lane queue for send tasks, default routing for the rest."""
+    if name == SEND_TASK:
+        return {'queue': lane_queue((kwargs or {}).get('lane'))}
+    if name == FAN_OUT_TASK:
+        return {'queue': lane_queue(BULK)}
+    return None
+
+
+@before_task_publish.connect
+def stamp_published_at(sender=None, headers=None, **kwargs):
+    if sender != SEND_TASK or headers is None:
+        return
+    published_at = time.time()
+    eta = headers.get('eta')
+    if eta:
+        try:
+            published_at = max(published_at, datetime.fromisoformat(eta).timestamp())
+        except (TypeError, ValueError):
+            pass
+    headers['published_at'] = published_at
+
+
+@task_prerun.connect
+def record_queue_wait(sender=None, task=None, kwargs=None, **extra):
+    if task is None or task.name != SEND_TASK:
+        return
+    published_at = task.request.get('published_at')
+    if published_at is None:
+        return
+    lane = (kwargs or {}).get('lane') or TRANSACTIONAL
+    try:
+        get_lane_metrics().record_wait(lane, max(0.0, time.time() - published_at))
+    except Exception as exc:
+        logger.warning(f"Could not record queue wait for lane {lane}: {exc}")
+
+
+def _percentile(ordered: list, fraction: float):
+    if not ordered:
+        return None
+    return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))], 3)
+
+
+def _wait_summary(samples) -> dict:
+    ordered = sorted(samples)
+    return {
+        'samples': len(ordered),
+        'p50': _percentile(ordered, 0.5),
+        'p95': _percentile(ordered, 0.95),
+        'max': round(ordered[-1], 3) if ordered else None,
+    }
+
+
+class RedisLaneMetrics:
+    def record_wait(self, lane: str, seconds: float):
+        from xyno.redis import get_redis
+
+        key = WAITS_KEY.format(lane=lane)
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.lpush(key, round(seconds, 4))
+        pipe.ltrim(key, 0, settings.SEND_LANE_WAIT_SAMPLES - 1)
+        pipe.execute()
+
+    def stats(self) -> dict:
+        from xyno.redis import get_redis
+
+        queues = [lane_queue(lane) for lane in LANES]
+        pipe = get_redis().pipeline(transaction=False)
+        for lane, queue in zip(LANES, queues):
+            pipe.llen(queue)
+            # Kombu pushes on the left and consumes from the right
+            pipe.lindex(queue, -1)
+            pipe.lrange(WAITS_KEY.format(lane=lane), 0, -1)
+        results = pipe.execute()
+        now = time.time()
+
+        stats = {}
+        for i, (lane, queue) in enumerate(zip(LANES, queues)):
+            depth, oldest, waits = results[3 * i:3 * i + 3]
+            stats[lane] = {
+                'queue': queue,
+                'depth': depth,
+                'oldest_age': _message_age(oldest, now),
+                'wait': _wait_summary(float(w) for w in waits),
+            }
+        return stats
+
+
+def _message_age(raw, now: float):
+    if raw is None:
+        return None
+    try:
+        published_at = json.loads(raw)['headers']['published_at']
+    except (ValueError, KeyError, TypeError):
+        return None
+    return round(max(0.0, now - published_at), 3)
+
+
+class MemoryLaneMetrics:
+    """In-process stand-in; it has no broker to read queue depth from."""
+
+    def __init__(self):
+        self._waits = {}
+        self._lock = threading.Lock()
+
+    def record_wait(self, lane: str, seconds: float):
+        with self._lock:
+            self._waits.setdefault(lane, deque(maxlen=settings.SEND_LANE_WAIT_SAMPLES)).append(seconds)
+
+    def stats(self) -> dict:
+        with self._lock:
+            waits = {lane: list(samples) for lane, samples in self._waits.items()}
+        return {
+            lane: {
+                'queue': lane_queue(lane),
+                'depth': None,
+                'oldest_age': None,
+                'wait': _wait_summary(waits.get(lane, [])),
+            }
+            for lane in LANES
+        }
+
+    def clear(self):
+        with self._lock:
+            self._waits.clear()
+
+
+_metrics = {}
+
+
+def get_lane_metrics():
+    backend = settings.SEND_LANE_METRICS_BACKEND
+    if backend not in _metrics:
+        _metrics[backend] = MemoryLaneMetrics() if backend == 'memory' else RedisLaneMetrics()
+    return _metrics[backend]
+
+
+def lane_stats() -> dict:
+    return get_lane_metrics().stats()
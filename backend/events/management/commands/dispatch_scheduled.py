@@ -0,0 +1,46 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from events.scheduler import dispatch_due, prune_finished
+
+
+class Command(BaseCommand):
+    help = 'Queue scheduled sends whose send_at has passed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.SCHEDULED_SEND_BATCH_SIZE)
+        parser.add_argument('--interval', type=float, default=settings.SCHEDULED_SEND_INTERVAL,
+                            help='Seconds to sleep when nothing is due')
+        parser.add_argument('--once', action='store_true', help='Queue what is due once and exit')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_prune = 0.0
+
+        while True:
+            try:
+                queued = dispatch_due(batch_size)
+            except Exception as exc:
+                self.stderr.write(f'Scheduled dispatch failed: {exc}')
+                queued = 0
+                if options['once']:
+                    raise
+
+            if queued:
+                self.stdout.write(f'Queued {queued} scheduled send(s)')
+                if queued == batch_size:
+                    continue
+
+            if options['once']:
+                return
+
+            if time.monotonic() - last_prune > 3600:
+                pruned = prune_finished()
+                if pruned:
+                    self.stdout.write(f'Pruned {pruned} finished scheduled send(s)')
+                last_prune = time.monotonic()
+            time.sleep(options['interval'])
+            close_old_connections()
@@ -0,0 +1,38 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from events.fair_queue import Dispatcher
+
+
+class Command(BaseCommand):
+    help = 'Publish fair-queued sends to Celery, weighted per organization'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=settings.FAIR_QUEUE_DISPATCH_INTERVAL,
+                            help='Seconds to sleep when nothing could be dispatched')
+        parser.add_argument('--once', action='store_true', help='Run a single round and exit')
+
+    def handle(self, *args, **options):
+        dispatcher = Dispatcher()
+
+        while True:
+            try:
+                published = dispatcher.dispatch_round()
+            except Exception as exc:
+                self.stderr.write(f'Dispatch failed: {exc}')
+                published = 0
+                if options['once']:
+                    raise
+
+            if options['once']:
+                if published:
+                    self.stdout.write(f'Dispatched {published} send(s)')
+                return
+            if published:
+                continue
+
+            time.sleep(options['interval'])
+            close_old_connections()
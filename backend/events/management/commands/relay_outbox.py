@@ -0,0 +1,54 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from events.idempotency import prune_expired
+from events.outbox import prune_outbox, relay_batch
+
+
+class Command(BaseCommand):
+    help = 'Publish queued outbox messages to the Celery broker'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.OUTBOX_RELAY_BATCH_SIZE)
+        parser.add_argument('--interval', type=float, default=settings.OUTBOX_RELAY_INTERVAL,
+                            help='Seconds to sleep when the outbox is empty')
+        parser.add_argument('--once', action='store_true', help='Drain the outbox once and exit')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_prune = 0.0
+
+        while True:
+            try:
+                published = relay_batch(batch_size)
+            except Exception as exc:
+                self.stderr.write(f'Relay failed: {exc}')
+                published = 0
+                if options['once']:
+                    raise
+
+            if published:
+                self.stdout.write(f'Published {published} message(s)')
+
+            if options['once']:
+                if published < batch_size:
+                    return
+                continue
+
+            # On a timer, so a relay that never drains the outbox still prunes
+            if time.monotonic() - last_prune > settings.OUTBOX_PRUNE_INTERVAL:
+                pruned = prune_outbox()
+                if pruned:
+                    self.stdout.write(f'Pruned {pruned} outbox message(s)')
+                expired = prune_expired()
+                if expired:
+                    self.stdout.write(f'Pruned {expired} expired idempotency key(s)')
+                last_prune = time.monotonic()
+
+            if published == batch_size:
+                continue
+            time.sleep(options['interval'])
+            close_old_connections()
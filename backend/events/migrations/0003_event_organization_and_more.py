@@ -0,0 +1,37 @@
+# Generated by Django 5.1.15 on 2026-10-17 11:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_organization(apps, schema_editor):
+    from accounts.backfill import backfill_organization as backfill
+
+    backfill(apps.get_model('events', 'Event'), apps.get_model('accounts', 'User'))
+
+
+class Migration(migrations.Migration):
+    # Backfill commits per batch
+    atomic = False
+
+    dependencies = [
+        ('accounts', '0008_apikey_organization_and_more'),
+        ('events', '0002_alter_event_unique_together_event_environment_and_more'),
+        ('integrations', '0005_sesintegration_organization_and_more'),
+        ('templates_app', '0003_emailtemplate_organization_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='organization',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='events', to='accounts.organization'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['organization', 'environment', 'slug', 'is_active'], name='events_even_organiz_eceef0_idx'),
+        ),
+        migrations.RunPython(backfill_organization, migrations.RunPython.noop),
+    ]
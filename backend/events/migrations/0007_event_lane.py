@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-17 15:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0006_sendjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='lane',
+            field=models.CharField(choices=[('transactional', 'Transactional'), ('bulk', 'Bulk')], default='transactional', max_length=20),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.15 on 2026-10-17 15:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0011_ingest_rate_limits'),
+        ('events', '0007_event_lane'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduledSend',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_id', models.CharField(max_length=255, unique=True)),
+                ('environment', models.CharField(choices=[('sandbox', 'Sandbox'), ('production', 'Production')], default='sandbox', max_length=20)),
+                ('recipient', models.EmailField(max_length=254)),
+                ('kwargs', models.JSONField(default=dict)),
+                ('send_at', models.DateTimeField()),
+                ('bucket', models.DateTimeField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('dispatched', 'Dispatched'), ('cancelled', 'Cancelled')], default='pending', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('dispatched_at', models.DateTimeField(blank=True, null=True)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scheduled_sends', to='events.event')),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scheduled_sends', to='accounts.organization')),
+            ],
+            options={
+                'ordering': ['send_at', 'id'],
+                'indexes': [models.Index(condition=models.Q(('status', 'pending')), fields=['bucket', 'id'], name='events_scheduled_due_idx'), models.Index(fields=['organization', 'environment', 'send_at'], name='events_sche_organiz_df07ff_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.15 on 2026-10-17 17:55
+
+from django.contrib.postgres.operations import AddIndexConcurrently, RemoveIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # The claim index is swapped concurrently so triggers can keep inserting
+    atomic = False
+
+    dependencies = [
+        ('events', '0008_scheduledsend'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxmessage',
+            name='failed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='outboxmessage',
+            name='error',
+            field=models.TextField(blank=True, default=''),
+            preserve_default=False,
+        ),
+        AddIndexConcurrently(
+            model_name='outboxmessage',
+            index=models.Index(condition=models.Q(('dispatched_at__isnull', True), ('failed_at__isnull', True)), fields=['id'], name='events_outbox_pending_idx'),
+        ),
+        RemoveIndexConcurrently(
+            model_name='outboxmessage',
+            name='events_outbox_undispatched_idx',
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.15 on 2026-10-17 18:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0009_outboxmessage_failed_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scheduledsend',
+            name='error',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='scheduledsend',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('dispatched', 'Dispatched'), ('cancelled', 'Cancelled'), ('failed', 'Failed'), ('suppressed', 'Suppressed')], default='pending', max_length=20),
+        ),
+    ]
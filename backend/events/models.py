@@ -8,6 +8,12 @@ class Event(models.Model):
         ('sandbox', 'Sandbox'),
         ('production', 'Production'),
     ]
+    # Each lane has its own Celery queue (events/lanes.py), so bulk sends
+    # never sit in front of transactional ones
+    LANE_CHOICES = [
+        ('transactional', 'Transactional'),
+        ('bulk', 'Bulk'),
+    ]
 
     name = models.CharField(max_length=255)
     slug = models.SlugField(max_length=255, db_index=True)
@@ -31,12 +37,20 @@ class Event(models.Model):
         on_delete=models.CASCADE,
         related_name='events',
     )
+    organization = models.ForeignKey(
+        'accounts.Organization',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='events',
+    )
     environment = models.CharField(
         max_length=20,
         choices=ENVIRONMENT_CHOICES,
         default='sandbox',
         db_index=True,
     )
+    lane = models.CharField(max_length=20, choices=LANE_CHOICES, default='transactional')
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -44,10 +58,173 @@ class Event(models.Model):
     class Meta:
         ordering = ['-created_at']
         unique_together = ['user', 'slug', 'environment']
+        indexes = [
+            models.Index(fields=['organization', 'environment', 'slug', 'is_active']),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.slug})"
 
     def save(self, *args, **kwargs):
         self.slug = slugify(self.name).replace('-', '_')
+        if self.organization_id is None:
+            self.organization_id = self.user.organization_id
         super().save(*args, **kwargs)
+
+
+class OutboxMessage(models.Model):
+    """
+    A task publish recorded in the trigger's database transaction. The
+    `relay_outbox` command publishes committed rows to the broker in batches
+    and stamps dispatched_at. A row that can never be published (unknown
+    task, kwargs the broker cannot encode) gets failed_at and the error
+    instead, and is left for an admin to inspect.
+    """
+    task_id = models.CharField(max_length=255, unique=True)
+    task_name = models.CharField(max_length=255)
+    kwargs = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+    dispatched_at = models.DateTimeField(null=True, blank=True)
+    failed_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(
+                fields=['id'],
+                name='events_outbox_pending_idx',
+                condition=models.Q(dispatched_at__isnull=True, failed_at__isnull=True),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.task_name} {self.task_id}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    Database copy of an Idempotency-Key claim, used only while the cache
+    (Redis) is unreachable. Rows older than IDEMPOTENCY_KEY_TTL are reclaimed
+    by the next request that reuses the key, or pruned by `relay_outbox`.
+    """
+    api_key = models.ForeignKey(
+        'accounts.APIKey',
+        on_delete=models.CASCADE,
+        related_name='idempotency_keys',
+    )
+    key = models.CharField(max_length=64)
+    fingerprint = models.CharField(max_length=64)
+    task_id = models.CharField(max_length=255)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['api_key', 'key'], name='events_idempotencykey_api_key_key_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.api_key_id}:{self.key} -> {self.task_id}"
+
+
+class SendJob(models.Model):
+    """
+    One uploaded audience (CSV or NDJSON) to mail through an event. The
+    `run_send_job` task streams the file and queues its rows in chunks;
+    live queued/sent/failed counters are kept in Redis (events/jobs.py).
+    """
+    FORMAT_CHOICES = [
+        ('csv', 'CSV'),
+        ('ndjson', 'NDJSON'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('queued', 'Queued'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+        ('cancelled', 'Cancelled'),
+    ]
+
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='send_jobs')
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='send_jobs',
+    )
+    organization = models.ForeignKey(
+        'accounts.Organization',
+        on_delete=models.CASCADE,
+        related_name='send_jobs',
+    )
+    environment = models.CharField(max_length=20, choices=Event.ENVIRONMENT_CHOICES, default='sandbox')
+    audience = models.FileField(upload_to='send-jobs/%Y/%m/%d/')
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    # Data rows already fanned out; a restarted fan-out resumes after them
+    rows_processed = models.PositiveIntegerField(default=0)
+    # Fan-out counters as of the rows_processed checkpoint; all final
+    # counters, copied from Redis, once the job is done
+    progress = models.JSONField(default=dict, blank=True)
+    errors = models.JSONField(default=list, blank=True)
+    error_message = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['organization', 'environment', '-created_at']),
+        ]
+
+    def __str__(self):
+        return f"Send job {self.pk} ({self.event_id}, {self.status})"
+
+
+class ScheduledSend(models.Model):
+    """
+    A send_event_email call held until `send_at`. Rows are grouped into
+    minute buckets; the `dispatch_scheduled` command claims due rows bucket
+    by bucket and queues them like an immediate trigger (events/scheduler.py).
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('dispatched', 'Dispatched'),
+        ('cancelled', 'Cancelled'),
+        # Checked again at send time and not queued
+        ('failed', 'Failed'),
+        ('suppressed', 'Suppressed'),
+    ]
+
+    task_id = models.CharField(max_length=255, unique=True)
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='scheduled_sends')
+    organization = models.ForeignKey(
+        'accounts.Organization',
+        on_delete=models.CASCADE,
+        related_name='scheduled_sends',
+    )
+    environment = models.CharField(max_length=20, choices=Event.ENVIRONMENT_CHOICES, default='sandbox')
+    recipient = models.EmailField()
+    kwargs = models.JSONField(default=dict)
+    send_at = models.DateTimeField()
+    # send_at truncated to the minute
+    bucket = models.DateTimeField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    error = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    dispatched_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['send_at', 'id']
+        indexes = [
+            models.Index(
+                fields=['bucket', 'id'],
+                name='events_scheduled_due_idx',
+                condition=models.Q(status='pending'),
+            ),
+            models.Index(fields=['organization', 'environment', 'send_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.task_id} at {self.send_at} ({self.status})"
@@ -0,0 +1,138 @@
+"""
+Transactional outbox for send_event_email.
+
+Trigger requests insert OutboxMessage rows (one multi-row INSERT per request)
+instead of publishing to Redis, so a trigger costs one local write and a
+broker outage no longer fails callers. `manage.py relay_outbox` claims
+committed rows with SELECT ... FOR UPDATE SKIP LOCKED, so several relays
+can run side by side, publishes each batch over one producer connection and
+marks the rows dispatched. Delivery is at-least-once: a relay that dies
+after publishing but before committing leaves its rows to be published
+again. send_event_email claims its task id before sending
+(events/send_claims.py), so the repeat is skipped rather than sent twice.
+
+A message that fails to publish for any reason other than the broker (an
+unknown task name, kwargs that cannot be encoded) is dead-lettered with
+failed_at and the error instead of being retried, so it cannot stall the
+rows behind it. Dispatched rows are pruned after OUTBOX_RETENTION_HOURS;
+dead-lettered ones are kept for inspection for
+OUTBOX_FAILED_RETENTION_HOURS.
+"""
+import logging
+import uuid
+from datetime import timedelta
+
+from celery import current_app
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from kombu.exceptions import OperationalError as BrokerError
+
+from .fair_queue import push_sends
+from .lanes import SEND_TASK
+from .models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+# Publish failures worth retrying; anything else is a problem with the message
+BROKER_ERRORS = (BrokerError, OSError)
+
+
+def new_task_id() -> str:
+    return str(uuid.uuid4())
+
+
+def queue_event_emails(sends: list[dict], task_ids: list[str] | None = None) -> list[str]:
+    """
+    Queue send_event_email calls, through the outbox when EVENT_OUTBOX_ENABLED
+    or straight to the broker otherwise. Task ids are generated unless given.
+    Returns task ids in order.
+    """
+    from .tasks import enqueue_event_emails, send_event_email
+
+    task_ids = task_ids or [new_task_id() for _ in sends]
+    if not settings.EVENT_OUTBOX_ENABLED:
+        return enqueue_event_emails(sends, task_ids)
+    if not sends:
+        return []
+    messages = [
+        OutboxMessage(task_id=task_id, task_name=send_event_email.name, kwargs=kwargs)
+        for kwargs, task_id in zip(sends, task_ids)
+    ]
+    # bulk_create is atomic by itself and joins the caller's transaction if any
+    OutboxMessage.objects.bulk_create(messages, batch_size=settings.OUTBOX_RELAY_BATCH_SIZE)
+    return [m.task_id for m in messages]
+
+
+def queue_task(task, kwargs: dict, task_id: str | None = None) -> str:
+    """Queue any other task the same way, e.g. to start it in the caller's transaction."""
+    task_id = task_id or new_task_id()
+    if not settings.EVENT_OUTBOX_ENABLED:
+        task.apply_async(kwargs=kwargs, task_id=task_id)
+    else:
+        OutboxMessage.objects.create(task_id=task_id, task_name=task.name, kwargs=kwargs)
+    return task_id
+
+
+def relay_batch(batch_size: int | None = None) -> int:
+    """
+    Publish one batch of pending messages. Returns how many left the outbox,
+    published or dead-lettered.
+    """
+    batch_size = batch_size or settings.OUTBOX_RELAY_BATCH_SIZE
+    with transaction.atomic():
+        messages = list(
+            OutboxMessage.objects.select_for_update(skip_locked=True)
+            .filter(dispatched_at__isnull=True, failed_at__isnull=True)
+            .order_by('id')[:batch_size]
+        )
+        if not messages:
+            return 0
+        claimed = len(messages)
+
+        published = []
+        dead = []
+        if settings.FAIR_QUEUE_ENABLED:
+            # Sends go to the per-organization fair queues (events/fair_queue.py)
+            sends = [m for m in messages if m.task_name == SEND_TASK]
+            push_sends((m.task_id, m.kwargs) for m in sends)
+            published = [m.pk for m in sends]
+            messages = [m for m in messages if m.task_name != SEND_TASK]
+        try:
+            with current_app.producer_or_acquire() as producer:
+                for message in messages:
+                    try:
+                        current_app.tasks[message.task_name].apply_async(
+                            kwargs=message.kwargs, task_id=message.task_id, producer=producer,
+                        )
+                    except BROKER_ERRORS:
+                        raise
+                    except Exception as exc:
+                        # Retrying cannot help, and left in place it would block the outbox
+                        logger.error(f"Outbox message {message.task_id} ({message.task_name}) cannot be published: {exc!r}")
+                        dead.append((message.pk, repr(exc)))
+                        continue
+                    published.append(message.pk)
+        except Exception as exc:
+            # Keep what made it out; the rest stays queued for the next pass
+            logger.error(f"Outbox relay published {len(published)}/{claimed} before failing: {exc}")
+            if not published and not dead:
+                raise
+
+        now = timezone.now()
+        OutboxMessage.objects.filter(pk__in=published).update(dispatched_at=now)
+        for pk, error in dead:
+            OutboxMessage.objects.filter(pk=pk).update(failed_at=now, error=error)
+    return len(published) + len(dead)
+
+
+def prune_outbox(retention: timedelta | None = None, failed_retention: timedelta | None = None) -> int:
+    """Delete dispatched and dead-lettered rows past their retention. Returns how many."""
+    retention = retention or timedelta(hours=settings.OUTBOX_RETENTION_HOURS)
+    failed_retention = failed_retention or timedelta(hours=settings.OUTBOX_FAILED_RETENTION_HOURS)
+    now = timezone.now()
+    deleted, _ = OutboxMessage.objects.filter(
+        Q(dispatched_at__lt=now - retention) | Q(failed_at__lt=now - failed_retention),
+    ).delete()
+    return deleted
@@ -0,0 +1,99 @@
+"""
+Compact, versioned "send plans" for send_event_email.
+
+The trigger side has already loaded the event with its template and
+integration, so instead of an event id alone it enqueues their ids and
+versions (updated_at in microseconds), plus environment and user id. Workers
+resolve each id from a per-process LRU and only query the database when the
+cached copy is older than the version in the plan, so a warm worker sends
+without touching Event, EmailTemplate or SESIntegration.
+"""
+import copy
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+PLAN_FORMAT = 1
+
+
+def object_version(obj) -> int:
+    return int(obj.updated_at.timestamp() * 1_000_000)
+
+
+def build_send_plan(event) -> dict:
+    """Plan for an event loaded with its template and integration."""
+    return {
+        'v': PLAN_FORMAT,
+        'event': [event.id, object_version(event)],
+        'template': [event.template_id, object_version(event.template)],
+        'integration': [event.integration_id, object_version(event.integration)],
+        'environment': event.environment,
+        'user': event.user_id,
+    }
+
+
+class SendPlanCache:
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, model, pk, version: int):
+        """Return the instance at `version` or newer, or None if it no longer exists."""
+        key = (model._meta.label, pk)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] >= version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        obj = model.objects.filter(pk=pk).first()
+        if obj is None:
+            return None
+        with self._lock:
+            self._entries[key] = (object_version(obj), obj)
+            self._entries.move_to_end(key)
+            while len(self._entries) > settings.SEND_PLAN_CACHE_SIZE:
+                self._entries.popitem(last=False)
+        return obj
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+send_plan_cache = SendPlanCache()
+
+
+def resolve_send_plan(plan: dict):
+    """
+    Return the plan's Event with template and integration attached, or None
+    if the event was deleted since it was enqueued. A deleted template or
+    integration comes back as None, as it would from a fresh query.
+    """
+    from integrations.models import SESIntegration
+    from templates_app.models import EmailTemplate
+
+    from .models import Event
+
+    if plan.get('v') != PLAN_FORMAT:
+        raise ValueError(f"Unsupported send plan format: {plan.get('v')}")
+
+    cached = send_plan_cache.get(Event, *plan['event'])
+    if cached is None:
+        return None
+    # Cached instances are shared between threads; attach relations to a copy
+    event = copy.copy(cached)
+    event._state = copy.copy(cached._state)
+    event._state.fields_cache = {}
+    event.template = send_plan_cache.get(EmailTemplate, *plan['template'])
+    event.integration = send_plan_cache.get(SESIntegration, *plan['integration'])
+    event.environment = plan['environment']
+    event.user_id = plan['user']
+    return event
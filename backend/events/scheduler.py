@@ -0,0 +1,154 @@
+"""
+Scheduled sends: send_event_email calls held until a future `send_at`.
+
+Celery ETA tasks are held in worker memory until due, and are redelivered
+to other workers when the visibility timeout passes, so they do not scale to
+millions of pending reminders. Triggers with a `send_at` instead insert
+ScheduledSend rows, each filed under the minute its send_at falls in.
+`manage.py dispatch_scheduled` claims due rows oldest bucket first in
+batches of SCHEDULED_SEND_BATCH_SIZE, with SELECT ... FOR UPDATE SKIP
+LOCKED, so several schedulers can run side by side. It queues them through
+queue_event_emails in the same transaction that marks them dispatched, so
+with the outbox enabled a claimed row is queued exactly once. The partial
+index on (bucket, id) only covers pending rows, so a claim never scans what
+was already sent.
+
+A row stores the recipient and context, not a send plan or lane. Those are
+built from the event as it is at dispatch, which is also when the event and
+recipient are checked again. A row whose event was deactivated (or lost its
+template or integration) is marked failed, and one whose recipient was
+suppressed in the meantime is marked suppressed; neither is queued.
+
+Cancel and reschedule are conditional UPDATEs on pending rows. The claim
+holds its rows locked, so once a row is being dispatched neither can change
+it.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from suppressions.index import suppression_index
+from suppressions.models import normalize_email
+
+from .models import Event, ScheduledSend
+from .outbox import new_task_id, queue_event_emails
+
+# Rebuilt from the event at dispatch
+DISPATCH_TIME_KWARGS = ('plan', 'lane')
+
+
+def minute_bucket(send_at):
+    return send_at.replace(second=0, microsecond=0)
+
+
+def is_future(send_at) -> bool:
+    return send_at is not None and send_at > timezone.now()
+
+
+def schedule_sends(sends: list[tuple[dict, object]], environment: str,
+                   task_ids: list[str] | None = None) -> list[str]:
+    """
+    Hold (send_kwargs, send_at) pairs until they are due. Returns task ids
+    in order; each becomes the task id of its send.
+    """
+    task_ids = task_ids or [new_task_id() for _ in sends]
+    rows = [
+        ScheduledSend(
+            task_id=task_id,
+            event_id=kwargs['event_id'],
+            organization_id=kwargs['org'],
+            environment=environment,
+            recipient=kwargs['recipient'],
+            kwargs={key: value for key, value in kwargs.items() if key not in DISPATCH_TIME_KWARGS},
+            send_at=send_at,
+            bucket=minute_bucket(send_at),
+        )
+        for (kwargs, send_at), task_id in zip(sends, task_ids)
+    ]
+    ScheduledSend.objects.bulk_create(rows, batch_size=settings.SCHEDULED_SEND_BATCH_SIZE)
+    return [row.task_id for row in rows]
+
+
+def dispatch_due(batch_size: int | None = None) -> int:
+    """
+    Queue one batch of due sends. Returns how many rows were claimed,
+    including those marked failed or suppressed instead of queued.
+    """
+    from .tasks import send_kwargs
+
+    batch_size = batch_size or settings.SCHEDULED_SEND_BATCH_SIZE
+    now = timezone.now()
+    with transaction.atomic():
+        due = list(
+            ScheduledSend.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', bucket__lte=minute_bucket(now), send_at__lte=now)
+            .order_by('bucket', 'id')
+            .only('id', 'task_id', 'event_id', 'organization_id', 'recipient', 'kwargs')[:batch_size]
+        )
+        if not due:
+            return 0
+
+        events = Event.objects.select_related('template', 'integration').in_bulk({row.event_id for row in due})
+        recipients = defaultdict(list)
+        for row in due:
+            recipients[row.organization_id].append(row.recipient)
+        suppressed = {org_id: suppression_index.suppressed(org_id, emails) for org_id, emails in recipients.items()}
+
+        queued, sends = [], []
+        skipped = defaultdict(list)
+        for row in due:
+            event = events.get(row.event_id)
+            error = _unsendable(event)
+            if error:
+                skipped[('failed', error)].append(row.pk)
+            elif normalize_email(row.recipient) in suppressed[row.organization_id]:
+                skipped[('suppressed', f'Recipient {row.recipient} is on the suppression list.')].append(row.pk)
+            else:
+                queued.append(row)
+                sends.append(send_kwargs(event, row.recipient, row.kwargs.get('context_data', {})))
+
+        if sends:
+            queue_event_emails(sends, task_ids=[row.task_id for row in queued])
+            ScheduledSend.objects.filter(pk__in=[row.pk for row in queued]).update(
+                status='dispatched', dispatched_at=now,
+            )
+        for (status, error), pks in skipped.items():
+            ScheduledSend.objects.filter(pk__in=pks).update(status=status, error=error)
+    return len(due)
+
+
+def _unsendable(event) -> str:
+    """Why a send of `event` cannot be queued, or '' if it can."""
+    if event is None or not event.is_active:
+        return 'Event is inactive.'
+    if not event.template:
+        return 'Event has no template configured.'
+    if not event.integration:
+        return 'Event has no SES integration configured.'
+    return ''
+
+
+def cancel(scheduled: ScheduledSend) -> bool:
+    """Cancel a pending send. Returns False if it was already dispatched or cancelled."""
+    return bool(ScheduledSend.objects.filter(pk=scheduled.pk, status='pending').update(status='cancelled'))
+
+
+def reschedule(scheduled: ScheduledSend, send_at) -> bool:
+    """Move a pending send to `send_at`. Returns False if it is no longer pending."""
+    return bool(
+        ScheduledSend.objects.filter(pk=scheduled.pk, status='pending').update(
+            send_at=send_at, bucket=minute_bucket(send_at),
+        )
+    )
+
+
+def prune_finished(retention: timedelta | None = None) -> int:
+    """Delete finished (not pending) rows whose send time is older than the retention."""
+    retention = retention or timedelta(days=settings.SCHEDULED_SEND_RETENTION_DAYS)
+    deleted, _ = ScheduledSend.objects.exclude(status='pending').filter(
+        send_at__lt=timezone.now() - retention,
+    ).delete()
+    return deleted
@@ -0,0 +1,65 @@
+"""
+Per-task-id send claims for send_event_email.
+
+The outbox relay and the fair-queue dispatcher publish at least once, so the
+same task id can reach the workers twice. Before it does anything a run
+claims its task id with one cache.add (SET NX in Redis); a run that finds the
+id already claimed returns without sending. The claim is a lease of
+SEND_CLAIM_LEASE seconds while the send is under way, so a worker that dies
+mid-send does not keep its redelivery from going out. A finished send
+(sent, or failed for good) keeps its claim for SEND_CLAIM_TTL. A run that
+retries hands the claim to the retry by its retry number, so the retry
+message may run but a late duplicate of the original may not.
+
+If the cache is unreachable the send goes ahead unclaimed: a duplicate email
+is preferred over a lost one.
+"""
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+CLAIM_KEY = 'events:send:{task_id}'
+SENDING = 'sending'
+DONE = 'done'
+RETRY = 'retry:{retries}'
+
+
+def claim(task_id: str | None, retries: int) -> bool:
+    """Claim `task_id` for this run. Returns False if another run owns it."""
+    if task_id is None:
+        return True
+    key = CLAIM_KEY.format(task_id=task_id)
+    try:
+        if cache.add(key, SENDING, settings.SEND_CLAIM_LEASE):
+            return True
+        current = cache.get(key)
+        if current is not None and current != RETRY.format(retries=retries):
+            return False
+        # Handed to this retry, or expired between add and get
+        cache.set(key, SENDING, settings.SEND_CLAIM_LEASE)
+        return True
+    except Exception as exc:
+        logger.warning(f"Send claim cache unavailable, sending {task_id} unclaimed: {exc}")
+        return True
+
+
+def finish(task_id: str | None):
+    """The send reached its final outcome; later copies of it are skipped."""
+    _set(task_id, DONE)
+
+
+def hand_to_retry(task_id: str | None, retries: int):
+    """Let the run retrying as `retries` (the current retry number + 1) take the claim."""
+    _set(task_id, RETRY.format(retries=retries))
+
+
+def _set(task_id, value):
+    if task_id is None:
+        return
+    try:
+        cache.set(CLAIM_KEY.format(task_id=task_id), value, settings.SEND_CLAIM_TTL)
+    except Exception as exc:
+        logger.warning(f"Could not update send claim of {task_id}: {exc}")
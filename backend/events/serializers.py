@@ -1,6 +1,18 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
 from rest_framework import serializers
 
-from .models import Event
+from .models import Event, ScheduledSend, SendJob
+
+
+def within_schedule_horizon(value):
+    if value > timezone.now() + timedelta(days=settings.SCHEDULED_SEND_MAX_AHEAD_DAYS):
+        raise serializers.ValidationError(
+            f'send_at must be within {settings.SCHEDULED_SEND_MAX_AHEAD_DAYS} days.'
+        )
+    return value
 
 
 class EventSerializer(serializers.ModelSerializer):
@@ -13,7 +25,7 @@ class EventSerializer(serializers.ModelSerializer):
             'id', 'name', 'slug', 'description', 'environment',
             'template', 'template_name',
             'integration', 'integration_name',
-            'is_active', 'created_at', 'updated_at',
+            'lane', 'is_active', 'created_at', 'updated_at',
         ]
         read_only_fields = ['id', 'slug', 'created_at', 'updated_at']
 
@@ -22,8 +34,64 @@ class TriggerEventSerializer(serializers.Serializer):
     event = serializers.SlugField()
     recipient = serializers.EmailField()
     data = serializers.DictField(child=serializers.CharField(allow_blank=True), required=False, default=dict)
+    # A future send_at holds the send in events/scheduler.py; a past one sends now
+    send_at = serializers.DateTimeField(required=False, validators=[within_schedule_horizon])
+
+
+class BatchTriggerEventSerializer(serializers.Serializer):
+    """
+    Envelope for the batch trigger endpoint. Items are kept as raw dicts here
+    and validated one by one with TriggerEventSerializer, so a bad item only
+    fails itself instead of rejecting the whole batch.
+    """
+    items = serializers.ListField(
+        child=serializers.DictField(),
+        allow_empty=False,
+        max_length=settings.TRIGGER_BATCH_MAX_SIZE,
+    )
 
 
 class TestEventSerializer(serializers.Serializer):
     recipient = serializers.EmailField()
     data = serializers.DictField(child=serializers.CharField(allow_blank=True), required=False, default=dict)
+
+
+class SendJobSerializer(serializers.ModelSerializer):
+    event_slug = serializers.CharField(source='event.slug', read_only=True)
+    counts = serializers.DictField(read_only=True)
+
+    class Meta:
+        model = SendJob
+        fields = [
+            'id', 'event', 'event_slug', 'environment', 'format', 'status',
+            'rows_processed', 'counts', 'errors', 'error_message',
+            'created_at', 'started_at', 'finished_at',
+        ]
+        read_only_fields = fields
+
+
+class SendJobCreateSerializer(serializers.Serializer):
+    event = serializers.SlugField()
+    audience = serializers.FileField()
+    format = serializers.ChoiceField(choices=SendJob.FORMAT_CHOICES, required=False)
+
+
+class ScheduledSendSerializer(serializers.ModelSerializer):
+    event_slug = serializers.CharField(source='event.slug', read_only=True)
+
+    class Meta:
+        model = ScheduledSend
+        fields = [
+            'task_id', 'event', 'event_slug', 'environment', 'recipient', 'send_at', 'status', 'error',
+            'created_at', 'dispatched_at',
+        ]
+        read_only_fields = fields
+
+
+class RescheduleSerializer(serializers.Serializer):
+    send_at = serializers.DateTimeField(validators=[within_schedule_horizon])
+
+    def validate_send_at(self, value):
+        if value <= timezone.now():
+            raise serializers.ValidationError('send_at must be in the future.')
+        return value
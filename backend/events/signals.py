@@ -0,0 +1,33 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from integrations.models import SESIntegration
+from templates_app.models import EmailTemplate
+
+from .cache import event_cache
+from .models import Event
+
+
+def _organization_id(instance):
+    if instance.organization_id is not None:
+        return instance.organization_id
+    User = get_user_model()
+    return User.objects.filter(pk=instance.user_id).values_list('organization_id', flat=True).first()
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+@receiver(post_save, sender=EmailTemplate)
+@receiver(post_delete, sender=EmailTemplate)
+@receiver(post_save, sender=SESIntegration)
+@receiver(post_delete, sender=SESIntegration)
+def invalidate_event_cache(sender, instance, **kwargs):
+    """Events embed their template and integration, so a change to any of them invalidates."""
+    org_id = _organization_id(instance)
+    if org_id is not None:
+        event_cache.invalidate(org_id)
+        # Bump again once the write is visible, so a reader that raced the
+        # transaction cannot keep the old row cached under the new version.
+        transaction.on_commit(lambda: event_cache.invalidate(org_id))
@@ -1,50 +1,121 @@
 import logging
+import time
+from datetime import timedelta
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 
-from celery import shared_task
+from celery import group, shared_task
+from django.conf import settings
+from django.utils import timezone
+
+from .errors import PERMANENT, THROTTLED, PermanentSendError, backoff_delay, classify_send_error, error_code
 
 logger = logging.getLogger(__name__)
 
 
 @shared_task(
     bind=True,
-    max_retries=3,
-    default_retry_delay=60,
+    # Retry budgets are enforced by the task itself (see events/errors.py)
+    max_retries=None,
     acks_late=True,
 )
-def send_event_email(self, event_id: int, recipient: str, context_data: dict):
+def send_event_email(
+    self, event_id: int, recipient: str, context_data: dict, deferrals: int = 0, plan: dict | None = None,
+    job: int | None = None, lane: str | None = None, org: int | None = None, governor_waits: int = 0,
+):
+    """
+    `deferrals` counts earlier retries caused by SES throttling (capped by
+    SEND_MAX_DEFERRALS) and `governor_waits` those spent waiting for a
+    send-rate slot (capped by SEND_MAX_GOVERNOR_WAITS); neither is charged
+    against SEND_MAX_RETRIES. `plan` is a send plan from
+    events/plans.py; without one the event is loaded from the database.
+    `job` is the SendJob this send belongs to, whose progress counters get
+    the final outcome. `lane` and `org` only pick the queue (events/lanes.py)
+    and fair-queue slot (events/fair_queue.py).
+    """
+    from events import send_claims
     from events.models import Event
-    from logs.models import EmailLog
+    from events.plans import resolve_send_plan
+    from integrations.governor import get_send_governor
+    from logs.writer import log_writer
 
-    try:
-        event = Event.objects.select_related('template', 'integration').get(id=event_id)
-    except Event.DoesNotExist:
+    # The outbox and fair queue publish at least once; skip copies of a send
+    if not send_claims.claim(self.request.id, self.request.retries):
+        logger.info(f"Send {self.request.id} already claimed, skipping duplicate")
+        return
+
+    if plan is not None:
+        event = resolve_send_plan(plan)
+    else:
+        event = Event.objects.select_related('template', 'integration').filter(id=event_id).first()
+    if event is None:
         logger.error(f"Event {event_id} not found")
+        _finish(self, job, 'failed')
         return
 
     template = event.template
     integration = event.integration
+    log_fields = {
+        'event': event,
+        'template': template,
+        'integration': integration,
+        'user_id': event.user_id,
+        'organization_id': event.organization_id,
+        'environment': event.environment,
+        'recipient': recipient,
+        'metadata': {'context_data': context_data},
+    }
+    # Redeliveries and retries may find the log from an earlier attempt
+    maybe_exists = bool(self.request.retries or (self.request.delivery_info or {}).get('redelivered'))
+
+    try:
+        if template is None or integration is None:
+            raise PermanentSendError('Event has no template or SES integration configured.')
+        if not integration.is_active:
+            raise PermanentSendError(f'SES integration {integration.pk} is inactive.')
+        try:
+            rendered_subject, rendered_html = template.render(context_data)
+        except Exception as exc:
+            raise PermanentSendError(f'Template render failed: {exc}') from exc
+    except PermanentSendError as exc:
+        log_entry = log_writer.get_or_create(self.request.id, maybe_exists, subject='', **log_fields)
+        log_writer.update(log_entry, status='failed', error_message=str(exc))
+        logger.error(f"Email failed permanently for {recipient}: {exc}")
+        _finish(self, job, 'failed')
+        return
+
+    governor = get_send_governor()
+    try:
+        granted, wait = governor.acquire(integration)
+    except Exception as exc:
+        # Like the ingest rate limiter: an outage must not hold up or lose sends
+        logger.warning(f"Send governor unavailable for integration {integration.pk}, sending ungoverned: {exc}")
+        granted, wait = True, 0.0
+    if not granted:
+        if governor_waits >= settings.SEND_MAX_GOVERNOR_WAITS:
+            log_entry = log_writer.get_or_create(
+                self.request.id, maybe_exists, subject=rendered_subject, **log_fields,
+            )
+            error = f'No send slot on SES integration {integration.pk} after {governor_waits} waits.'
+            log_writer.update(log_entry, status='failed', error_message=error)
+            logger.error(f"Email failed for {recipient}: {error}")
+            _finish(self, job, 'failed')
+            return
+        # Over the integration's send rate for longer than a worker should
+        # block: hand the slot back to the queue and come back when it is due.
+        raise _defer(self, countdown=wait, governor_waits=governor_waits + 1)
+    if wait:
+        time.sleep(wait)
 
-    rendered_subject, rendered_html = template.render(context_data)
-
-    log_entry = EmailLog.objects.create(
-        event=event,
-        template=template,
-        integration=integration,
-        user=event.user,
-        environment=event.environment,
-        recipient=recipient,
-        subject=rendered_subject,
-        status='pending',
-        metadata={
-            'context_data': context_data,
-            'task_id': self.request.id,
-        },
+    log_entry = log_writer.get_or_create(
+        self.request.id, maybe_exists, subject=rendered_subject, status='pending', **log_fields,
     )
+    attempt = log_entry.attempts + 1
+    started_at = timezone.now()
+    started = time.monotonic()
 
     try:
-        client = integration.get_ses_client()
+        client = integration.get_cached_ses_client()
         response = client.send_raw_email(
             Source=integration.sender_email,
             Destinations=[recipient],
@@ -56,17 +127,150 @@ def send_event_email(self, event_id: int, recipient: str, context_data: dict):
             },
         )
         ses_message_id = response['MessageId']
-        log_entry.status = 'sent'
-        log_entry.ses_message_id = ses_message_id
-        log_entry.save(update_fields=['status', 'ses_message_id'])
+    except Exception as exc:
+        kind = classify_send_error(exc)
+        _record_attempt(log_writer, log_entry, attempt, started_at, started, error_code(exc) or type(exc).__name__)
+
+        if kind == THROTTLED and deferrals < settings.SEND_MAX_DEFERRALS:
+            try:
+                governor.record_throttle(integration)
+            except Exception as throttle_exc:
+                logger.warning(f"Could not lower the send rate of integration {integration.pk}: {throttle_exc}")
+            log_writer.update(log_entry, error_message=str(exc), attempts=attempt)
+            logger.warning(f"Email throttled for {recipient}, deferring: {exc}")
+            countdown = backoff_delay(
+                deferrals, settings.SEND_THROTTLE_BACKOFF_BASE, settings.SEND_THROTTLE_BACKOFF_MAX,
+            )
+            raise _defer(self, countdown=countdown, exc=exc, deferrals=deferrals + 1)
+
+        retries = self.request.retries - deferrals - governor_waits
+        if kind == PERMANENT or retries >= settings.SEND_MAX_RETRIES:
+            log_writer.update(log_entry, status='failed', error_message=str(exc), attempts=attempt)
+            logger.error(f"Email failed for {recipient} ({kind}, attempt {attempt}): {exc}")
+            _finish(self, job, 'failed')
+            return
+
+        # Stays pending until a later attempt succeeds or the budget runs out
+        log_writer.update(log_entry, error_message=str(exc), attempts=attempt)
+        logger.warning(f"Email failed for {recipient} ({kind}, attempt {attempt}), retrying: {exc}")
+        countdown = backoff_delay(retries, settings.SEND_RETRY_BACKOFF_BASE, settings.SEND_RETRY_BACKOFF_MAX)
+        send_claims.hand_to_retry(self.request.id, self.request.retries + 1)
+        raise self.retry(exc=exc, countdown=countdown)
+    else:
+        # The email is out: a failure from here on must not send it again
+        try:
+            _record_attempt(log_writer, log_entry, attempt, started_at, started)
+            log_writer.update(
+                log_entry, status='sent', ses_message_id=ses_message_id, error_message='', attempts=attempt,
+            )
+        except Exception as exc:
+            logger.error(f"Email {ses_message_id} sent to {recipient} but its log was not updated: {exc}")
         logger.info(f"Email sent: {ses_message_id} to {recipient}")
+        _finish(self, job, 'sent')
+
+
+def _record_attempt(writer, log, attempt, started_at, started, error_code=''):
+    latency = timedelta(seconds=time.monotonic() - started)
+    writer.record_attempt(
+        log,
+        attempt=attempt,
+        started_at=started_at,
+        finished_at=started_at + latency,
+        latency_ms=int(latency.total_seconds() * 1000),
+        error_code=error_code[:64],
+    )
+
+
+def _record_job_outcome(job_id, outcome: str):
+    if job_id is not None:
+        from events.jobs import record_outcome
 
+        record_outcome(job_id, outcome)
+
+
+def _finish(task, job_id, outcome: str):
+    """The send reached its final outcome: keep later copies from sending and count it."""
+    from events import send_claims
+
+    send_claims.finish(task.request.id)
+    _record_job_outcome(job_id, outcome)
+
+
+def _defer(task, countdown: float, exc=None, **counters):
+    """Retry with updated deferral counters, which do not use up the retry budget."""
+    from events import send_claims
+
+    send_claims.hand_to_retry(task.request.id, task.request.retries + 1)
+    kwargs = {**(task.request.kwargs or {}), **counters}
+    return task.retry(kwargs=kwargs, countdown=countdown, exc=exc)
+
+
+@shared_task(bind=True, acks_late=True, max_retries=None)
+def run_send_job(self, job_id: int):
+    """
+    Fan a SendJob's audience out to send_event_email (see events/jobs.py).
+    A redelivered or retried run resumes from the job's checkpoint.
+    """
+    from events.jobs import AudienceError, fail, fan_out
+    from events.models import SendJob
+
+    job = SendJob.objects.filter(pk=job_id).first()
+    if job is None:
+        logger.error(f"Send job {job_id} not found")
+        return
+    try:
+        fan_out(job)
+    except AudienceError as exc:
+        fail(job, str(exc))
     except Exception as exc:
-        log_entry.status = 'failed'
-        log_entry.error_message = str(exc)
-        log_entry.save(update_fields=['status', 'error_message'])
-        logger.error(f"Email failed for {recipient}: {exc}")
-        raise self.retry(exc=exc)
+        if self.request.retries >= settings.SEND_MAX_RETRIES:
+            fail(job, f'Fan-out failed: {exc}')
+            return
+        logger.warning(f"Send job {job_id} fan-out failed, retrying: {exc}")
+        countdown = backoff_delay(
+            self.request.retries, settings.SEND_RETRY_BACKOFF_BASE, settings.SEND_RETRY_BACKOFF_MAX,
+        )
+        raise self.retry(exc=exc, countdown=countdown)
+
+
+def send_kwargs(event, recipient: str, context_data: dict) -> dict:
+    """Task kwargs for one send of an event loaded with template and integration."""
+    from events.plans import build_send_plan
+
+    kwargs = {
+        'event_id': event.id,
+        'recipient': recipient,
+        'context_data': context_data,
+        'lane': event.lane,
+        'org': event.organization_id,
+    }
+    if settings.SEND_PLAN_PAYLOADS:
+        kwargs['plan'] = build_send_plan(event)
+    return kwargs
+
+
+def enqueue_event_emails(sends: list[dict], task_ids: list[str] | None = None) -> list[str]:
+    """
+    Queue many send_event_email calls at once. With FAIR_QUEUE_ENABLED they
+    go onto the per-organization fair queues; otherwise they are published
+    as a single Celery group, which reuses one producer connection for
+    every message instead of opening a publish round-trip per `.delay()`.
+    Returns the task ids in the same order as `sends`.
+    """
+    if not sends:
+        return []
+    if settings.FAIR_QUEUE_ENABLED:
+        from events.fair_queue import push_sends
+        from events.outbox import new_task_id
+
+        task_ids = task_ids or [new_task_id() for _ in sends]
+        push_sends(zip(task_ids, sends))
+        return list(task_ids)
+    signatures = [send_event_email.s(**kwargs) for kwargs in sends]
+    for signature, task_id in zip(signatures, task_ids or []):
+        signature.set(task_id=task_id)
+    result = group(signatures).apply_async()
+    return [str(r.id) for r in result.results]
 
 
 def _build_mime_message(sender: str, recipient: str, subject: str, html: str) -> str:
@@ -1,12 +1,27 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import EventViewSet, TriggerEventView
+from .views import (
+    BatchTriggerEventView,
+    EventCacheStatsView,
+    EventLaneStatsView,
+    EventViewSet,
+    FairQueueStatsView,
+    ScheduledSendViewSet,
+    SendJobViewSet,
+    TriggerEventView,
+)
 
 router = DefaultRouter()
 router.register(r'definitions', EventViewSet, basename='event')
+router.register(r'jobs', SendJobViewSet, basename='send-job')
+router.register(r'scheduled', ScheduledSendViewSet, basename='scheduled-send')
 
 urlpatterns = [
     path('trigger/', TriggerEventView.as_view(), name='trigger-event'),
+    path('trigger/batch/', BatchTriggerEventView.as_view(), name='trigger-event-batch'),
+    path('cache-stats/', EventCacheStatsView.as_view(), name='event-cache-stats'),
+    path('lane-stats/', EventLaneStatsView.as_view(), name='event-lane-stats'),
+    path('fair-queue-stats/', FairQueueStatsView.as_view(), name='fair-queue-stats'),
     path('', include(router.urls)),
 ]
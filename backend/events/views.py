@@ -1,17 +1,42 @@
-from rest_framework import status, viewsets
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import mixins, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from accounts.authentication import APIKeyAuthentication
+from accounts.models import APIKey
+from accounts.permissions import IsAdminRole
+from accounts.ratelimit import IngestRateLimitMixin
 from integrations.models import SESIntegration
+from suppressions.index import suppression_index
+from suppressions.models import normalize_email
 from templates_app.models import EmailTemplate
 from xyno.utils import get_environment_from_request
 
-from .models import Event
-from .serializers import EventSerializer, TestEventSerializer, TriggerEventSerializer
-from .tasks import send_event_email
+from . import idempotency, jobs, scheduler
+from .fair_queue import backlog_stats
+from .lanes import lane_stats
+from .cache import event_cache
+from .models import Event, ScheduledSend, SendJob
+from .outbox import new_task_id, queue_event_emails, queue_task
+from .serializers import (
+    BatchTriggerEventSerializer,
+    EventSerializer,
+    RescheduleSerializer,
+    ScheduledSendSerializer,
+    SendJobCreateSerializer,
+    SendJobSerializer,
+    TestEventSerializer,
+    TriggerEventSerializer,
+)
+from .tasks import run_send_job, send_kwargs
 
 
 class EventViewSet(viewsets.ModelViewSet):
@@ -21,7 +46,7 @@ class EventViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         env = get_environment_from_request(self.request)
         return Event.objects.filter(
-            user__organization=self.request.user.organization, environment=env
+            organization_id=self.request.user.organization_id, environment=env
         ).select_related('template', 'integration')
 
     def perform_create(self, serializer):
@@ -38,11 +63,11 @@ class EventViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        org = request.user.organization
+        org_id = request.user.organization_id
         prod_template = None
         if event.template:
             prod_template = EmailTemplate.objects.filter(
-                user__organization=org,
+                organization_id=org_id,
                 name=event.template.name,
                 environment='production',
             ).first()
@@ -50,7 +75,7 @@ class EventViewSet(viewsets.ModelViewSet):
         prod_integration = None
         if event.integration:
             prod_integration = SESIntegration.objects.filter(
-                user__organization=org,
+                organization_id=org_id,
                 name=event.integration.name,
                 environment='production',
             ).first()
@@ -62,7 +87,7 @@ class EventViewSet(viewsets.ModelViewSet):
             warnings.append(f'Integration "{event.integration.name}" has not been configured for production yet.')
 
         existing = Event.objects.filter(
-            user__organization=org,
+            organization_id=org_id,
             slug=event.slug,
             environment='production',
         ).first()
@@ -72,6 +97,7 @@ class EventViewSet(viewsets.ModelViewSet):
             existing.description = event.description
             existing.template = prod_template
             existing.integration = prod_integration
+            existing.lane = event.lane
             existing.is_active = event.is_active
             existing.save()
             data = EventSerializer(existing).data
@@ -85,6 +111,7 @@ class EventViewSet(viewsets.ModelViewSet):
                 integration=prod_integration,
                 user=request.user,
                 environment='production',
+                lane=event.lane,
                 is_active=event.is_active,
             )
             data = EventSerializer(prod_event).data
@@ -113,44 +140,40 @@ class EventViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        task = send_event_email.delay(
-            event_id=event.id,
-            recipient=recipient,
-            context_data=data,
-        )
+        [task_id] = queue_event_emails([send_kwargs(event, recipient, data)])
 
         return Response({
             'detail': f'Test email queued to {recipient}.',
-            'task_id': str(task.id),
+            'task_id': task_id,
         })
 
 
-class TriggerEventView(APIView):
+class TriggerEventView(IngestRateLimitMixin, APIView):
     authentication_classes = [APIKeyAuthentication]
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
+        idempotency_key = request.headers.get('Idempotency-Key')
+        if idempotency_key is not None and not 0 < len(idempotency_key) <= idempotency.MAX_KEY_LENGTH:
+            return Response(
+                {'detail': f'Idempotency-Key must be 1-{idempotency.MAX_KEY_LENGTH} characters.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
         serializer = TriggerEventSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
         event_slug = serializer.validated_data['event']
         recipient = serializer.validated_data['recipient']
         data = serializer.validated_data.get('data', {})
+        send_at = serializer.validated_data.get('send_at')
 
         # Environment is derived from the API key, not from any request header
         api_key_obj = request.auth
         environment = api_key_obj.environment
 
-        try:
-            event = Event.objects.select_related(
-                'template', 'integration'
-            ).get(
-                user__organization=request.user.organization,
-                slug=event_slug,
-                environment=environment,
-                is_active=True,
-            )
-        except Event.DoesNotExist:
+        event = event_cache.get(request.user.organization_id, event_slug, environment)
+        if event is None:
             return Response(
                 {'detail': f'Event "{event_slug}" not found or inactive in {environment} environment.'},
                 status=status.HTTP_404_NOT_FOUND,
@@ -166,14 +189,321 @@ class TriggerEventView(APIView):
                 {'detail': 'Event has no SES integration configured.'},
                 status=status.HTTP_400_BAD_REQUEST,
             )
+        if suppression_index.is_suppressed(request.user.organization_id, recipient):
+            return Response(
+                {'detail': f'Recipient {recipient} is on the suppression list.'},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+
+        task_id = new_task_id()
+        replayed = False
+        if idempotency_key:
+            fingerprint = idempotency.request_fingerprint(serializer.validated_data)
+            try:
+                original = idempotency.claim(api_key_obj, idempotency_key, fingerprint, task_id)
+            except idempotency.IdempotencyConflict:
+                return Response(
+                    {'detail': 'Idempotency-Key was already used with a different request body.'},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                )
+            if original:
+                task_id, replayed = original, True
 
-        task = send_event_email.delay(
-            event_id=event.id,
-            recipient=recipient,
-            context_data=data,
+        scheduled = scheduler.is_future(send_at)
+        if not replayed:
+            try:
+                if scheduled:
+                    scheduler.schedule_sends(
+                        [(send_kwargs(event, recipient, data), send_at)], environment, task_ids=[task_id],
+                    )
+                else:
+                    queue_event_emails([send_kwargs(event, recipient, data)], task_ids=[task_id])
+            except Exception:
+                if idempotency_key:
+                    idempotency.release(api_key_obj, idempotency_key)
+                raise
+
+        body = {'detail': 'Email queued for sending.', 'task_id': task_id, 'environment': environment}
+        if scheduled:
+            body.update(detail='Email scheduled for sending.', send_at=send_at)
+        return Response(
+            body,
+            status=status.HTTP_202_ACCEPTED,
+            headers={'Idempotent-Replayed': 'true'} if replayed else None,
         )
 
+
+class BatchTriggerEventView(IngestRateLimitMixin, APIView):
+    """
+    Trigger many events in one call. Each item is validated on its own and
+    gets its own result entry (task id or errors), so one bad item never
+    blocks the rest of the batch. Distinct slugs are resolved together (at
+    most one query for cache misses) and all valid sends are queued with a
+    single outbox insert. Items with a future `send_at` are scheduled
+    instead. Each item counts against the rate limit.
+    """
+    authentication_classes = [APIKeyAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get_rate_limit_cost(self, request):
+        items = request.data.get('items') if isinstance(request.data, dict) else None
+        return len(items) if isinstance(items, list) else 1
+
+    def post(self, request):
+        serializer = BatchTriggerEventSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        items = serializer.validated_data['items']
+
+        environment = request.auth.environment
+
+        results = []
+        valid = []
+        for index, item in enumerate(items):
+            item_serializer = TriggerEventSerializer(data=item)
+            if item_serializer.is_valid():
+                valid.append((index, item_serializer.validated_data))
+                results.append(None)
+            else:
+                results.append({'index': index, 'status': 'error', 'errors': item_serializer.errors})
+
+        slugs = {data['event'] for _, data in valid}
+        events = event_cache.get_many(request.user.organization_id, slugs, environment)
+        suppressed = suppression_index.suppressed(
+            request.user.organization_id, [data['recipient'] for _, data in valid],
+        )
+
+        sends = []
+        queued_indexes = []
+        scheduled = []
+        scheduled_indexes = []
+        for index, data in valid:
+            event_slug = data['event']
+            event = events.get(event_slug)
+            if event is None:
+                detail = f'Event "{event_slug}" not found or inactive in {environment} environment.'
+            elif not event.template:
+                detail = 'Event has no template configured.'
+            elif not event.integration:
+                detail = 'Event has no SES integration configured.'
+            elif normalize_email(data['recipient']) in suppressed:
+                detail = f'Recipient {data["recipient"]} is on the suppression list.'
+            else:
+                detail = None
+
+            if detail:
+                results[index] = {'index': index, 'status': 'error', 'errors': {'detail': detail}}
+                continue
+
+            kwargs = send_kwargs(event, data['recipient'], data.get('data', {}))
+            if scheduler.is_future(data.get('send_at')):
+                scheduled.append((kwargs, data['send_at']))
+                scheduled_indexes.append(index)
+            else:
+                sends.append(kwargs)
+                queued_indexes.append(index)
+
+        # Both inserts or neither; a batch without scheduled items needs no transaction
+        with transaction.atomic() if scheduled else nullcontext():
+            task_ids = queue_event_emails(sends)
+            scheduled_ids = scheduler.schedule_sends(scheduled, environment) if scheduled else []
+        for index, task_id in zip(queued_indexes, task_ids):
+            results[index] = {'index': index, 'status': 'queued', 'task_id': task_id}
+        for index, task_id, (_, send_at) in zip(scheduled_indexes, scheduled_ids, scheduled):
+            results[index] = {'index': index, 'status': 'scheduled', 'task_id': task_id, 'send_at': send_at}
+
         return Response(
-            {'detail': 'Email queued for sending.', 'task_id': str(task.id), 'environment': environment},
+            {
+                'environment': environment,
+                'queued': len(task_ids),
+                'scheduled': len(scheduled_ids),
+                'failed': len(items) - len(task_ids) - len(scheduled_ids),
+                'results': results,
+            },
             status=status.HTTP_202_ACCEPTED,
         )
+
+
+class SendJobViewSet(
+    mixins.ListModelMixin,
+    mixins.RetrieveModelMixin,
+    viewsets.GenericViewSet,
+):
+    """
+    Audience uploads mailed through an event. The upload is stored as is and
+    fanned out by the run_send_job task; `counts` shows live progress.
+    Accepts JWT (environment from X-Environment) or an API key (its own
+    environment).
+    """
+    serializer_class = SendJobSerializer
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser]
+
+    def get_environment(self):
+        if isinstance(self.request.auth, APIKey):
+            return self.request.auth.environment
+        return get_environment_from_request(self.request)
+
+    def get_queryset(self):
+        return SendJob.objects.filter(
+            organization_id=self.request.user.organization_id, environment=self.get_environment(),
+        ).select_related('event')
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.get_queryset())
+        jobs.attach_progress(page)
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
+
+    def retrieve(self, request, *args, **kwargs):
+        job = self.get_object()
+        jobs.attach_progress([job])
+        return Response(self.get_serializer(job).data)
+
+    def create(self, request, *args, **kwargs):
+        serializer = SendJobCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        event_slug = serializer.validated_data['event']
+        audience = serializer.validated_data['audience']
+        environment = self.get_environment()
+
+        event = event_cache.get(request.user.organization_id, event_slug, environment)
+        if event is None:
+            return Response(
+                {'detail': f'Event "{event_slug}" not found or inactive in {environment} environment.'},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        if not event.template or not event.integration:
+            return Response(
+                {'detail': 'Event has no template or SES integration configured.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        fmt = serializer.validated_data.get('format') or jobs.detect_format(audience.name)
+        if fmt is None:
+            return Response(
+                {'detail': 'Cannot tell the audience format; use a .csv or .ndjson file or pass "format".'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if audience.size > settings.SEND_JOB_MAX_UPLOAD_SIZE:
+            return Response(
+                {'detail': f'Audience is larger than {settings.SEND_JOB_MAX_UPLOAD_SIZE} bytes.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            jobs.check_header(audience, fmt, event.template)
+        except jobs.AudienceError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            job = SendJob.objects.create(
+                event=event,
+                user=request.user,
+                organization_id=request.user.organization_id,
+                environment=environment,
+                audience=audience,
+                format=fmt,
+            )
+            queue_task(run_send_job, {'job_id': job.pk})
+
+        jobs.attach_progress([job])
+        return Response(self.get_serializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=['post'])
+    def cancel(self, request, pk=None):
+        """Stop the fan-out. Rows already queued are still sent."""
+        job = self.get_object()
+        if not SendJob.objects.filter(pk=job.pk, status__in=jobs.ACTIVE_STATUSES).update(
+            status='cancelled', finished_at=timezone.now(),
+        ):
+            return Response(
+                {'detail': f'Send job is already {job.status}.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        job.refresh_from_db()
+        job.counts = jobs.current_counts(job)
+        SendJob.objects.filter(pk=job.pk).update(progress=job.counts)
+        return Response(self.get_serializer(job).data)
+
+
+class ScheduledSendViewSet(
+    mixins.ListModelMixin,
+    mixins.RetrieveModelMixin,
+    viewsets.GenericViewSet,
+):
+    """
+    Sends triggered with a future `send_at`, looked up by task id. Pending
+    sends can be cancelled or moved to another time. Accepts JWT
+    (environment from X-Environment) or an API key (its own environment);
+    `?status=` filters the list.
+    """
+    serializer_class = ScheduledSendSerializer
+    permission_classes = [IsAuthenticated]
+    lookup_field = 'task_id'
+
+    def get_environment(self):
+        if isinstance(self.request.auth, APIKey):
+            return self.request.auth.environment
+        return get_environment_from_request(self.request)
+
+    def get_queryset(self):
+        queryset = ScheduledSend.objects.filter(
+            organization_id=self.request.user.organization_id, environment=self.get_environment(),
+        ).select_related('event')
+        status_filter = self.request.query_params.get('status')
+        if status_filter:
+            queryset = queryset.filter(status=status_filter)
+        return queryset
+
+    @action(detail=True, methods=['post'])
+    def cancel(self, request, task_id=None):
+        scheduled = self.get_object()
+        if not scheduler.cancel(scheduled):
+            scheduled.refresh_from_db()
+            return Response(
+                {'detail': f'Scheduled send is already {scheduled.status}.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        scheduled.refresh_from_db()
+        return Response(self.get_serializer(scheduled).data)
+
+    @action(detail=True, methods=['post'])
+    def reschedule(self, request, task_id=None):
+        scheduled = self.get_object()
+        serializer = RescheduleSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        if not scheduler.reschedule(scheduled, serializer.validated_data['send_at']):
+            scheduled.refresh_from_db()
+            return Response(
+                {'detail': f'Scheduled send is already {scheduled.status}.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        scheduled.refresh_from_db()
+        return Response(self.get_serializer(scheduled).data)
+
+
+class EventCacheStatsView(APIView):
+    """Hit/miss counters of the event resolution cache in the serving process."""
+    permission_classes = [IsAuthenticated, IsAdminRole]
+
+    def get(self, request):
+        return Response(event_cache.stats())
+
+
+class EventLaneStatsView(APIView):
+    """Per-lane queue depth, oldest message age and recent queue wait times."""
+    permission_classes = [IsAuthenticated, IsAdminRole]
+
+    def get(self, request):
+        return Response(lane_stats())
+
+
+class FairQueueStatsView(APIView):
+    """
+    Fair-queue backlog per lane and organization: queued sends, sends in
+    flight and the age of the oldest queued send. Staff see every
+    organization, organization admins only their own.
+    """
+    permission_classes = [IsAuthenticated, IsAdminRole]
+
+    def get(self, request):
+        org_id = None if request.user.is_staff else request.user.organization_id
+        return Response(backlog_stats(org_id))
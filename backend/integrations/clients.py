@@ -0,0 +1,55 @@
+"""
+Per-process registry of boto3 SES clients.
+
+Building a client means decrypting both credentials, creating a botocore
+session, resolving the endpoint and opening a fresh TLS connection. Workers
+keep one client per integration instead, keyed by (id, updated_at) so that
+any saved change to the integration yields a new client. boto3 clients are
+thread-safe, so a cached client can be shared by all threads of a worker.
+"""
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+class SESClientRegistry:
+    def __init__(self):
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, integration):
+        key = (integration.pk, integration.updated_at)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self._clients.move_to_end(key)
+                return client
+
+        client = integration.get_ses_client(
+            max_pool_connections=settings.SES_CLIENT_POOL_CONNECTIONS,
+        )
+
+        with self._lock:
+            for stale in [k for k in self._clients if k[0] == integration.pk and k != key]:
+                del self._clients[stale]
+            self._clients[key] = client
+            self._clients.move_to_end(key)
+            while len(self._clients) > settings.SES_CLIENT_CACHE_SIZE:
+                self._clients.popitem(last=False)
+        return client
+
+    def invalidate(self, integration_id):
+        with self._lock:
+            for key in [k for k in self._clients if k[0] == integration_id]:
+                del self._clients[key]
+
+    def clear(self):
+        with self._lock:
+            self._clients.clear()
+
+    def __len__(self):
+        return len(self._clients)
+
+
+ses_clients = SESClientRegistry()
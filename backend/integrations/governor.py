@@ -0,0 +1,198 @@
+"""
+Cluster-wide SES send-rate governor.
+
+Every send takes a token from a bucket keyed by SESIntegration. The refill
+rate is the account's MaxSendRate (from a cached ses:GetSendQuota call, or
+the integration's manual `max_send_rate` override), scaled by an adaptive
+factor: a throttling error multiplies the factor by SES_THROTTLE_DECREASE
+and it recovers linearly by SES_RATE_RECOVERY_PER_SEC, so workers settle
+just under the real ceiling instead of oscillating around it.
+
+A caller may reserve a token up to SES_GOVERNOR_MAX_WAIT seconds ahead and
+sleep until it is due; longer waits are not reserved and the caller should
+re-queue the work instead. The Redis backend does each acquisition in one
+atomic script round-trip; the memory backend is a drop-in for tests.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+QUOTA_CACHE_KEY = 'ses:max-send-rate:{integration_id}'
+
+ACQUIRE_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local base_rate = tonumber(ARGV[1])
+local requested = tonumber(ARGV[2])
+local max_wait = tonumber(ARGV[3])
+local recovery = tonumber(ARGV[4])
+local min_factor = tonumber(ARGV[5])
+
+local factor = 1
+local penalty = redis.call('HMGET', KEYS[2], 'factor', 'ts')
+if penalty[1] then
+    factor = math.min(1, tonumber(penalty[1]) + recovery * math.max(0, now - tonumber(penalty[2])))
+end
+factor = math.max(factor, min_factor)
+local rate = base_rate * factor
+local capacity = math.max(1, rate)
+
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+
+local wait = 0
+if tokens < requested then
+    wait = (requested - tokens) / rate
+end
+local granted = 0
+if wait <= max_wait then
+    tokens = tokens - requested
+    granted = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], 3600)
+return {granted, tostring(wait)}
+"""
+
+THROTTLE_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local decrease = tonumber(ARGV[1])
+local recovery = tonumber(ARGV[2])
+local min_factor = tonumber(ARGV[3])
+
+local factor = 1
+local penalty = redis.call('HMGET', KEYS[2], 'factor', 'ts')
+if penalty[1] then
+    factor = math.min(1, tonumber(penalty[1]) + recovery * math.max(0, now - tonumber(penalty[2])))
+end
+factor = math.max(factor * decrease, min_factor)
+redis.call('HSET', KEYS[2], 'factor', factor, 'ts', now)
+redis.call('EXPIRE', KEYS[2], 3600)
+redis.call('HSET', KEYS[1], 'tokens', 0, 'ts', now)
+return tostring(factor)
+"""
+
+
+def get_max_send_rate(integration) -> float:
+    """Configured override, else the account's cached MaxSendRate, else the default."""
+    if integration.max_send_rate:
+        return float(integration.max_send_rate)
+
+    key = QUOTA_CACHE_KEY.format(integration_id=integration.pk)
+    rate = cache.get(key)
+    if rate is None:
+        rate = settings.SES_DEFAULT_SEND_RATE
+        try:
+            quota = integration.get_cached_ses_client().get_send_quota()
+            rate = float(quota['MaxSendRate']) or rate
+        except Exception as exc:
+            # Typically AccessDenied for IAM users limited to ses:SendRawEmail
+            logger.warning(f"get_send_quota failed for integration {integration.pk}, using {rate}/s: {exc}")
+        cache.set(key, rate, settings.SES_QUOTA_CACHE_TTL)
+    return rate
+
+
+def _keys(integration_id):
+    return f'ses:bucket:{integration_id}', f'ses:rate-factor:{integration_id}'
+
+
+class RedisSendRateGovernor:
+    def __init__(self):
+        self._acquire = None
+        self._throttle = None
+
+    def _scripts(self):
+        if self._acquire is None:
+            from xyno.redis import get_redis
+
+            client = get_redis()
+            self._acquire = client.register_script(ACQUIRE_SCRIPT)
+            self._throttle = client.register_script(THROTTLE_SCRIPT)
+        return self._acquire, self._throttle
+
+    def acquire(self, integration, tokens: int = 1) -> tuple[bool, float]:
+        """Reserve `tokens` sends. Returns (granted, seconds to wait before sending)."""
+        acquire, _ = self._scripts()
+        granted, wait = acquire(
+            keys=list(_keys(integration.pk)),
+            args=[
+                get_max_send_rate(integration), tokens, settings.SES_GOVERNOR_MAX_WAIT,
+                settings.SES_RATE_RECOVERY_PER_SEC, settings.SES_RATE_MIN_FACTOR,
+            ],
+        )
+        return bool(granted), float(wait)
+
+    def record_throttle(self, integration) -> float:
+        """Lower the integration's rate after SES throttled a send. Returns the new factor."""
+        _, throttle = self._scripts()
+        factor = throttle(
+            keys=list(_keys(integration.pk)),
+            args=[
+                settings.SES_THROTTLE_DECREASE, settings.SES_RATE_RECOVERY_PER_SEC,
+                settings.SES_RATE_MIN_FACTOR,
+            ],
+        )
+        return float(factor)
+
+
+class MemorySendRateGovernor:
+    """In-process equivalent of the Redis scripts, for tests and single-process setups."""
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._buckets = {}
+        self._factors = {}
+        self._lock = threading.Lock()
+
+    def _factor(self, integration_id, now):
+        factor, ts = self._factors.get(integration_id, (1.0, now))
+        factor = min(1.0, factor + settings.SES_RATE_RECOVERY_PER_SEC * max(0.0, now - ts))
+        return max(factor, settings.SES_RATE_MIN_FACTOR)
+
+    def acquire(self, integration, tokens: int = 1) -> tuple[bool, float]:
+        base_rate = get_max_send_rate(integration)
+        with self._lock:
+            now = self.clock()
+            rate = base_rate * self._factor(integration.pk, now)
+            capacity = max(1.0, rate)
+            level, ts = self._buckets.get(integration.pk, (capacity, now))
+            level = min(capacity, level + max(0.0, now - ts) * rate)
+
+            wait = (tokens - level) / rate if level < tokens else 0.0
+            granted = wait <= settings.SES_GOVERNOR_MAX_WAIT
+            if granted:
+                level -= tokens
+            self._buckets[integration.pk] = (level, now)
+        return granted, wait
+
+    def record_throttle(self, integration) -> float:
+        with self._lock:
+            now = self.clock()
+            factor = max(self._factor(integration.pk, now) * settings.SES_THROTTLE_DECREASE,
+                         settings.SES_RATE_MIN_FACTOR)
+            self._factors[integration.pk] = (factor, now)
+            self._buckets[integration.pk] = (0.0, now)
+        return factor
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+            self._factors.clear()
+
+
+_governors = {}
+
+
+def get_send_governor():
+    backend = settings.SES_GOVERNOR_BACKEND
+    if backend not in _governors:
+        _governors[backend] = MemorySendRateGovernor() if backend == 'memory' else RedisSendRateGovernor()
+    return _governors[backend]
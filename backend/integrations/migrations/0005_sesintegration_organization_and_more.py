@@ -0,0 +1,35 @@
+# Generated by Django 5.1.15 on 2026-10-17 11:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_organization(apps, schema_editor):
+    from accounts.backfill import backfill_organization as backfill
+
+    backfill(apps.get_model('integrations', 'SESIntegration'), apps.get_model('accounts', 'User'))
+
+
+class Migration(migrations.Migration):
+    # Backfill commits per batch
+    atomic = False
+
+    dependencies = [
+        ('accounts', '0008_apikey_organization_and_more'),
+        ('integrations', '0004_platforms3config'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sesintegration',
+            name='organization',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ses_integrations', to='accounts.organization'),
+        ),
+        migrations.AddIndex(
+            model_name='sesintegration',
+            index=models.Index(fields=['organization', 'environment', '-created_at'], name='integration_organiz_84aba6_idx'),
+        ),
+        migrations.RunPython(backfill_organization, migrations.RunPython.noop),
+    ]
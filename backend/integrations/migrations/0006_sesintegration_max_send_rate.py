@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-17 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('integrations', '0005_sesintegration_organization_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sesintegration',
+            name='max_send_rate',
+            field=models.FloatField(blank=True, help_text='Emails/sec override for IAM users that cannot call ses:GetSendQuota', null=True),
+        ),
+    ]
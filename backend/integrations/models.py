@@ -30,6 +30,13 @@ class SESIntegration(models.Model):
         on_delete=models.CASCADE,
         related_name='ses_integrations',
     )
+    organization = models.ForeignKey(
+        'accounts.Organization',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='ses_integrations',
+    )
     environment = models.CharField(
         max_length=20,
         choices=ENVIRONMENT_CHOICES,
@@ -40,6 +47,11 @@ class SESIntegration(models.Model):
     aws_secret_key_encrypted = models.TextField()
     region = models.CharField(max_length=20, choices=AWS_REGIONS)
     sender_email = models.EmailField()
+    max_send_rate = models.FloatField(
+        null=True,
+        blank=True,
+        help_text='Emails/sec override for IAM users that cannot call ses:GetSendQuota',
+    )
     is_verified = models.BooleanField(default=False)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -48,13 +60,24 @@ class SESIntegration(models.Model):
     class Meta:
         ordering = ['-created_at']
         unique_together = ['user', 'name', 'environment']
+        indexes = [
+            models.Index(fields=['organization', 'environment', '-created_at']),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.sender_email})"
 
+    def save(self, *args, **kwargs):
+        if self.organization_id is None:
+            self.organization_id = self.user.organization_id
+        super().save(*args, **kwargs)
+
     def set_aws_credentials(self, access_key: str, secret_key: str):
         self.aws_access_key_encrypted = encrypt_value(access_key)
         self.aws_secret_key_encrypted = encrypt_value(secret_key)
+        if self.pk:
+            from .clients import ses_clients
+            ses_clients.invalidate(self.pk)
 
     def get_aws_access_key(self) -> str:
         return decrypt_value(self.aws_access_key_encrypted)
@@ -62,15 +85,24 @@ class SESIntegration(models.Model):
     def get_aws_secret_key(self) -> str:
         return decrypt_value(self.aws_secret_key_encrypted)
 
-    def get_ses_client(self):
+    def get_ses_client(self, max_pool_connections: int | None = None):
         import boto3
+        from botocore.config import Config
+
+        config = Config(max_pool_connections=max_pool_connections) if max_pool_connections else None
         return boto3.client(
             'ses',
             aws_access_key_id=self.get_aws_access_key(),
             aws_secret_access_key=self.get_aws_secret_key(),
             region_name=self.region,
+            config=config,
         )
 
+    def get_cached_ses_client(self):
+        """Shared, pooled client for this integration from the per-process registry."""
+        from .clients import ses_clients
+        return ses_clients.get(self)
+
 
 class PlatformS3Config(models.Model):
     """Singleton platform-level S3 config for org media storage (images, etc.).
@@ -11,7 +11,7 @@ class SESIntegrationCreateSerializer(serializers.ModelSerializer):
         model = SESIntegration
         fields = [
             'id', 'name', 'aws_access_key', 'aws_secret_key',
-            'region', 'sender_email', 'is_verified', 'is_active',
+            'region', 'sender_email', 'max_send_rate', 'is_verified', 'is_active',
             'created_at', 'updated_at', 'environment',
         ]
         read_only_fields = ['id', 'is_verified', 'created_at', 'updated_at']
@@ -39,6 +39,6 @@ class SESIntegrationListSerializer(serializers.ModelSerializer):
     class Meta:
         model = SESIntegration
         fields = [
-            'id', 'name', 'environment', 'region', 'sender_email',
+            'id', 'name', 'environment', 'region', 'sender_email', 'max_send_rate',
             'is_verified', 'is_active', 'created_at', 'updated_at',
         ]
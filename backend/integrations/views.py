@@ -17,7 +17,7 @@ class SESIntegrationViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         env = get_environment_from_request(self.request)
         return SESIntegration.objects.filter(
-            user__organization=self.request.user.organization, environment=env
+            organization_id=self.request.user.organization_id, environment=env
         )
 
     def get_serializer_class(self):
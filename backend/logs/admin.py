@@ -1,11 +1,25 @@
 from django.contrib import admin
 
-from .models import EmailLog
+from .models import DeliveryAttempt, DeliveryRollup, EmailLog
+
+
+class DeliveryAttemptInline(admin.TabularInline):
+    model = DeliveryAttempt
+    extra = 0
+    readonly_fields = ['attempt', 'started_at', 'finished_at', 'latency_ms', 'error_code']
+    can_delete = False
 
 
 @admin.register(EmailLog)
 class EmailLogAdmin(admin.ModelAdmin):
-    list_display = ['recipient', 'subject', 'status', 'event', 'integration', 'sent_at']
+    list_display = ['recipient', 'subject', 'status', 'attempts', 'event', 'integration', 'sent_at']
     list_filter = ['status', 'sent_at']
     readonly_fields = ['sent_at']
-    search_fields = ['recipient', 'subject', 'ses_message_id']
+    search_fields = ['recipient', 'subject', 'ses_message_id', 'task_id']
+    inlines = [DeliveryAttemptInline]
+
+
+@admin.register(DeliveryRollup)
+class DeliveryRollupAdmin(admin.ModelAdmin):
+    list_display = ['organization', 'environment', 'date', 'hour', 'event', 'integration', 'status', 'count']
+    list_filter = ['environment', 'status', 'date']
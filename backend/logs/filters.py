@@ -1,7 +1,21 @@
+import re
+
 import django_filters
+from django.contrib.postgres.search import SearchQuery
 from django.db import models
+from django.db.models.functions import Lower
+
+from .models import SEARCH_CONFIG, EmailLog, search_vector
+
+EMAIL_RE = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+# SES message ids look like 0100018d2c3b4a5e-1a2b3c4d-...-000000
+SES_MESSAGE_ID_RE = re.compile(r'^[0-9a-f]{16}-[0-9a-f]{8}(-[0-9a-f]+)+$', re.IGNORECASE)
+WORD_RE = re.compile(r'\w+')
 
-from .models import EmailLog
+
+def prefix_tsquery(value: str) -> str:
+    """Turn free text into a raw tsquery that prefix-matches every word."""
+    return ' & '.join(f'{word}:*' for word in WORD_RE.findall(value.lower()))
 
 
 class EmailLogFilter(django_filters.FilterSet):
@@ -15,14 +29,44 @@ class EmailLogFilter(django_filters.FilterSet):
     sent_after = django_filters.DateTimeFilter(field_name='sent_at', lookup_expr='gte')
     sent_before = django_filters.DateTimeFilter(field_name='sent_at', lookup_expr='lte')
     search = django_filters.CharFilter(method='search_filter')
+    search_mode = django_filters.ChoiceFilter(
+        choices=[('indexed', 'Indexed'), ('contains', 'Substring')],
+        method='search_mode_filter',
+    )
 
     class Meta:
         model = EmailLog
         fields = ['status', 'recipient', 'event', 'template', 'integration']
 
     def search_filter(self, queryset, name, value):
-        return queryset.filter(
-            models.Q(recipient__icontains=value)
-            | models.Q(subject__icontains=value)
-            | models.Q(ses_message_id__icontains=value)
+        """
+        Indexed search by default:
+        - an email address is a case-insensitive match on the recipient,
+          served by the index on lower(recipient)
+        - an SES message id is an exact match on the indexed ses_message_id
+        - anything else is a prefix full-text match on subject and recipient,
+          served by the GIN index on the same tsvector expression
+        `search_mode=contains` keeps the old unanchored substring match.
+        """
+        value = value.strip()
+        if self.data.get('search_mode') == 'contains':
+            return queryset.filter(
+                models.Q(recipient__icontains=value)
+                | models.Q(subject__icontains=value)
+                | models.Q(ses_message_id__icontains=value)
+            )
+        if EMAIL_RE.match(value):
+            return queryset.alias(recipient_lower=Lower('recipient')).filter(recipient_lower=value.lower())
+        if SES_MESSAGE_ID_RE.match(value):
+            return queryset.filter(ses_message_id=value)
+
+        query = prefix_tsquery(value)
+        if not query:
+            return queryset
+        return queryset.annotate(search_document=search_vector()).filter(
+            search_document=SearchQuery(query, config=SEARCH_CONFIG, search_type='raw'),
         )
+
+    def search_mode_filter(self, queryset, name, value):
+        # Only read by search_filter
+        return queryset
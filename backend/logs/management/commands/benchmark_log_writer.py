@@ -0,0 +1,63 @@
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from accounts.models import Organization
+from logs.models import DeliveryRollup, EmailLog
+from logs.writer import EmailLogWriter
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare rows/sec of the per-row EmailLog path (insert, then status update) '
+        'against the buffered bulk writer. Both run in autocommit, so the per-row path '
+        'commits every write and the buffered one every batch, against a scratch '
+        'organization whose rows are deleted afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=2000)
+        parser.add_argument('--batch-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        name = f'benchmark-log-writer-{uuid.uuid4().hex[:8]}'
+        org = Organization.objects.create(name=name)
+        user = get_user_model().objects.create(username=name, organization=org)
+        try:
+            per_row = self._run(user, rows, buffered=False, batch_size=options['batch_size'])
+            buffered = self._run(user, rows, buffered=True, batch_size=options['batch_size'])
+        finally:
+            EmailLog.objects.filter(organization=org).delete()
+            DeliveryRollup.objects.filter(organization=org).delete()
+            user.delete()
+            org.delete()
+
+        self.stdout.write(f'{rows} emails (pending insert + sent update each)')
+        self.stdout.write(f'  per-row:  {rows / per_row:,.0f} rows/sec')
+        self.stdout.write(f'  buffered: {rows / buffered:,.0f} rows/sec')
+        self.stdout.write(self.style.SUCCESS(f'  speedup:  {per_row / buffered:.1f}x'))
+
+    def _run(self, user, rows, buffered, batch_size):
+        writer = EmailLogWriter()
+        with override_settings(
+            EMAIL_LOG_BUFFERED=buffered,
+            EMAIL_LOG_WRITER_BATCH_SIZE=batch_size,
+            EMAIL_LOG_WRITER_MAX_DELAY=3600,
+        ):
+            start = time.perf_counter()
+            for i in range(rows):
+                log = writer.create(
+                    user_id=user.id,
+                    organization_id=user.organization_id,
+                    environment='sandbox',
+                    recipient=f'user{i}@example.com',
+                    subject='Benchmark',
+                    status='pending',
+                )
+                writer.update(log, status='sent', ses_message_id=f'bench-{i}')
+            writer.flush()
+            return time.perf_counter() - start
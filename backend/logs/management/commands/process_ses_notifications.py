@@ -0,0 +1,48 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from logs.notification_queues import SQSNotificationQueue, get_webhook_queue
+from logs.notifications import process_batch
+
+
+class Command(BaseCommand):
+    help = 'Apply queued SES bounce/complaint/delivery notifications to email logs in bulk'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', choices=['webhook', 'sqs'],
+                            help='Default: sqs if SES_NOTIFICATION_QUEUE_URL is set, else webhook')
+        parser.add_argument('--batch-size', type=int, default=settings.SES_NOTIFICATION_BATCH_SIZE)
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help='Seconds to sleep when the queue is empty (webhook source) or after an error')
+        parser.add_argument('--once', action='store_true', help='Process one batch and exit')
+
+    def handle(self, *args, **options):
+        source = options['source'] or ('sqs' if settings.SES_NOTIFICATION_QUEUE_URL else 'webhook')
+        if source == 'sqs':
+            if not settings.SES_NOTIFICATION_QUEUE_URL:
+                raise CommandError('SES_NOTIFICATION_QUEUE_URL is not set.')
+            queue = SQSNotificationQueue(settings.SES_NOTIFICATION_QUEUE_URL)
+        else:
+            queue = get_webhook_queue()
+
+        while True:
+            failed = False
+            try:
+                handled, retried = process_batch(queue, options['batch_size'])
+            except Exception as exc:
+                self.stderr.write(f'Processing failed: {exc}')
+                handled = retried = 0
+                failed = True
+                if options['once']:
+                    raise
+
+            if handled or retried:
+                self.stdout.write(f'Applied {handled} notification(s), {retried} queued for retry')
+            if options['once']:
+                return
+            if failed or (handled + retried < options['batch_size'] and source == 'webhook'):
+                time.sleep(options['interval'])
+            close_old_connections()
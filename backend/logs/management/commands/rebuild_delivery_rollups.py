@@ -0,0 +1,95 @@
+from collections import Counter
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count, Max, Min
+from django.db.models.functions import ExtractHour, TruncDate
+
+from accounts.models import Organization
+from logs.models import DeliveryRollup, EmailLog
+from logs.rollups import apply_deltas
+
+FIELDS = ('organization_id', 'environment', 'date', 'hour', 'event_id', 'integration_id', 'status')
+
+
+class Command(BaseCommand):
+    help = 'Recompute delivery rollups from the email log table (backfill or repair)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--organization', type=int, help='Only rebuild this organization id')
+        parser.add_argument('--days', type=int, default=7, help='Days of logs compared per transaction')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        # One organization, environment and date window at a time, with no
+        # lock: each window's logs and rollups are read from one snapshot and
+        # the difference goes out as ordinary deltas. Every log write commits
+        # together with its own rollup delta, so a write that lands after the
+        # snapshot is missing from both sides and its delta stays on top.
+        if options['organization']:
+            orgs = [options['organization']]
+        else:
+            orgs = list(Organization.objects.order_by('pk').values_list('pk', flat=True)) + [None]
+
+        corrected = 0
+        for org_id in orgs:
+            for environment, _ in EmailLog.ENVIRONMENT_CHOICES:
+                for start, end in self._windows(org_id, environment, options['days']):
+                    deltas = self._corrections(org_id, environment, start, end)
+                    rows = list(deltas.items())
+                    for i in range(0, len(rows), options['batch_size']):
+                        apply_deltas(Counter(dict(rows[i:i + options['batch_size']])))
+                    corrected += len(deltas)
+
+        self.stdout.write(self.style.SUCCESS(f'Corrected {corrected} rollup buckets.'))
+
+    def _windows(self, org_id, environment, days):
+        logs = EmailLog.objects.filter(organization_id=org_id, environment=environment).aggregate(
+            first=Min('sent_at'), last=Max('sent_at'),
+        )
+        rollups = DeliveryRollup.objects.filter(organization_id=org_id, environment=environment).aggregate(
+            first=Min('date'), last=Max('date'),
+        )
+        dates = [
+            d for d in (
+                logs['first'] and logs['first'].astimezone(dt_timezone.utc).date(),
+                logs['last'] and logs['last'].astimezone(dt_timezone.utc).date(),
+                rollups['first'], rollups['last'],
+            ) if d
+        ]
+        if not dates:
+            return
+        start, last = min(dates), max(dates)
+        while start <= last:
+            yield start, start + timedelta(days=days)
+            start += timedelta(days=days)
+
+    def _corrections(self, org_id, environment, start, end) -> Counter:
+        """Logged counts minus rollup counts for one window, read from a single snapshot."""
+        logs = (
+            EmailLog.objects.filter(
+                organization_id=org_id, environment=environment,
+                sent_at__gte=datetime.combine(start, time.min, dt_timezone.utc),
+                sent_at__lt=datetime.combine(end, time.min, dt_timezone.utc),
+            )
+            .annotate(date=TruncDate('sent_at'), hour=ExtractHour('sent_at'))
+            .values(*FIELDS)
+            .annotate(total=Count('id'))
+            .order_by()
+        )
+        rollups = DeliveryRollup.objects.filter(
+            organization_id=org_id, environment=environment, date__gte=start, date__lt=end,
+        ).values_list(*FIELDS, 'count')
+
+        deltas = Counter()
+        outermost = not connection.in_atomic_block
+        with transaction.atomic():
+            if outermost:
+                with connection.cursor() as cursor:
+                    cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY')
+            for bucket in logs:
+                deltas[tuple(bucket[field] for field in FIELDS)] += bucket['total']
+            for *key, count in rollups:
+                deltas[tuple(key)] -= count
+        return Counter({key: delta for key, delta in deltas.items() if delta})
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.15 on 2026-10-17 09:12
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently, RemoveIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Built concurrently so large log tables stay writable during the
+    # migration; the old index is only dropped once the new one is ready.
+    atomic = False
+
+    dependencies = [
+        ('events', '0002_alter_event_unique_together_event_environment_and_more'),
+        ('integrations', '0004_platforms3config'),
+        ('logs', '0002_emaillog_environment_and_more'),
+        ('templates_app', '0002_alter_emailtemplate_unique_together_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='emaillog',
+            index=models.Index(fields=['user', 'environment', '-sent_at', '-id'], name='logs_emaill_user_id_75dd99_idx'),
+        ),
+        RemoveIndexConcurrently(
+            model_name='emaillog',
+            name='logs_emaill_user_id_df2e46_idx',
+        ),
+    ]
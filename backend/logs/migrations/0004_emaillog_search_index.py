@@ -0,0 +1,27 @@
+# Generated by Django 5.1.15 on 2026-10-17 09:40
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # Built concurrently so large log tables stay writable during the migration
+    atomic = False
+
+    dependencies = [
+        ('events', '0002_alter_event_unique_together_event_environment_and_more'),
+        ('integrations', '0004_platforms3config'),
+        ('logs', '0003_emaillog_keyset_index'),
+        ('templates_app', '0002_alter_emailtemplate_unique_together_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='emaillog',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.search.SearchVector('subject', 'recipient', config='simple'), name='logs_emaillog_search_idx'),
+        ),
+    ]
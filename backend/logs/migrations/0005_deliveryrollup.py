@@ -0,0 +1,35 @@
+# Generated by Django 5.1.15 on 2026-10-17 10:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_bootstrap_eximpe_org'),
+        ('events', '0002_alter_event_unique_together_event_environment_and_more'),
+        ('integrations', '0004_platforms3config'),
+        ('logs', '0004_emaillog_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeliveryRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('environment', models.CharField(choices=[('sandbox', 'Sandbox'), ('production', 'Production')], max_length=20)),
+                ('date', models.DateField()),
+                ('hour', models.PositiveSmallIntegerField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('sent', 'Sent'), ('failed', 'Failed'), ('bounced', 'Bounced'), ('complained', 'Complained')], max_length=20)),
+                ('count', models.BigIntegerField(default=0)),
+                ('event', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='events.event')),
+                ('integration', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='integrations.sesintegration')),
+                ('organization', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='delivery_rollups', to='accounts.organization')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['organization', 'environment', 'date'], name='logs_delive_organiz_ba4724_idx')],
+                'constraints': [models.UniqueConstraint(fields=('organization', 'environment', 'date', 'hour', 'event', 'integration', 'status'), name='logs_deliveryrollup_bucket_uniq', nulls_distinct=False)],
+            },
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.1.15 on 2026-10-17 11:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently, RemoveIndexConcurrently
+from django.db import migrations, models
+
+FK_NAME = 'logs_emaillog_organization_id_ef796bc7_fk_accounts_'
+
+
+def backfill_organization(apps, schema_editor):
+    from accounts.backfill import backfill_organization as backfill
+
+    backfill(apps.get_model('logs', 'EmailLog'), apps.get_model('accounts', 'User'))
+
+
+class Migration(migrations.Migration):
+    # EmailLog is the largest table: the backfill commits per batch, indexes
+    # are built concurrently and the foreign key is added NOT VALID and
+    # validated afterwards, so the table stays writable throughout.
+    atomic = False
+
+    dependencies = [
+        ('accounts', '0008_apikey_organization_and_more'),
+        ('events', '0003_event_organization_and_more'),
+        ('integrations', '0005_sesintegration_organization_and_more'),
+        ('logs', '0005_deliveryrollup'),
+        ('templates_app', '0003_emailtemplate_organization_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddField(
+                    model_name='emaillog',
+                    name='organization',
+                    # The (organization, environment, -sent_at, -id) index covers FK lookups
+                    field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='email_logs', to='accounts.organization'),
+                ),
+            ],
+            database_operations=[
+                migrations.RunSQL(
+                    'ALTER TABLE "logs_emaillog" ADD COLUMN "organization_id" bigint NULL',
+                    'ALTER TABLE "logs_emaillog" DROP COLUMN "organization_id"',
+                ),
+                migrations.RunSQL(
+                    f'ALTER TABLE "logs_emaillog" ADD CONSTRAINT "{FK_NAME}" FOREIGN KEY ("organization_id") '
+                    f'REFERENCES "accounts_organization" ("id") DEFERRABLE INITIALLY DEFERRED NOT VALID',
+                    f'ALTER TABLE "logs_emaillog" DROP CONSTRAINT "{FK_NAME}"',
+                ),
+            ],
+        ),
+        migrations.RunPython(backfill_organization, migrations.RunPython.noop),
+        migrations.RunSQL(
+            f'ALTER TABLE "logs_emaillog" VALIDATE CONSTRAINT "{FK_NAME}"',
+            migrations.RunSQL.noop,
+        ),
+        AddIndexConcurrently(
+            model_name='emaillog',
+            index=models.Index(fields=['organization', 'environment', '-sent_at', '-id'], name='logs_emaill_organiz_125ea4_idx'),
+        ),
+        RemoveIndexConcurrently(
+            model_name='emaillog',
+            name='logs_emaill_user_id_75dd99_idx',
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.1.15 on 2026-10-17 13:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logs', '0006_emaillog_organization'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emaillog',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        # Nullable with no default, so adding it does not rewrite the table.
+        # The unique index is built concurrently in 0010.
+        migrations.AddField(
+            model_name='emaillog',
+            name='task_id',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.CreateModel(
+            name='DeliveryAttempt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attempt', models.PositiveSmallIntegerField()),
+                ('started_at', models.DateTimeField()),
+                ('finished_at', models.DateTimeField()),
+                ('latency_ms', models.PositiveIntegerField()),
+                ('error_code', models.CharField(blank=True, max_length=64)),
+                ('log', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='delivery_attempts', to='logs.emaillog')),
+            ],
+            options={
+                'ordering': ['log', 'attempt'],
+                'constraints': [models.UniqueConstraint(fields=('log', 'attempt'), name='logs_deliveryattempt_log_attempt_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.15 on 2026-10-17 16:10
+
+import django.db.models.functions.text
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Built concurrently so large log tables stay writable during the migration
+    atomic = False
+
+    dependencies = [
+        ('logs', '0008_emaillog_delivered_status'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='emaillog',
+            index=models.Index(django.db.models.functions.text.Lower('recipient'), name='logs_emaillog_rcpt_lower_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.15 on 2026-10-17 17:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # The unique index is built concurrently so the log table stays writable,
+    # then attached as the field's constraint, which only needs a brief lock.
+    # Task ids are only matched exactly, so the varchar_pattern_ops "_like"
+    # index Django adds for unique CharFields is left out.
+    atomic = False
+
+    dependencies = [
+        ('logs', '0009_emaillog_recipient_lower_index'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='emaillog',
+                    name='task_id',
+                    field=models.CharField(blank=True, max_length=255, null=True, unique=True),
+                ),
+            ],
+            database_operations=[
+                migrations.RunSQL(
+                    'CREATE UNIQUE INDEX CONCURRENTLY "logs_emaillog_task_id_key" '
+                    'ON "logs_emaillog" ("task_id");',
+                    reverse_sql='DROP INDEX CONCURRENTLY IF EXISTS "logs_emaillog_task_id_key";',
+                ),
+                migrations.RunSQL(
+                    'ALTER TABLE "logs_emaillog" ADD CONSTRAINT "logs_emaillog_task_id_key" '
+                    'UNIQUE USING INDEX "logs_emaillog_task_id_key";',
+                    reverse_sql='ALTER TABLE "logs_emaillog" DROP CONSTRAINT "logs_emaillog_task_id_key";',
+                ),
+            ],
+        ),
+    ]
@@ -1,5 +1,15 @@
 from django.conf import settings
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
+from django.db import models, transaction
+from django.db.models.functions import Lower
+
+# Shared by the GIN index and EmailLogFilter so the planner can match them.
+SEARCH_CONFIG = 'simple'
+
+
+def search_vector():
+    return SearchVector('subject', 'recipient', config=SEARCH_CONFIG)
 
 
 class EmailLog(models.Model):
@@ -11,10 +21,13 @@ class EmailLog(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
         ('sent', 'Sent'),
+        ('delivered', 'Delivered'),
         ('failed', 'Failed'),
         ('bounced', 'Bounced'),
         ('complained', 'Complained'),
     ]
+    # Accepted by SES, whatever happened afterwards
+    ACCEPTED_STATUSES = ['sent', 'delivered', 'bounced', 'complained']
 
     event = models.ForeignKey(
         'events.Event',
@@ -39,6 +52,15 @@ class EmailLog(models.Model):
         on_delete=models.CASCADE,
         related_name='email_logs',
     )
+    organization = models.ForeignKey(
+        'accounts.Organization',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='email_logs',
+        # Served by the (organization, environment, -sent_at, -id) index
+        db_index=False,
+    )
     environment = models.CharField(
         max_length=20,
         choices=ENVIRONMENT_CHOICES,
@@ -55,6 +77,9 @@ class EmailLog(models.Model):
     )
     ses_message_id = models.CharField(max_length=255, blank=True, db_index=True)
     error_message = models.TextField(blank=True)
+    # One row per logical message: retries of the same Celery task reuse it
+    task_id = models.CharField(max_length=255, null=True, blank=True, unique=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
     metadata = models.JSONField(default=dict, blank=True)
     sent_at = models.DateTimeField(auto_now_add=True, db_index=True)
 
@@ -63,8 +88,103 @@ class EmailLog(models.Model):
         indexes = [
             models.Index(fields=['user', '-sent_at']),
             models.Index(fields=['user', 'status']),
-            models.Index(fields=['user', 'environment', '-sent_at']),
+            models.Index(fields=['organization', 'environment', '-sent_at', '-id']),
+            GinIndex(search_vector(), name='logs_emaillog_search_idx'),
+            # Case-insensitive recipient lookups from EmailLogFilter
+            models.Index(Lower('recipient'), name='logs_emaillog_rcpt_lower_idx'),
         ]
 
+    # Status as last persisted, so save() can move the rollup count from the
+    # old status bucket to the new one.
+    _rollup_status = None
+
     def __str__(self):
         return f"{self.recipient} - {self.status} - {self.sent_at}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._rollup_status = instance.__dict__.get('status')
+        return instance
+
+    def save(self, *args, **kwargs):
+        from .rollups import record_status_change
+
+        previous = self._rollup_status
+        if self.organization_id is None:
+            self.organization_id = self.user.organization_id
+        # The row and its rollup delta commit together, so
+        # rebuild_delivery_rollups never sees one without the other
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if previous != self.status:
+                record_status_change(self, previous, self.status)
+        self._rollup_status = self.status
+
+
+class DeliveryAttempt(models.Model):
+    """One SES send attempt for an EmailLog."""
+    log = models.ForeignKey(EmailLog, on_delete=models.CASCADE, related_name='delivery_attempts')
+    attempt = models.PositiveSmallIntegerField()
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField()
+    latency_ms = models.PositiveIntegerField()
+    error_code = models.CharField(max_length=64, blank=True)
+
+    class Meta:
+        ordering = ['log', 'attempt']
+        constraints = [
+            models.UniqueConstraint(fields=['log', 'attempt'], name='logs_deliveryattempt_log_attempt_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.log_id} #{self.attempt} {self.error_code or 'ok'} ({self.latency_ms}ms)"
+
+
+class DeliveryRollup(models.Model):
+    """
+    Pre-aggregated EmailLog counts per hour bucket. Kept in step with the log
+    table by EmailLog.save()/delete; `manage.py rebuild_delivery_rollups`
+    recomputes it from scratch.
+    """
+    organization = models.ForeignKey(
+        'accounts.Organization',
+        on_delete=models.CASCADE,
+        null=True,
+        related_name='delivery_rollups',
+    )
+    environment = models.CharField(max_length=20, choices=EmailLog.ENVIRONMENT_CHOICES)
+    date = models.DateField()
+    hour = models.PositiveSmallIntegerField()
+    # No FK constraints: rollups must outlive deleted events and integrations
+    event = models.ForeignKey(
+        'events.Event',
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        related_name='+',
+    )
+    integration = models.ForeignKey(
+        'integrations.SESIntegration',
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        related_name='+',
+    )
+    status = models.CharField(max_length=20, choices=EmailLog.STATUS_CHOICES)
+    count = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['organization', 'environment', 'date', 'hour', 'event', 'integration', 'status'],
+                name='logs_deliveryrollup_bucket_uniq',
+                nulls_distinct=False,
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['organization', 'environment', 'date']),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.hour:02d}h {self.status}: {self.count}"
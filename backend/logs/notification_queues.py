@@ -0,0 +1,260 @@
+"""
+Sources of SES notifications for process_ses_notifications.
+
+All queues expose receive(n) -> [QueueMessage], ack(messages),
+nack(messages) and release(messages). SQSNotificationQueue polls an SQS
+queue subscribed to the SES SNS topic; unacknowledged messages reappear
+after the visibility timeout. The webhook pushes onto RedisNotificationQueue,
+which works the same way: receive moves messages from the ready list into a
+processing set scored by SES_NOTIFICATION_VISIBILITY_TIMEOUT, and only ack
+removes them, so a poller that dies mid-batch leaves its messages to be
+received again. nack schedules a retry in a delayed set after an
+exponential backoff (SES_NOTIFICATION_RETRY_BASE doubling up to
+SES_NOTIFICATION_RETRY_MAX), which gives a buffered EmailLog time to be
+written before its notification is tried again, until
+SES_NOTIFICATION_MAX_ATTEMPTS is reached. release puts a batch that could
+not be applied back at the head without counting an attempt.
+MemoryNotificationQueue behaves the same in-process, for tests.
+"""
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import deque, namedtuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+QueueMessage = namedtuple('QueueMessage', ['handle', 'body'])
+
+SQS_MAX_MESSAGES = 10
+
+
+class SQSNotificationQueue:
+    def __init__(self, queue_url: str, client=None):
+        self.queue_url = queue_url
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            import boto3
+
+            # Unset falls back to boto3's own region lookup (AWS_DEFAULT_REGION, config files)
+            self._client = boto3.client(
+                'sqs',
+                region_name=settings.SES_NOTIFICATION_SQS_REGION or None,
+                endpoint_url=settings.SES_NOTIFICATION_SQS_ENDPOINT_URL or None,
+            )
+        return self._client
+
+    def receive(self, max_messages: int) -> list[QueueMessage]:
+        messages = []
+        wait = 20
+        while len(messages) < max_messages:
+            response = self.client.receive_message(
+                QueueUrl=self.queue_url,
+                MaxNumberOfMessages=min(SQS_MAX_MESSAGES, max_messages - len(messages)),
+                WaitTimeSeconds=wait,
+            )
+            received = response.get('Messages', [])
+            if not received:
+                break
+            messages.extend(QueueMessage(m['ReceiptHandle'], m['Body']) for m in received)
+            # Long-poll only until the first message; then drain what is there
+            wait = 0
+        return messages
+
+    def ack(self, messages):
+        for start in range(0, len(messages), SQS_MAX_MESSAGES):
+            chunk = messages[start:start + SQS_MAX_MESSAGES]
+            self.client.delete_message_batch(
+                QueueUrl=self.queue_url,
+                Entries=[{'Id': str(i), 'ReceiptHandle': m.handle} for i, m in enumerate(chunk)],
+            )
+
+    def nack(self, messages):
+        # Left in flight; SQS redelivers after the visibility timeout and the
+        # queue's redrive policy retires messages that keep failing.
+        pass
+
+    def release(self, messages):
+        self.nack(messages)
+
+
+# KEYS: ready list, delayed zset, processing zset
+# ARGV: count, now, visible until
+RECEIVE_SCRIPT = """
+for _, item in ipairs(redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[2])) do
+    redis.call('RPUSH', KEYS[1], item)
+    redis.call('ZREM', KEYS[2], item)
+end
+-- Received but never acknowledged in time: the poller died, so back to the head
+for _, item in ipairs(redis.call('ZRANGEBYSCORE', KEYS[3], '-inf', ARGV[2])) do
+    redis.call('LPUSH', KEYS[1], item)
+    redis.call('ZREM', KEYS[3], item)
+end
+local items = redis.call('LPOP', KEYS[1], ARGV[1]) or {}
+for _, item in ipairs(items) do
+    redis.call('ZADD', KEYS[3], ARGV[3], item)
+end
+return items
+"""
+
+
+def retry_delay(attempts: int) -> float:
+    """Seconds before the `attempts`-th retry of a notification."""
+    return min(settings.SES_NOTIFICATION_RETRY_MAX, settings.SES_NOTIFICATION_RETRY_BASE * 2 ** (attempts - 1))
+
+
+class _ListQueue:
+    def push(self, body: str):
+        self._push([self._entry(body, 0)])
+
+    def receive(self, max_messages: int) -> list[QueueMessage]:
+        now = self.clock()
+        items = self._receive(max_messages, now, now + settings.SES_NOTIFICATION_VISIBILITY_TIMEOUT)
+        return [QueueMessage(item, json.loads(item)['body']) for item in items]
+
+    def ack(self, messages):
+        if messages:
+            self._ack([message.handle for message in messages])
+
+    def nack(self, messages):
+        if not messages:
+            return
+        now = self.clock()
+        retry = []
+        for message in messages:
+            entry = json.loads(message.handle)
+            attempts = entry['attempts'] + 1
+            if attempts >= settings.SES_NOTIFICATION_MAX_ATTEMPTS:
+                logger.warning(f"Giving up on SES notification after {attempts} attempts")
+                continue
+            retry.append((self._entry(entry['body'], attempts), now + retry_delay(attempts)))
+        self._retry([message.handle for message in messages], retry)
+
+    def release(self, messages):
+        if messages:
+            self._release([message.handle for message in messages])
+
+    @staticmethod
+    def _entry(body: str, attempts: int) -> str:
+        # The id keeps identical bodies apart in the processing and delayed sets
+        return json.dumps({'id': uuid.uuid4().hex, 'body': body, 'attempts': attempts})
+
+
+class RedisNotificationQueue(_ListQueue):
+    key = 'ses:notifications'
+    delayed_key = 'ses:notifications:delayed'
+    processing_key = 'ses:notifications:processing'
+
+    def __init__(self):
+        self._receive_script = None
+        self.clock = time.time
+
+    def _push(self, items):
+        from xyno.redis import get_redis
+
+        get_redis().rpush(self.key, *items)
+
+    def _receive(self, count, now, visible_until):
+        from xyno.redis import get_redis
+
+        if self._receive_script is None:
+            self._receive_script = get_redis().register_script(RECEIVE_SCRIPT)
+        items = self._receive_script(
+            keys=[self.key, self.delayed_key, self.processing_key], args=[count, now, visible_until],
+        )
+        return [item.decode() for item in items]
+
+    def _ack(self, handles):
+        from xyno.redis import get_redis
+
+        get_redis().zrem(self.processing_key, *handles)
+
+    def _retry(self, handles, retry):
+        from xyno.redis import get_redis
+
+        pipe = get_redis().pipeline()
+        if retry:
+            pipe.zadd(self.delayed_key, dict(retry))
+        pipe.zrem(self.processing_key, *handles)
+        pipe.execute()
+
+    def _release(self, handles):
+        from xyno.redis import get_redis
+
+        pipe = get_redis().pipeline()
+        pipe.lpush(self.key, *reversed(handles))
+        pipe.zrem(self.processing_key, *handles)
+        pipe.execute()
+
+
+class MemoryNotificationQueue(_ListQueue):
+    def __init__(self):
+        self._items = deque()
+        self._delayed = {}
+        self._processing = {}
+        self._lock = threading.Lock()
+        self.clock = time.time
+
+    def _push(self, items):
+        with self._lock:
+            self._items.extend(items)
+
+    def _receive(self, count, now, visible_until):
+        with self._lock:
+            due = sorted((at, item) for item, at in self._delayed.items() if at <= now)
+            for _, item in due:
+                del self._delayed[item]
+                self._items.append(item)
+            expired = [item for item, at in self._processing.items() if at <= now]
+            for item in expired:
+                del self._processing[item]
+            self._items.extendleft(reversed(expired))
+            items = [self._items.popleft() for _ in range(min(count, len(self._items)))]
+            for item in items:
+                self._processing[item] = visible_until
+            return items
+
+    def _ack(self, handles):
+        with self._lock:
+            for handle in handles:
+                self._processing.pop(handle, None)
+
+    def _retry(self, handles, retry):
+        with self._lock:
+            self._delayed.update(retry)
+            for handle in handles:
+                self._processing.pop(handle, None)
+
+    def _release(self, handles):
+        with self._lock:
+            self._items.extendleft(reversed(handles))
+            for handle in handles:
+                self._processing.pop(handle, None)
+
+    def __len__(self):
+        """Messages not yet acknowledged: ready, delayed or being processed."""
+        return len(self._items) + len(self._delayed) + len(self._processing)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._delayed.clear()
+            self._processing.clear()
+        self.clock = time.time
+
+
+_webhook_queues = {}
+
+
+def get_webhook_queue():
+    """The queue the SNS webhook pushes to, per SES_NOTIFICATION_BACKEND."""
+    backend = settings.SES_NOTIFICATION_BACKEND
+    if backend not in _webhook_queues:
+        _webhook_queues[backend] = MemoryNotificationQueue() if backend == 'memory' else RedisNotificationQueue()
+    return _webhook_queues[backend]
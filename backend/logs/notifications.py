@@ -0,0 +1,179 @@
+"""
+Bulk ingestion of SES bounce, complaint and delivery notifications.
+
+Notifications arrive through the SNS webhook (queued, not applied inline) or
+an SQS queue, and `manage.py process_ses_notifications` applies them in
+batches. A batch is grouped by target status and detail and applied with one
+UPDATE ... WHERE ses_message_id = ANY(...) per group, returning the previous
+status so the DeliveryRollup deltas for the whole batch go out in a single
+upsert. Hard bounces and complaints also feed the suppression list.
+
+Statuses only move forward (sent -> delivered -> bounced -> complained), so
+out-of-order notifications are harmless. Notifications for message ids that
+are not in the log yet (the sending worker has not flushed) are handed back
+to the queue and retried after a backoff.
+"""
+import json
+import logging
+from collections import Counter, defaultdict, namedtuple
+from types import SimpleNamespace
+
+from django.db import connection, transaction
+
+from .models import EmailLog
+from .rollups import apply_deltas, bucket_key
+
+logger = logging.getLogger(__name__)
+
+Notification = namedtuple('Notification', ['message_id', 'status', 'detail'])
+
+STATUS_RANK = {'delivered': 1, 'bounced': 2, 'complained': 3}
+
+# Statuses a notification may move a log from
+UPDATABLE_FROM = {
+    'delivered': ['pending', 'sent'],
+    'bounced': ['pending', 'sent', 'delivered'],
+    'complained': ['pending', 'sent', 'delivered', 'bounced'],
+}
+
+UPDATE_SQL = """
+    WITH matched AS (
+        SELECT id, status FROM {table}
+        WHERE ses_message_id = ANY(%s) AND status = ANY(%s)
+        ORDER BY id
+        FOR UPDATE
+    )
+    UPDATE {table} AS log
+    SET status = %s, error_message = COALESCE(NULLIF(%s, ''), log.error_message)
+    FROM matched
+    WHERE log.id = matched.id
+    RETURNING log.ses_message_id, log.organization_id, log.environment, log.sent_at,
+              log.event_id, log.integration_id, log.recipient, matched.status
+"""
+
+UPDATE_CHUNK_SIZE = 1000
+
+
+def parse_notification(body) -> Notification | None:
+    """
+    Parse an SES notification (raw, or wrapped in an SNS envelope). Returns
+    None for notifications that do not change a log, such as soft bounces.
+    Raises ValueError for malformed input.
+    """
+    data = json.loads(body) if isinstance(body, (str, bytes)) else body
+    if not isinstance(data, dict):
+        raise ValueError('Notification is not a JSON object')
+    if data.get('Type') == 'Notification' and 'Message' in data:
+        data = json.loads(data['Message'])
+
+    kind = data.get('notificationType') or data.get('eventType')
+    message_id = (data.get('mail') or {}).get('messageId')
+    if not kind or not message_id:
+        raise ValueError('Not an SES notification')
+
+    if kind == 'Bounce':
+        bounce = data.get('bounce') or {}
+        if bounce.get('bounceType') != 'Permanent':
+            return None
+        return Notification(message_id, 'bounced', f"Bounce: Permanent/{bounce.get('bounceSubType', 'General')}")
+    if kind == 'Complaint':
+        feedback = (data.get('complaint') or {}).get('complaintFeedbackType', 'unspecified')
+        return Notification(message_id, 'complained', f"Complaint: {feedback}")
+    if kind == 'Delivery':
+        return Notification(message_id, 'delivered', '')
+    return None
+
+
+def apply_notifications(notifications) -> set[str]:
+    """
+    Apply notifications in bulk. Returns the message ids found in the log
+    (updated, or already at a later status); the rest are unknown so far.
+    """
+    from suppressions.index import REASON_BY_STATUS, suppress
+
+    latest = {}
+    for notification in notifications:
+        current = latest.get(notification.message_id)
+        if current is None or STATUS_RANK[notification.status] > STATUS_RANK[current.status]:
+            latest[notification.message_id] = notification
+    if not latest:
+        return set()
+
+    groups = defaultdict(list)
+    for notification in latest.values():
+        groups[(notification.status, notification.detail)].append(notification.message_id)
+
+    sql = UPDATE_SQL.format(table=EmailLog._meta.db_table)
+    deltas = Counter()
+    found = set()
+    to_suppress = defaultdict(lambda: defaultdict(set))
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            for (status, detail), message_ids in groups.items():
+                message_ids.sort()
+                for start in range(0, len(message_ids), UPDATE_CHUNK_SIZE):
+                    chunk = message_ids[start:start + UPDATE_CHUNK_SIZE]
+                    cursor.execute(sql, [chunk, UPDATABLE_FROM[status], status, detail])
+                    for message_id, org_id, env, sent_at, event_id, integration_id, recipient, previous in cursor.fetchall():
+                        found.add(message_id)
+                        log = SimpleNamespace(
+                            organization_id=org_id, environment=env, sent_at=sent_at,
+                            event_id=event_id, integration_id=integration_id,
+                        )
+                        deltas[bucket_key(log, previous)] -= 1
+                        deltas[bucket_key(log, status)] += 1
+                        if status in REASON_BY_STATUS:
+                            to_suppress[org_id][REASON_BY_STATUS[status]].add(recipient)
+
+        apply_deltas(deltas)
+        for org_id, by_reason in to_suppress.items():
+            for reason, recipients in by_reason.items():
+                suppress(org_id, recipients, reason)
+
+    missing = set(latest) - found
+    if missing:
+        found |= set(
+            EmailLog.objects.filter(ses_message_id__in=missing).values_list('ses_message_id', flat=True)
+        )
+    return found
+
+
+def process_batch(queue, batch_size: int) -> tuple[int, int]:
+    """
+    Receive, parse and apply one batch from a notification queue. Returns
+    (handled, retried). Malformed and irrelevant messages are acknowledged.
+    If applying the batch fails, its messages are released back to the queue
+    and the error is raised.
+    """
+    messages = queue.receive(batch_size)
+    if not messages:
+        return 0, 0
+
+    done, parsed = [], []
+    for message in messages:
+        try:
+            notification = parse_notification(message.body)
+        except (ValueError, KeyError, TypeError) as exc:
+            logger.warning(f"Dropping unreadable SES notification: {exc}")
+            done.append(message)
+            continue
+        if notification is None:
+            done.append(message)
+        else:
+            parsed.append((message, notification))
+
+    try:
+        found = apply_notifications([n for _, n in parsed])
+    except Exception:
+        # Nothing was applied; hand the batch back for the next pass
+        queue.ack(done)
+        queue.release([message for message, _ in parsed])
+        raise
+    retry = []
+    for message, notification in parsed:
+        (done if notification.message_id in found else retry).append(message)
+
+    queue.ack(done)
+    queue.nack(retry)
+    return len(done), len(retry)
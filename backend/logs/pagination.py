@@ -0,0 +1,96 @@
+import base64
+import json
+from datetime import datetime
+
+from django.db import connection
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def estimate_count(queryset):
+    """Planner row estimate for the queryset, without running COUNT(*)."""
+    if connection.vendor != 'postgresql':
+        return None
+    try:
+        plan = json.loads(queryset.order_by().explain(format='json'))
+        return int(plan[0]['Plan']['Plan Rows'])
+    except Exception:
+        return None
+
+
+class EmailLogPagination(PageNumberPagination):
+    """
+    Page-number pagination by default; keyset pagination on opt-in.
+
+    Pass `?pagination=cursor` (or the `cursor` from a previous response) to
+    page by (sent_at, id) descending. Each page is a range scan on the
+    (organization, environment, -sent_at, -id) index, with no COUNT(*) and no
+    OFFSET, so deep pages cost the same as the first. The total is reported
+    as a planner estimate. Any `ordering` parameter is ignored in this mode.
+    """
+    mode_query_param = 'pagination'
+    cursor_query_param = 'cursor'
+    cursor_page_size_query_param = 'page_size'
+    max_cursor_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.use_cursor = (
+            request.query_params.get(self.mode_query_param) == 'cursor'
+            or self.cursor_query_param in request.query_params
+        )
+        if not self.use_cursor:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        page_size = self._get_cursor_page_size(request)
+        position = self._decode_cursor(request.query_params.get(self.cursor_query_param))
+
+        self.estimated_count = estimate_count(queryset)
+        queryset = queryset.order_by('-sent_at', '-id')
+        if position:
+            sent_at, pk = position
+            queryset = queryset.filter(Q(sent_at__lt=sent_at) | Q(sent_at=sent_at, id__lt=pk))
+
+        rows = list(queryset[:page_size + 1])
+        self.next_position = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            self.next_position = (rows[-1].sent_at, rows[-1].id)
+        return rows
+
+    def get_paginated_response(self, data):
+        if not self.use_cursor:
+            return super().get_paginated_response(data)
+        return Response({
+            'estimated_count': self.estimated_count,
+            'next': self._get_next_cursor_link(),
+            'results': data,
+        })
+
+    def _get_cursor_page_size(self, request):
+        try:
+            size = int(request.query_params[self.cursor_page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_cursor_page_size))
+
+    def _get_next_cursor_link(self):
+        if self.next_position is None:
+            return None
+        sent_at, pk = self.next_position
+        token = base64.urlsafe_b64encode(f'{sent_at.isoformat()}|{pk}'.encode()).decode()
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.mode_query_param)
+        return replace_query_param(url, self.cursor_query_param, token)
+
+    def _decode_cursor(self, token):
+        if not token:
+            return None
+        try:
+            sent_at, pk = base64.urlsafe_b64decode(token.encode()).decode().split('|')
+            return datetime.fromisoformat(sent_at), int(pk)
+        except (ValueError, UnicodeDecodeError):
+            raise NotFound('Invalid cursor.')
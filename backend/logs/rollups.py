@@ -0,0 +1,55 @@
+"""
+Incremental maintenance of DeliveryRollup counts.
+
+Callers describe changes as a Counter of {bucket key: delta}; all deltas are
+applied with one INSERT ... ON CONFLICT DO UPDATE statement, so moving a log
+from one status to another costs a single round-trip.
+"""
+from collections import Counter
+from datetime import timezone as dt_timezone
+
+from django.db import connection
+
+from .models import DeliveryRollup
+
+UPSERT_SQL = """
+    INSERT INTO {table}
+        (organization_id, environment, date, hour, event_id, integration_id, status, count)
+    VALUES {values}
+    ON CONFLICT ON CONSTRAINT logs_deliveryrollup_bucket_uniq
+    DO UPDATE SET count = {table}.count + EXCLUDED.count
+"""
+
+
+def bucket_key(log, status) -> tuple:
+    sent_at = log.sent_at.astimezone(dt_timezone.utc)
+    return (
+        log.organization_id, log.environment, sent_at.date(), sent_at.hour,
+        log.event_id, log.integration_id, status,
+    )
+
+
+def apply_deltas(deltas: Counter):
+    rows = [(key, delta) for key, delta in deltas.items() if delta]
+    if not rows:
+        return
+    # Stable lock order across concurrent writers avoids deadlocks
+    rows.sort(key=lambda row: tuple('' if part is None else str(part) for part in row[0]))
+
+    params = []
+    for key, delta in rows:
+        params.extend(key)
+        params.append(delta)
+    values = ', '.join(['(%s, %s, %s, %s, %s, %s, %s, %s)'] * len(rows))
+    sql = UPSERT_SQL.format(table=DeliveryRollup._meta.db_table, values=values)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def record_status_change(log, previous: str | None, current: str | None):
+    deltas = Counter()
+    if previous:
+        deltas[bucket_key(log, previous)] -= 1
+    if current:
+        deltas[bucket_key(log, current)] += 1
+    apply_deltas(deltas)
@@ -16,6 +16,6 @@ class EmailLogSerializer(serializers.ModelSerializer):
             'template', 'template_name',
             'integration', 'integration_name',
             'recipient', 'subject', 'status',
-            'ses_message_id', 'error_message',
+            'ses_message_id', 'error_message', 'task_id', 'attempts',
             'metadata', 'sent_at',
         ]
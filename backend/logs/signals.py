@@ -0,0 +1,10 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import EmailLog
+from .rollups import record_status_change
+
+
+@receiver(post_delete, sender=EmailLog)
+def remove_from_rollups(sender, instance, **kwargs):
+    record_status_change(instance, instance._rollup_status or instance.status, None)
@@ -0,0 +1,68 @@
+"""
+Verification of Amazon SNS message signatures for the notification webhook.
+See https://docs.aws.amazon.com/sns/latest/dg/sns-verify-signature-of-message.html
+"""
+import base64
+import re
+import urllib.request
+from functools import lru_cache
+from urllib.parse import urlparse
+
+from cryptography import x509
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import padding
+
+SNS_HOST_RE = re.compile(r'^sns\.[a-z0-9-]+\.amazonaws\.com(\.cn)?$')
+
+NOTIFICATION_FIELDS = ['Message', 'MessageId', 'Subject', 'Timestamp', 'TopicArn', 'Type']
+SUBSCRIPTION_FIELDS = ['Message', 'MessageId', 'SubscribeURL', 'Timestamp', 'Token', 'TopicArn', 'Type']
+
+
+def is_sns_url(url: str) -> bool:
+    parsed = urlparse(url or '')
+    return parsed.scheme == 'https' and bool(SNS_HOST_RE.match(parsed.hostname or ''))
+
+
+class CertificateUnavailable(Exception):
+    """The signing certificate could not be fetched; the message is neither valid nor invalid yet."""
+
+
+@lru_cache(maxsize=16)
+def _certificate(url: str):
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            pem = response.read()
+    except OSError as exc:
+        # URLError and timeouts; failures are not cached, so the next message tries again
+        raise CertificateUnavailable(f'Could not fetch {url}: {exc}') from exc
+    return x509.load_pem_x509_certificate(pem)
+
+
+def verify_sns_message(envelope: dict) -> bool:
+    """Raises CertificateUnavailable if the signing certificate cannot be fetched."""
+    cert_url = envelope.get('SigningCertURL', '')
+    if not is_sns_url(cert_url) or not cert_url.endswith('.pem'):
+        return False
+
+    fields = NOTIFICATION_FIELDS if envelope.get('Type') == 'Notification' else SUBSCRIPTION_FIELDS
+    string_to_sign = ''.join(f"{name}\n{envelope[name]}\n" for name in fields if name in envelope)
+    algorithm = hashes.SHA256() if envelope.get('SignatureVersion') == '2' else hashes.SHA1()
+    try:
+        _certificate(cert_url).public_key().verify(
+            base64.b64decode(envelope.get('Signature', '')),
+            string_to_sign.encode(),
+            padding.PKCS1v15(),
+            algorithm,
+        )
+    except (InvalidSignature, ValueError):
+        return False
+    return True
+
+
+def confirm_subscription(envelope: dict) -> bool:
+    url = envelope.get('SubscribeURL', '')
+    if not is_sns_url(url):
+        return False
+    with urllib.request.urlopen(url, timeout=5):
+        return True
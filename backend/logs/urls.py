@@ -1,12 +1,13 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import DashboardStatsView, EmailLogViewSet
+from .views import DashboardStatsView, EmailLogViewSet, SESNotificationWebhookView
 
 router = DefaultRouter()
 router.register(r'', EmailLogViewSet, basename='email-log')
 
 urlpatterns = [
     path('dashboard-stats/', DashboardStatsView.as_view(), name='dashboard-stats'),
+    path('ses-notifications/', SESNotificationWebhookView.as_view(), name='ses-notifications'),
     path('', include(router.urls)),
 ]
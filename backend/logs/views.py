@@ -1,9 +1,13 @@
+import json
+import logging
 from datetime import timedelta
 
-from django.db.models import Count, Q
+from django.conf import settings
+from django.db.models import Q, Sum
+from django.db.models.functions import Coalesce
 from django.utils import timezone
-from rest_framework import viewsets
-from rest_framework.permissions import IsAuthenticated
+from rest_framework import status, viewsets
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
@@ -14,19 +18,25 @@ from templates_app.models import EmailTemplate
 from xyno.utils import get_environment_from_request
 
 from .filters import EmailLogFilter
-from .models import EmailLog
+from .models import DeliveryRollup, EmailLog
+from .notification_queues import get_webhook_queue
+from .pagination import EmailLogPagination
 from .serializers import EmailLogSerializer
+from .sns import CertificateUnavailable, confirm_subscription, verify_sns_message
+
+logger = logging.getLogger(__name__)
 
 
 class EmailLogViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = EmailLogSerializer
     permission_classes = [IsAuthenticated]
     filterset_class = EmailLogFilter
+    pagination_class = EmailLogPagination
 
     def get_queryset(self):
         env = get_environment_from_request(self.request)
         return EmailLog.objects.filter(
-            user__organization=self.request.user.organization, environment=env
+            organization_id=self.request.user.organization_id, environment=env
         ).select_related('event', 'template', 'integration')
 
 
@@ -40,36 +50,94 @@ class DashboardStatsView(APIView):
         last_7_days = today - timedelta(days=7)
         last_30_days = today - timedelta(days=30)
 
-        org = user.organization
-        logs = EmailLog.objects.filter(user__organization=org, environment=env)
+        org_id = user.organization_id
+        rollups = DeliveryRollup.objects.filter(organization_id=org_id, environment=env)
+
+        def total(**filters):
+            return Coalesce(Sum('count', filter=Q(**filters)), 0)
+
+        accepted = EmailLog.ACCEPTED_STATUSES
+        totals = rollups.aggregate(
+            total_sent=total(status__in=accepted),
+            total_failed=total(status='failed'),
+            total_bounced=total(status='bounced'),
+            total_complained=total(status='complained'),
+            sent_today=total(status__in=accepted, date=today),
+            sent_last_7_days=total(status__in=accepted, date__gte=last_7_days),
+            sent_last_30_days=total(status__in=accepted, date__gte=last_30_days),
+        )
 
         daily_breakdown = list(
-            logs.filter(sent_at__date__gte=last_7_days)
-            .values('sent_at__date')
-            .annotate(
-                sent=Count('id', filter=Q(status='sent')),
-                failed=Count('id', filter=Q(status='failed')),
-            )
-            .order_by('sent_at__date')
+            rollups.filter(date__gte=last_7_days)
+            .values('date')
+            .annotate(sent=total(status__in=accepted), failed=total(status='failed'))
+            .order_by('date')
         )
 
         for item in daily_breakdown:
-            item['date'] = str(item.pop('sent_at__date'))
+            item['date'] = str(item['date'])
 
+        # The only EmailLog read left on the dashboard: ten rows off the top
+        # of the (organization, environment, -sent_at, -id) index
         recent_logs = EmailLogSerializer(
-            logs.order_by('-sent_at')[:10], many=True
+            EmailLog.objects.filter(organization_id=org_id, environment=env)
+            .select_related('event', 'template', 'integration')
+            .order_by('-sent_at', '-id')[:10],
+            many=True,
         ).data
 
         stats = {
-            'total_sent': logs.filter(status='sent').count(),
-            'total_failed': logs.filter(status='failed').count(),
-            'sent_today': logs.filter(status='sent', sent_at__date=today).count(),
-            'sent_last_7_days': logs.filter(status='sent', sent_at__date__gte=last_7_days).count(),
-            'sent_last_30_days': logs.filter(status='sent', sent_at__date__gte=last_30_days).count(),
-            'active_integrations': SESIntegration.objects.filter(user__organization=org, is_active=True, environment=env).count(),
-            'active_events': Event.objects.filter(user__organization=org, is_active=True, environment=env).count(),
-            'total_templates': EmailTemplate.objects.filter(user__organization=org, environment=env).count(),
+            **totals,
+            'active_integrations': SESIntegration.objects.filter(organization_id=org_id, is_active=True, environment=env).count(),
+            'active_events': Event.objects.filter(organization_id=org_id, is_active=True, environment=env).count(),
+            'total_templates': EmailTemplate.objects.filter(organization_id=org_id, environment=env).count(),
             'daily_breakdown': daily_breakdown,
             'recent_logs': recent_logs,
         }
         return Response(stats)
+
+
+class SESNotificationWebhookView(APIView):
+    """
+    SNS HTTP(S) endpoint for SES bounce, complaint and delivery notifications.
+    Messages are verified and queued; process_ses_notifications applies them
+    in bulk.
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def post(self, request):
+        try:
+            envelope = json.loads(request.body)
+        except ValueError:
+            return Response({'detail': 'Invalid JSON.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(envelope, dict):
+            return Response({'detail': 'Expected a JSON object.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        topics = settings.SES_SNS_TOPIC_ARNS
+        if settings.SES_SNS_VERIFY_SIGNATURE:
+            # Any AWS account can sign messages for its own topics, so a valid
+            # signature only means something together with the allowlist
+            if not topics:
+                logger.error("SES_SNS_TOPIC_ARNS is empty; rejecting SNS message")
+                return Response({'detail': 'No SNS topics are allowed.'}, status=status.HTTP_403_FORBIDDEN)
+            try:
+                verified = verify_sns_message(envelope)
+            except CertificateUnavailable as exc:
+                # Not the sender's fault; SNS retries 5xx responses
+                logger.warning(f"Cannot verify SNS message: {exc}")
+                return Response({'detail': 'SNS signing certificate unavailable.'},
+                                status=status.HTTP_503_SERVICE_UNAVAILABLE)
+            if not verified:
+                return Response({'detail': 'Invalid SNS signature.'}, status=status.HTTP_403_FORBIDDEN)
+        if topics and envelope.get('TopicArn') not in topics:
+            return Response({'detail': 'Unknown topic.'}, status=status.HTTP_403_FORBIDDEN)
+
+        message_type = envelope.get('Type')
+        if message_type == 'SubscriptionConfirmation':
+            if not confirm_subscription(envelope):
+                return Response({'detail': 'Invalid SubscribeURL.'}, status=status.HTTP_400_BAD_REQUEST)
+            logger.info(f"Confirmed SNS subscription to {envelope.get('TopicArn')}")
+        elif message_type == 'Notification':
+            get_webhook_queue().push(envelope.get('Message', ''))
+        return Response(status=status.HTTP_200_OK)
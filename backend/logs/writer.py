@@ -0,0 +1,341 @@
+"""
+Buffered writer for EmailLog rows in Celery workers.
+
+The per-email path used to insert a pending row and then update its status
+in a second round-trip. The writer keeps new rows and status transitions in
+memory and writes them in batches: bulk_create for new rows, bulk_update
+for rows that were already flushed, plus one rollup upsert per batch. When a
+status change arrives before the pending row was flushed, the insert simply
+carries the final status, so the common case costs one row write.
+DeliveryAttempt rows are buffered alongside and inserted after their logs.
+Rows already stored under a buffered task id are locked and read first, so
+a merged insert moves the rollup like an update instead of counting twice,
+and attempts are numbered after the ones already stored for their log.
+
+A batch is flushed when EMAIL_LOG_WRITER_BATCH_SIZE entries are buffered or
+the oldest entry is EMAIL_LOG_WRITER_MAX_DELAY seconds old, and always on
+worker shutdown. With EMAIL_LOG_BUFFERED off every call writes through.
+
+Sends only take the buffer lock; the database write happens outside it.
+If the database is unreachable, the batch goes back into the buffer, which
+keeps at most EMAIL_LOG_WRITER_MAX_BUFFERED entries (the oldest are dropped
+beyond that). Any other error retries the batch row by row, and rows that
+still fail are logged and dropped, so one bad row cannot block the rest.
+String fields are clipped to the column size when they are set.
+"""
+import logging
+import os
+import threading
+import time
+from collections import Counter
+
+from celery.signals import worker_process_shutdown, worker_shutdown
+from django.conf import settings
+from django.db import InterfaceError, OperationalError, close_old_connections, transaction
+from django.db.models import Max
+
+from .models import DeliveryAttempt, EmailLog
+from .rollups import apply_deltas, bucket_key
+
+logger = logging.getLogger(__name__)
+
+# error_message is a TextField; a provider's error text does not need more
+MAX_ERROR_LENGTH = 2000
+CONNECTION_ERRORS = (OperationalError, InterfaceError)
+# The fields bucket_key() reads
+ROLLUP_FIELDS = ('organization_id', 'environment', 'sent_at', 'event_id', 'integration_id')
+
+
+def clip_fields(fields: dict) -> dict:
+    """Truncate string values to their column's max_length (error_message to MAX_ERROR_LENGTH)."""
+    for name, value in fields.items():
+        if not isinstance(value, str):
+            continue
+        limit = MAX_ERROR_LENGTH if name == 'error_message' else getattr(
+            EmailLog._meta.get_field(name), 'max_length', None,
+        )
+        if limit and len(value) > limit:
+            fields[name] = value[:limit]
+    return fields
+
+
+class EmailLogWriter:
+    def __init__(self):
+        self._lock = threading.RLock()
+        # Serializes flushes, so a retried batch keeps its order
+        self._flush_lock = threading.Lock()
+        self._pending = []
+        self._pending_by_task = {}
+        self._updates = {}
+        self._attempts = []
+        self._flushing = set()
+        self._oldest = None
+        self._timer_pid = None
+
+    @property
+    def buffered(self) -> bool:
+        return settings.EMAIL_LOG_BUFFERED
+
+    def create(self, **fields) -> EmailLog:
+        """Return a new log; it is inserted with the next flush."""
+        log = EmailLog(**clip_fields(fields))
+        if not self.buffered:
+            log.save()
+            return log
+        with self._lock:
+            self._pending.append(log)
+            if log.task_id:
+                self._pending_by_task[log.task_id] = log
+            self._mark_dirty()
+        self._flush_if_full()
+        return log
+
+    def get_or_create(self, task_id: str, maybe_exists: bool = True, **fields) -> EmailLog:
+        """
+        Return the log for this task id, creating it if needed. Pass
+        `maybe_exists=False` on a task's first delivery to skip the lookup
+        query; a row that exists after all is merged on insert.
+        """
+        if task_id is None:
+            return self.create(**fields)
+        if not self.buffered:
+            log, _ = EmailLog.objects.get_or_create(task_id=task_id, defaults=fields)
+            return log
+        with self._lock:
+            log = self._pending_by_task.get(task_id)
+            if log is None:
+                log = next(
+                    (entry[0] for entry in self._updates.values() if entry[0].task_id == task_id),
+                    None,
+                )
+        if log is None and maybe_exists:
+            log = EmailLog.objects.filter(task_id=task_id).first()
+        return log or self.create(task_id=task_id, **fields)
+
+    def record_attempt(self, log: EmailLog, **fields) -> DeliveryAttempt:
+        attempt = DeliveryAttempt(log=log, **fields)
+        if not self.buffered:
+            attempt.save()
+            return attempt
+        with self._lock:
+            self._attempts.append(attempt)
+            self._mark_dirty()
+        self._flush_if_full()
+        return attempt
+
+    def update(self, log: EmailLog, **fields):
+        """Apply field changes to a log created by this writer or loaded from the DB."""
+        for name, value in clip_fields(fields).items():
+            setattr(log, name, value)
+        if not self.buffered:
+            log.save(update_fields=list(fields))
+            return
+        with self._lock:
+            # A log that has not been inserted yet is still in _pending and
+            # its insert will carry the new values. One that is being
+            # inserted right now gets its pk from that flush.
+            if log.pk is not None or id(log) in self._flushing:
+                entry = self._updates.setdefault(id(log), [log, set()])
+                entry[0] = log
+                entry[1].update(fields)
+            self._mark_dirty()
+        self._flush_if_full()
+
+    def __len__(self):
+        return len(self._pending) + len(self._updates) + len(self._attempts)
+
+    def clear(self):
+        """Drop everything buffered without writing it."""
+        with self._lock:
+            self._pending = []
+            self._pending_by_task = {}
+            self._updates = {}
+            self._attempts = []
+            self._oldest = None
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+                updates, self._updates = self._updates, {}
+                attempts, self._attempts = self._attempts, []
+                self._pending_by_task = {}
+                self._flushing = {id(log) for log in pending}
+                self._oldest = None
+            # An update to a log that is still to be inserted rides on the insert
+            updates = [entry for entry in updates.values() if entry[0].pk is not None]
+            if not pending and not updates and not attempts:
+                return
+            try:
+                self._write(pending, updates, attempts)
+            except CONNECTION_ERRORS:
+                logger.exception(
+                    f"EmailLog flush failed; keeping {len(pending)} inserts, "
+                    f"{len(updates)} updates and {len(attempts)} attempts for the next attempt"
+                )
+                self._requeue(pending, updates, attempts)
+            except Exception:
+                logger.exception("EmailLog batch write failed; retrying row by row")
+                self._write_each(pending, updates, attempts)
+            finally:
+                with self._lock:
+                    self._flushing = set()
+
+    def _write_each(self, pending, updates, attempts):
+        rows = [([log], [], []) for log in pending]
+        rows += [([], [entry], []) for entry in updates]
+        rows += [([], [], [attempt]) for attempt in attempts]
+        for row in rows:
+            try:
+                self._write(*row)
+            except Exception:
+                logger.exception(f"Dropping EmailLog entry that cannot be written: {row}")
+
+    def _requeue(self, pending, updates, attempts):
+        with self._lock:
+            self._pending = pending + self._pending
+            self._updates = {id(log): [log, fields] for log, fields in updates} | self._updates
+            self._attempts = attempts + self._attempts
+
+            excess = len(self) - settings.EMAIL_LOG_WRITER_MAX_BUFFERED
+            if excess > 0:
+                # Oldest first: inserts, then attempts, then updates
+                dropped = Counter()
+                while excess > 0 and self._pending:
+                    self._pending.pop(0)
+                    dropped['inserts'] += 1
+                    excess -= 1
+                while excess > 0 and self._attempts:
+                    self._attempts.pop(0)
+                    dropped['attempts'] += 1
+                    excess -= 1
+                for key in list(self._updates)[:excess]:
+                    del self._updates[key]
+                    dropped['updates'] += 1
+                logger.error(f"EmailLog buffer is over EMAIL_LOG_WRITER_MAX_BUFFERED; dropped {dict(dropped)}")
+            self._pending_by_task = {log.task_id: log for log in self._pending if log.task_id}
+            self._mark_dirty()
+
+    def _write(self, pending, updates, attempts=()):
+        deltas = Counter()
+        # Statuses as written; an update() arriving meanwhile is counted by its own flush
+        inserted = [(log, log.status) for log in pending]
+        updated = [(log, log.status) for log, _ in updates]
+        with transaction.atomic():
+            merged = self._lock_existing(pending)
+            if attempts:
+                self._number_attempts(attempts, merged, updates)
+            if pending:
+                # A retry on another worker can buffer a row for a task id
+                # whose first attempt was flushed meanwhile; merge into it.
+                EmailLog.objects.bulk_create(
+                    pending,
+                    batch_size=settings.EMAIL_LOG_WRITER_BATCH_SIZE,
+                    update_conflicts=True,
+                    unique_fields=['task_id'],
+                    update_fields=['subject', 'status', 'ses_message_id', 'error_message', 'attempts'],
+                )
+                for log, status in inserted:
+                    existing = merged.get(log.task_id)
+                    if existing is None:
+                        deltas[bucket_key(log, status)] += 1
+                        continue
+                    # The merge keeps the stored row's bucket; move it like an update
+                    for name in ROLLUP_FIELDS:
+                        setattr(log, name, getattr(existing, name))
+                    if existing.status != status:
+                        deltas[bucket_key(existing, existing.status)] -= 1
+                        deltas[bucket_key(existing, status)] += 1
+
+            by_fields = {}
+            for (log, fields), (_, status) in zip(updates, updated):
+                by_fields.setdefault(frozenset(fields), []).append(log)
+                if log._rollup_status != status:
+                    if log._rollup_status:
+                        deltas[bucket_key(log, log._rollup_status)] -= 1
+                    deltas[bucket_key(log, status)] += 1
+            for fields, logs in by_fields.items():
+                EmailLog.objects.bulk_update(logs, sorted(fields))
+
+            if attempts:
+                # No ignore_conflicts: an attempt number taken meanwhile fails
+                # the batch, and the row-by-row retry logs the duplicate
+                DeliveryAttempt.objects.bulk_create(attempts, batch_size=settings.EMAIL_LOG_WRITER_BATCH_SIZE)
+
+            apply_deltas(deltas)
+
+        for log, status in inserted + updated:
+            log._rollup_status = status
+
+    def _lock_existing(self, pending) -> dict:
+        """Lock and return the stored rows that buffered inserts will merge into, by task id."""
+        task_ids = [log.task_id for log in pending if log.task_id]
+        if not task_ids:
+            return {}
+        rows = (
+            EmailLog.objects.select_for_update()
+            .filter(task_id__in=task_ids)
+            .only('task_id', 'status', *ROLLUP_FIELDS)
+        )
+        return {row.task_id: row for row in rows}
+
+    def _number_attempts(self, attempts, merged, updates):
+        """
+        Number attempts after those already stored for their log. A task
+        that read its log before another worker's attempt landed would
+        otherwise reuse that attempt's number.
+        """
+        def stored_pk(log):
+            existing = merged.get(log.task_id) if log.task_id else None
+            return existing.pk if existing is not None else log.pk
+
+        pks = {stored_pk(attempt.log) for attempt in attempts} - {None}
+        last = dict(
+            DeliveryAttempt.objects.filter(log_id__in=pks)
+            .values('log_id').annotate(last=Max('attempt')).values_list('log_id', 'last')
+        ) if pks else {}
+        update_fields = {id(log): fields for log, fields in updates}
+        for attempt in attempts:
+            log = attempt.log
+            key = stored_pk(log) or id(log)
+            attempt.attempt = max(attempt.attempt, last.get(key, 0) + 1)
+            last[key] = attempt.attempt
+            if attempt.attempt > log.attempts:
+                log.attempts = attempt.attempt
+                if id(log) in update_fields:
+                    update_fields[id(log)].add('attempts')
+
+    def _mark_dirty(self):
+        if self._oldest is None:
+            self._oldest = time.monotonic()
+        self._ensure_timer()
+
+    def _flush_if_full(self):
+        if len(self) >= settings.EMAIL_LOG_WRITER_BATCH_SIZE:
+            self.flush()
+
+    def _ensure_timer(self):
+        # Threads do not survive a prefork fork, so each child starts its own
+        pid = os.getpid()
+        if self._timer_pid == pid:
+            return
+        self._timer_pid = pid
+        threading.Thread(target=self._run_timer, name='email-log-writer', daemon=True).start()
+
+    def _run_timer(self):
+        while True:
+            max_delay = settings.EMAIL_LOG_WRITER_MAX_DELAY
+            time.sleep(max_delay / 2)
+            oldest = self._oldest
+            if oldest is not None and time.monotonic() - oldest >= max_delay:
+                close_old_connections()
+                self.flush()
+
+
+log_writer = EmailLogWriter()
+
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def flush_on_shutdown(**kwargs):
+    log_writer.flush()
@@ -0,0 +1,11 @@
+from django.contrib import admin
+
+from .models import Suppression
+
+
+@admin.register(Suppression)
+class SuppressionAdmin(admin.ModelAdmin):
+    list_display = ['email', 'organization', 'reason', 'created_at']
+    list_filter = ['reason']
+    search_fields = ['email']
+    readonly_fields = ['source_log', 'created_by', 'created_at']
@@ -0,0 +1,193 @@
+"""
+In-process suppression lookups.
+
+Each process keeps one Bloom filter per organization over its suppressed
+addresses. A miss in the filter is definitive, so the common case (recipient
+not suppressed) costs no query; a hit is confirmed against the table, which
+also covers addresses that were unsuppressed since the filter was built.
+
+A filter is built on first use, then refreshed incrementally at most every
+SUPPRESSION_FILTER_REFRESH seconds. Rows do not commit in id or created_at
+order (a bulk insert can commit after rows created later), so a refresh
+re-reads every row created up to SUPPRESSION_FILTER_OVERLAP seconds before
+the newest one loaded, skipping the ids it already added. Each filter is
+also rebuilt from scratch every SUPPRESSION_FILTER_REBUILD seconds, which
+catches anything that committed later still and drops unsuppressed
+addresses. Suppressions added in this process are applied immediately.
+A build reads the organization's rows first and sizes the filter at twice
+their number; when a filter outgrows its capacity it is rebuilt the same way.
+Suppressions added while a build is reading are held until its filter exists.
+
+Rows are read from the database under a per-organization lock only, so a
+large organization's build does not hold up lookups for anyone else, and
+the finished filter is swapped in under the shared lock.
+"""
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+
+from .bloom import BloomFilter
+from .models import Suppression, normalize_email
+
+MIN_CAPACITY = 1024
+
+# EmailLog statuses that suppress the recipient
+REASON_BY_STATUS = {
+    'bounced': 'bounce',
+    'complained': 'complaint',
+}
+
+
+class _OrgFilter:
+    def __init__(self, capacity: int):
+        self.bloom = BloomFilter(capacity, settings.SUPPRESSION_FILTER_FP_RATE)
+        self.loaded_through = None
+        # {id: created_at} for the rows inside the overlap window, oldest first
+        self.recent = {}
+        self.built_at = time.monotonic()
+        self.refreshed_at = 0.0
+
+
+class SuppressionIndex:
+    def __init__(self):
+        self._filters = {}
+        # Addresses added while an org's filter is being built, applied when it is
+        self._building = {}
+        self._org_locks = {}
+        self._lock = threading.Lock()
+
+    def is_suppressed(self, org_id, email: str) -> bool:
+        return bool(self.suppressed(org_id, [email]))
+
+    def suppressed(self, org_id, emails) -> set[str]:
+        """Return the normalized addresses in `emails` that are suppressed for this org."""
+        if org_id is None:
+            return set()
+        normalized = {normalize_email(e) for e in emails}
+        org_filter = self._current_filter(org_id)
+        with self._lock:
+            candidates = [e for e in normalized if e in org_filter.bloom]
+        if not candidates:
+            return set()
+        return set(
+            Suppression.objects.filter(organization_id=org_id, email__in=candidates)
+            .values_list('email', flat=True)
+        )
+
+    def add(self, org_id, emails):
+        emails = [normalize_email(email) for email in emails]
+        with self._lock:
+            org_filter = self._filters.get(org_id)
+            if org_filter is not None:
+                for email in emails:
+                    org_filter.bloom.add(email)
+            pending = self._building.get(org_id)
+            if pending is not None:
+                pending.update(emails)
+
+    def clear(self):
+        with self._lock:
+            self._filters.clear()
+            self._building.clear()
+            self._org_locks.clear()
+
+    def _current_filter(self, org_id) -> _OrgFilter:
+        with self._lock:
+            org_filter = self._filters.get(org_id)
+            if org_filter is not None and not self._due(org_filter, time.monotonic()):
+                return org_filter
+            org_lock = self._org_locks.setdefault(org_id, threading.Lock())
+
+        with org_lock:
+            now = time.monotonic()
+            with self._lock:
+                org_filter = self._filters.get(org_id)
+            if org_filter is not None and not self._due(org_filter, now):
+                # Another thread loaded it while this one waited
+                return org_filter
+            if org_filter is None or now - org_filter.built_at >= settings.SUPPRESSION_FILTER_REBUILD:
+                org_filter = self._build(org_id)
+            else:
+                rows = self._fetch(org_id, org_filter.loaded_through)
+                with self._lock:
+                    self._apply(org_filter, rows)
+                if org_filter.bloom.count > org_filter.bloom.capacity:
+                    org_filter = self._build(org_id)
+            org_filter.refreshed_at = now
+            with self._lock:
+                self._filters[org_id] = org_filter
+            return org_filter
+
+    @staticmethod
+    def _due(org_filter: _OrgFilter, now: float) -> bool:
+        return (
+            now - org_filter.refreshed_at >= settings.SUPPRESSION_FILTER_REFRESH
+            or now - org_filter.built_at >= settings.SUPPRESSION_FILTER_REBUILD
+        )
+
+    def _build(self, org_id) -> _OrgFilter:
+        with self._lock:
+            self._building[org_id] = set()
+        try:
+            rows = self._fetch(org_id, None)
+            org_filter = _OrgFilter(max(MIN_CAPACITY, len(rows) * 2))
+            with self._lock:
+                self._apply(org_filter, rows)
+                for email in self._building[org_id]:
+                    org_filter.bloom.add(email)
+        finally:
+            with self._lock:
+                self._building.pop(org_id, None)
+        return org_filter
+
+    def _fetch(self, org_id, loaded_through) -> list:
+        overlap = timedelta(seconds=settings.SUPPRESSION_FILTER_OVERLAP)
+        rows = Suppression.objects.filter(organization_id=org_id)
+        if loaded_through is not None:
+            rows = rows.filter(created_at__gte=loaded_through - overlap)
+        rows = rows.order_by('created_at').values_list('id', 'email', 'created_at')
+        return list(rows.iterator(chunk_size=5000))
+
+    def _apply(self, org_filter: _OrgFilter, rows):
+        overlap = timedelta(seconds=settings.SUPPRESSION_FILTER_OVERLAP)
+        recent = org_filter.recent
+        for row_id, email, created_at in rows:
+            if row_id in recent:
+                continue
+            org_filter.bloom.add(email)
+            recent[row_id] = created_at
+            if org_filter.loaded_through is None or created_at > org_filter.loaded_through:
+                org_filter.loaded_through = created_at
+            cutoff = org_filter.loaded_through - overlap
+            # A late row is appended behind newer ones and leaves on a later pass
+            while recent[oldest := next(iter(recent))] < cutoff:
+                del recent[oldest]
+
+
+suppression_index = SuppressionIndex()
+
+
+def suppress(org_id, emails, reason: str, source_log=None, created_by=None) -> int:
+    """Add addresses to an organization's suppression list. Returns how many were new."""
+    emails = {normalize_email(e) for e in emails}
+    if org_id is None or not emails:
+        return 0
+    existing = set(
+        Suppression.objects.filter(organization_id=org_id, email__in=emails).values_list('email', flat=True)
+    )
+    new = emails - existing
+    Suppression.objects.bulk_create(
+        [
+            Suppression(
+                organization_id=org_id, email=email, reason=reason,
+                source_log=source_log, created_by=created_by,
+            )
+            for email in new
+        ],
+        ignore_conflicts=True,
+        batch_size=5000,
+    )
+    suppression_index.add(org_id, new)
+    return len(new)
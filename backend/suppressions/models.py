@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.db import models
+
+
+def normalize_email(email: str) -> str:
+    return email.strip().lower()
+
+
+class Suppression(models.Model):
+    """A recipient that must not be emailed again by this organization."""
+    REASON_CHOICES = [
+        ('bounce', 'Bounce'),
+        ('complaint', 'Complaint'),
+        ('manual', 'Manual'),
+    ]
+
+    organization = models.ForeignKey(
+        'accounts.Organization',
+        on_delete=models.CASCADE,
+        related_name='suppressions',
+    )
+    email = models.EmailField(help_text='Stored lowercased')
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES, default='manual')
+    source_log = models.ForeignKey(
+        'logs.EmailLog',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+    )
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['organization', 'email'], name='suppressions_org_email_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['organization', '-created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.email} ({self.reason})"
+
+    def save(self, *args, **kwargs):
+        self.email = normalize_email(self.email)
+        super().save(*args, **kwargs)
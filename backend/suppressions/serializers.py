@@ -0,0 +1,18 @@
+from rest_framework import serializers
+
+from .models import Suppression
+
+
+class SuppressionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Suppression
+        fields = ['id', 'email', 'reason', 'source_log', 'created_at']
+        read_only_fields = ['id', 'reason', 'source_log', 'created_at']
+
+
+class SuppressionImportSerializer(serializers.Serializer):
+    emails = serializers.ListField(
+        child=serializers.CharField(max_length=254),
+        allow_empty=False,
+        max_length=10000,
+    )
@@ -0,0 +1,14 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from logs.models import EmailLog
+
+from .index import REASON_BY_STATUS, suppress
+
+
+@receiver(post_save, sender=EmailLog)
+def suppress_bounced_recipient(sender, instance, update_fields=None, **kwargs):
+    reason = REASON_BY_STATUS.get(instance.status)
+    if reason is None or (update_fields is not None and 'status' not in update_fields):
+        return
+    suppress(instance.organization_id, [instance.recipient], reason, source_log=instance)
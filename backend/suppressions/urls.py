@@ -0,0 +1,11 @@
+from django.urls import include, path
+from rest_framework.routers import DefaultRouter
+
+from .views import SuppressionViewSet
+
+router = DefaultRouter()
+router.register(r'', SuppressionViewSet, basename='suppression')
+
+urlpatterns = [
+    path('', include(router.urls)),
+]
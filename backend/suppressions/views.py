@@ -0,0 +1,60 @@
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from rest_framework import mixins, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from .index import suppress
+from .models import Suppression, normalize_email
+from .serializers import SuppressionImportSerializer, SuppressionSerializer
+
+
+class SuppressionViewSet(
+    mixins.ListModelMixin,
+    mixins.RetrieveModelMixin,
+    mixins.DestroyModelMixin,
+    viewsets.GenericViewSet,
+):
+    permission_classes = [IsAuthenticated]
+    serializer_class = SuppressionSerializer
+
+    def get_queryset(self):
+        qs = Suppression.objects.filter(organization_id=self.request.user.organization_id)
+        email = self.request.query_params.get('email')
+        if email:
+            qs = qs.filter(email__startswith=normalize_email(email))
+        reason = self.request.query_params.get('reason')
+        if reason:
+            qs = qs.filter(reason=reason)
+        return qs
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        email = serializer.validated_data['email']
+        suppress(request.user.organization_id, [email], 'manual', created_by=request.user)
+        instance = self.get_queryset().get(email=normalize_email(email))
+        return Response(self.get_serializer(instance).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_emails(self, request):
+        """Suppress a list of addresses. Invalid ones are reported and skipped."""
+        serializer = SuppressionImportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        valid, invalid = [], []
+        for email in serializer.validated_data['emails']:
+            try:
+                validate_email(email.strip())
+                valid.append(email)
+            except ValidationError:
+                invalid.append(email)
+
+        imported = suppress(request.user.organization_id, valid, 'manual', created_by=request.user)
+        return Response({
+            'received': len(serializer.validated_data['emails']),
+            'imported': imported,
+            'already_suppressed': len({normalize_email(e) for e in valid}) - imported,
+            'invalid': invalid,
+        })
@@ -0,0 +1,78 @@
+"""
+Compiled form of `{{name}}` templates.
+
+A template is split once into alternating literal and slot segments, so
+rendering is a single pass that fills the slots and joins the parts, rather
+than one full-text `str.replace` per context key. Compiled templates are
+cached per process by (template id, updated_at).
+"""
+import re
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+PLACEHOLDER_RE = re.compile(r'\{\{(\w+)\}\}')
+
+
+class CompiledText:
+    """One piece of template text; odd-indexed segments are slot names."""
+
+    __slots__ = ('segments',)
+
+    def __init__(self, text: str):
+        self.segments = PLACEHOLDER_RE.split(text or '')
+
+    @property
+    def names(self) -> list[str]:
+        return self.segments[1::2]
+
+    def render(self, context: dict) -> str:
+        parts = self.segments.copy()
+        for i in range(1, len(parts), 2):
+            name = parts[i]
+            # Unknown placeholders are left in place, as before
+            parts[i] = str(context[name]) if name in context else '{{' + name + '}}'
+        return ''.join(parts)
+
+
+class CompiledTemplate:
+    __slots__ = ('subject', 'html')
+
+    def __init__(self, subject: str, html: str):
+        self.subject = CompiledText(subject)
+        self.html = CompiledText(html)
+
+    def render(self, context: dict) -> tuple:
+        return self.subject.render(context), self.html.render(context)
+
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def get_compiled_template(template) -> CompiledTemplate:
+    """Return the compiled form of an EmailTemplate, compiling it at most once per version."""
+    if template.pk is None:
+        return CompiledTemplate(template.subject, template.html_content)
+
+    key = (template.pk, template.updated_at)
+    with _lock:
+        compiled = _cache.get(key)
+        if compiled is not None:
+            _cache.move_to_end(key)
+            return compiled
+
+    compiled = CompiledTemplate(template.subject, template.html_content)
+    with _lock:
+        for stale in [k for k in _cache if k[0] == template.pk and k != key]:
+            del _cache[stale]
+        _cache[key] = compiled
+        while len(_cache) > settings.TEMPLATE_COMPILE_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return compiled
+
+
+def clear_compiled_templates():
+    with _lock:
+        _cache.clear()
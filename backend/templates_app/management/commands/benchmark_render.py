@@ -0,0 +1,62 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from templates_app.compiler import CompiledTemplate
+
+
+def _render_with_replace(subject: str, html: str, context: dict) -> tuple:
+    """The previous renderer: one full-text str.replace per context key."""
+    for key, value in context.items():
+        placeholder = '{{' + key + '}}'
+        subject = subject.replace(placeholder, str(value))
+        html = html.replace(placeholder, str(value))
+    return subject, html
+
+
+class Command(BaseCommand):
+    help = 'Compare compiled template rendering against repeated str.replace on a large template'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--placeholders', type=int, default=40)
+        parser.add_argument('--size-kb', type=int, default=120)
+        parser.add_argument('--iterations', type=int, default=200)
+
+    def handle(self, *args, **options):
+        names = [f'field_{i}' for i in range(options['placeholders'])]
+        block = ''.join(f'<td style="padding:8px">{{{{{name}}}}}</td>' for name in names)
+        filler = '<p style="font-family:sans-serif">' + 'Lorem ipsum dolor sit amet. ' * 20 + '</p>'
+        html = ''
+        while len(html) < options['size_kb'] * 1024:
+            html += f'<tr>{block}</tr>{filler}'
+        subject = 'Order {{field_0}} for {{field_1}}'
+        context = {name: f'value-{name}' for name in names}
+        iterations = options['iterations']
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            expected = _render_with_replace(subject, html, context)
+        replace_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        compiled = CompiledTemplate(subject, html)
+        compile_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(iterations):
+            rendered = compiled.render(context)
+        compiled_seconds = time.perf_counter() - start
+
+        if rendered != expected:
+            self.stderr.write(self.style.ERROR('Compiled output differs from str.replace output.'))
+            return
+
+        self.stdout.write(
+            f'Template: {len(html) // 1024} KB, {len(names)} placeholders, '
+            f'{len(compiled.html.names)} slots, {iterations} renders'
+        )
+        self.stdout.write(f'  str.replace: {replace_seconds * 1000 / iterations:.3f} ms/render')
+        self.stdout.write(
+            f'  compiled:    {compiled_seconds * 1000 / iterations:.3f} ms/render '
+            f'(one-off compile {compile_seconds * 1000:.3f} ms)'
+        )
+        self.stdout.write(self.style.SUCCESS(f'  speedup:     {replace_seconds / compiled_seconds:.1f}x'))
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.15 on 2026-10-17 11:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_organization(apps, schema_editor):
+    from accounts.backfill import backfill_organization as backfill
+
+    backfill(apps.get_model('templates_app', 'EmailTemplate'), apps.get_model('accounts', 'User'))
+
+
+class Migration(migrations.Migration):
+    # Backfill commits per batch
+    atomic = False
+
+    dependencies = [
+        ('accounts', '0008_apikey_organization_and_more'),
+        ('templates_app', '0002_alter_emailtemplate_unique_together_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emailtemplate',
+            name='organization',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='email_templates', to='accounts.organization'),
+        ),
+        migrations.AddIndex(
+            model_name='emailtemplate',
+            index=models.Index(fields=['organization', 'environment', '-updated_at'], name='templates_a_organiz_a37e08_idx'),
+        ),
+        migrations.RunPython(backfill_organization, migrations.RunPython.noop),
+    ]
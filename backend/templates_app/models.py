@@ -20,6 +20,13 @@ class EmailTemplate(models.Model):
         on_delete=models.CASCADE,
         related_name='email_templates',
     )
+    organization = models.ForeignKey(
+        'accounts.Organization',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='email_templates',
+    )
     environment = models.CharField(
         max_length=20,
         choices=ENVIRONMENT_CHOICES,
@@ -33,6 +40,9 @@ class EmailTemplate(models.Model):
     class Meta:
         ordering = ['-updated_at']
         unique_together = ['user', 'name', 'environment']
+        indexes = [
+            models.Index(fields=['organization', 'environment', '-updated_at']),
+        ]
 
     def __str__(self):
         return self.name
@@ -68,6 +78,8 @@ class EmailTemplate(models.Model):
 
     def save(self, *args, **kwargs):
         self.sync_placeholders()
+        if self.organization_id is None:
+            self.organization_id = self.user.organization_id
         super().save(*args, **kwargs)
 
     def get_placeholder_names(self) -> list[str]:
@@ -82,14 +94,22 @@ class EmailTemplate(models.Model):
         Render template with context. Falls back to default_value
         for any placeholder not provided in context.
         """
+        from .compiler import get_compiled_template
+
         # Build full context: defaults first, then overrides
         defaults = self._get_defaults_map()
         merged = {**defaults, **context}
+        return get_compiled_template(self).render(merged)
 
-        subject = self.subject
-        html = self.html_content
-        for key, value in merged.items():
-            placeholder = '{{' + key + '}}'
-            subject = subject.replace(placeholder, str(value))
-            html = html.replace(placeholder, str(value))
-        return subject, html
+    def render_many(self, contexts):
+        """
+        Render the template once per context, yielding (subject, html) pairs
+        lazily. Defaults and the compiled template are resolved once and
+        shared, and only one rendered body is alive at a time.
+        """
+        from .compiler import get_compiled_template
+
+        compiled = get_compiled_template(self)
+        defaults = self._get_defaults_map()
+        for context in contexts:
+            yield compiled.render({**defaults, **context})
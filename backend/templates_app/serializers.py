@@ -1,3 +1,4 @@
+from django.conf import settings
 from rest_framework import serializers
 
 from .models import EmailTemplate
@@ -40,6 +41,14 @@ class TemplatePreviewSerializer(serializers.Serializer):
     context = serializers.DictField(child=serializers.CharField(), required=False, default=dict)
 
 
+class TemplateBatchPreviewSerializer(serializers.Serializer):
+    contexts = serializers.ListField(
+        child=serializers.DictField(child=serializers.CharField(allow_blank=True)),
+        allow_empty=False,
+        max_length=settings.TEMPLATE_PREVIEW_MAX_CONTEXTS,
+    )
+
+
 class TemplateUploadSerializer(serializers.Serializer):
     name = serializers.CharField(max_length=255)
     subject = serializers.CharField(max_length=500)
@@ -10,6 +10,7 @@ from .serializers import (
     EmailTemplateListSerializer,
     EmailTemplateSerializer,
     PlaceholderDefaultsSerializer,
+    TemplateBatchPreviewSerializer,
     TemplatePreviewSerializer,
     TemplateUploadSerializer,
 )
@@ -21,7 +22,7 @@ class EmailTemplateViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         env = get_environment_from_request(self.request)
         return EmailTemplate.objects.filter(
-            user__organization=self.request.user.organization, environment=env
+            organization_id=self.request.user.organization_id, environment=env
         )
 
     def get_serializer_class(self):
@@ -45,6 +46,20 @@ class EmailTemplateViewSet(viewsets.ModelViewSet):
             'html': rendered_html,
         })
 
+    @action(detail=True, methods=['post'], url_path='preview-many')
+    def preview_many(self, request, pk=None):
+        """Render the template against several contexts in one call."""
+        template = self.get_object()
+        serializer = TemplateBatchPreviewSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        contexts = serializer.validated_data['contexts']
+        return Response({
+            'results': [
+                {'subject': subject, 'html': html}
+                for subject, html in template.render_many(contexts)
+            ],
+        })
+
     @action(detail=True, methods=['post'], url_path='update-placeholders')
     def update_placeholders(self, request, pk=None):
         """Update default values for template placeholders."""
@@ -82,7 +97,7 @@ class EmailTemplateViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
         existing = EmailTemplate.objects.filter(
-            user__organization=request.user.organization,
+            organization_id=request.user.organization_id,
             name=template.name,
             environment='production',
         ).first()
@@ -36,6 +36,66 @@ def env_client(user, environment="sandbox"):
     return client
 
 
+# ---------------------------------------------------------------------------
+# Process-local state
+# ---------------------------------------------------------------------------
+
+@pytest.fixture(autouse=True)
+def local_backends(settings):
+    """Swap Redis-backed shared state for in-memory stand-ins and start every test cold."""
+    from django.core.cache import cache
+    from accounts.cache import api_key_cache, user_cache
+    from accounts.ratelimit import get_rate_limiter
+    from accounts.usage import usage_tracker
+    from events.cache import event_cache
+    from events.fair_queue import get_fair_queue
+    from events.idempotency import fallback_window
+    from events.jobs import get_job_progress
+    from events.lanes import get_lane_metrics
+    from events.plans import send_plan_cache
+    from integrations.clients import ses_clients
+    from integrations.governor import get_send_governor
+    from logs.notification_queues import get_webhook_queue
+    from logs.writer import log_writer
+    from suppressions.index import suppression_index
+    from templates_app.compiler import clear_compiled_templates
+
+    settings.CACHES = {
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    }
+    # Logs are written through; writer tests opt in to buffering explicitly
+    settings.EMAIL_LOG_BUFFERED = False
+    settings.EMAIL_LOG_WRITER_MAX_DELAY = 3600
+    settings.API_KEY_USAGE_FLUSH_INTERVAL = 3600
+    settings.SES_GOVERNOR_BACKEND = "memory"
+    settings.SES_NOTIFICATION_BACKEND = "memory"
+    settings.SEND_JOB_PROGRESS_BACKEND = "memory"
+    settings.SEND_LANE_METRICS_BACKEND = "memory"
+    settings.FAIR_QUEUE_BACKEND = "memory"
+    settings.INGEST_RATE_LIMIT_BACKEND = "memory"
+    get_webhook_queue().clear()
+    get_job_progress().clear()
+    get_lane_metrics().clear()
+    get_fair_queue().clear()
+    get_rate_limiter().clear()
+    get_send_governor().clear()
+    cache.clear()
+    api_key_cache.clear()
+    user_cache.clear()
+    usage_tracker.clear()
+    event_cache.clear()
+    fallback_window.clear()
+    send_plan_cache.clear()
+    ses_clients.clear()
+    suppression_index.clear()
+    clear_compiled_templates()
+    yield
+    event_cache.clear()
+    ses_clients.clear()
+    log_writer.clear()
+    usage_tracker.clear()
+
+
 # ---------------------------------------------------------------------------
 # Organizations
 # ---------------------------------------------------------------------------
@@ -121,3 +121,134 @@ class TestAPIKeys:
         key_id = resp.data["id"]
         resp2 = client.delete(f"/api/auth/api-keys/{key_id}/")
         assert resp2.status_code == 204
+
+
+@pytest.mark.django_db
+class TestOrganizationDenormalization:
+    def test_organization_populated_on_write(self, org, sandbox_event, sandbox_template,
+                                             sandbox_integration, sandbox_api_key):
+        assert sandbox_event.organization_id == org.id
+        assert sandbox_template.organization_id == org.id
+        assert sandbox_integration.organization_id == org.id
+        assert APIKey.objects.get().organization_id == org.id
+
+    def test_backfill_fills_missing_rows_in_batches(self, org, user, sandbox_template):
+        from django.contrib.auth import get_user_model
+        from accounts.backfill import backfill_organization
+        from templates_app.models import EmailTemplate
+        for i in range(4):
+            EmailTemplate.objects.create(name=f"T{i}", subject="s", user=user)
+        EmailTemplate.objects.update(organization=None)
+        updated = backfill_organization(EmailTemplate, get_user_model(), batch_size=2)
+        assert updated == 5
+        assert not EmailTemplate.objects.filter(organization__isnull=True).exists()
+
+    def test_list_queries_filter_on_organization_column(self, client, sandbox_template):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as ctx:
+            resp = client.get("/api/templates/")
+        assert resp.status_code == 200
+        template_queries = [q["sql"] for q in ctx.captured_queries if "templates_app_emailtemplate" in q["sql"]]
+        assert template_queries
+        assert all("accounts_user" not in sql for sql in template_queries)
+
+
+@pytest.mark.django_db
+class TestAPIKeyAuthentication:
+    def _trigger(self, raw_key, slug):
+        return APIClient().post("/api/events/trigger/", {
+            "event": slug, "recipient": "test@example.com",
+        }, format="json", HTTP_X_API_KEY=raw_key)
+
+    def test_repeat_requests_skip_the_key_lookup(self, sandbox_event, sandbox_api_key):
+        from accounts.cache import api_key_cache
+        self._trigger(sandbox_api_key, sandbox_event.slug)
+        self._trigger(sandbox_api_key, sandbox_event.slug)
+        assert api_key_cache.hits == 1
+        assert api_key_cache.misses == 1
+
+    def test_deactivated_key_is_rejected_at_once(self, client, sandbox_event, sandbox_api_key):
+        assert self._trigger(sandbox_api_key, sandbox_event.slug).status_code == 202
+        key = APIKey.objects.get(key=APIKey.hash_key(sandbox_api_key))
+        resp = client.patch(f"/api/auth/api-keys/{key.id}/", {"is_active": False}, format="json")
+        assert resp.status_code == 200
+        assert self._trigger(sandbox_api_key, sandbox_event.slug).status_code == 401
+
+    def test_deleted_key_is_rejected_at_once(self, sandbox_event, sandbox_api_key):
+        assert self._trigger(sandbox_api_key, sandbox_event.slug).status_code == 202
+        APIKey.objects.get(key=APIKey.hash_key(sandbox_api_key)).delete()
+        assert self._trigger(sandbox_api_key, sandbox_event.slug).status_code == 401
+
+    def test_user_change_refreshes_cached_key(self, user, sandbox_api_key):
+        from accounts.cache import api_key_cache
+        key_hash = APIKey.hash_key(sandbox_api_key)
+        assert api_key_cache.get(key_hash).user.role == "developer"
+        user.role = "admin"
+        user.save()
+        assert api_key_cache.get(key_hash).user.role == "admin"
+
+    def test_cached_key_and_user_are_copied_per_request(self, sandbox_api_key):
+        from accounts.cache import api_key_cache
+        key_hash = APIKey.hash_key(sandbox_api_key)
+        first = api_key_cache.get(key_hash)
+        first.name = "Changed"
+        first.user.first_name = "Changed"
+        second = api_key_cache.get(key_hash)
+        assert second.name != "Changed"
+        assert second.user.first_name != "Changed"
+        assert api_key_cache.hits == 1
+
+    def test_usage_is_flushed_in_one_update(self, sandbox_event, sandbox_api_key, django_assert_num_queries):
+        from accounts.usage import usage_tracker
+        for _ in range(3):
+            self._trigger(sandbox_api_key, sandbox_event.slug)
+        key = APIKey.objects.get(key=APIKey.hash_key(sandbox_api_key))
+        assert key.last_used_at is None
+        with django_assert_num_queries(1):
+            usage_tracker.flush()
+        key.refresh_from_db()
+        assert key.request_count == 3
+        assert key.last_used_at is not None
+
+    def test_flush_never_moves_last_used_at_backwards(self, sandbox_api_key):
+        from datetime import timedelta
+        from django.utils import timezone
+        from accounts.usage import usage_tracker
+        key = APIKey.objects.get(key=APIKey.hash_key(sandbox_api_key))
+        later = timezone.now() + timedelta(hours=1)
+        APIKey.objects.filter(pk=key.pk).update(last_used_at=later)
+        usage_tracker.record(key.pk)
+        usage_tracker.flush()
+        key.refresh_from_db()
+        assert key.last_used_at == later
+        assert key.request_count == 1
+
+
+@pytest.mark.django_db
+class TestCachedJWTAuthentication:
+    def test_repeat_requests_reuse_the_cached_user(self, client, sandbox_template, django_assert_num_queries):
+        from accounts.cache import user_cache
+        assert client.get("/api/templates/").status_code == 200
+        # Only the paginated count and the page itself; no user lookup
+        with django_assert_num_queries(2):
+            assert client.get("/api/templates/").status_code == 200
+        assert user_cache.hits == 1
+
+    def test_role_change_applies_to_the_next_request(self, client, admin_client, user):
+        resp = client.get("/api/auth/profile/")
+        assert resp.data["role"] == "developer"
+        resp = admin_client.patch(f"/api/auth/users/{user.id}/", {"role": "admin"}, format="json")
+        assert resp.status_code == 200
+        assert client.get("/api/auth/profile/").data["role"] == "admin"
+
+    def test_removed_user_is_rejected(self, client, admin_client, user):
+        assert client.get("/api/auth/profile/").status_code == 200
+        assert admin_client.delete(f"/api/auth/users/{user.id}/").status_code == 204
+        assert client.get("/api/auth/profile/").status_code == 401
+
+    def test_cached_user_is_copied_per_request(self, user):
+        from accounts.cache import user_cache
+        first = user_cache.get(user.pk)
+        first.first_name = "Changed"
+        assert user_cache.get(user.pk).first_name != "Changed"
@@ -3,10 +3,11 @@ Tests for events: CRUD, environment scoping, promote action,
 and the external TriggerEventView (API key scoping).
 """
 import pytest
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 from rest_framework.test import APIClient
 
-from events.models import Event
+from events.models import Event, OutboxMessage
+from events.plans import build_send_plan
 from templates_app.models import EmailTemplate
 from integrations.models import SESIntegration
 
@@ -215,21 +216,37 @@ class TestEventSlugBehaviour:
 @pytest.mark.django_db
 class TestTriggerEventView:
     def test_sandbox_key_triggers_sandbox_event(self, sandbox_event, sandbox_api_key):
-        with patch("events.tasks.send_event_email.delay") as mock_task:
-            mock_task.return_value.id = "fake-task-id"
+        client = APIClient()
+        resp = client.post("/api/events/trigger/", {
+            "event": sandbox_event.slug,
+            "recipient": "test@example.com",
+            "data": {"name": "Anil"},
+        }, format="json", HTTP_X_API_KEY=sandbox_api_key)
+        assert resp.status_code == 202
+        assert resp.data["environment"] == "sandbox"
+        message = OutboxMessage.objects.get()
+        assert message.task_id == resp.data["task_id"]
+        assert message.task_name == "events.tasks.send_event_email"
+        assert message.kwargs == {
+            "event_id": sandbox_event.id,
+            "recipient": "test@example.com",
+            "context_data": {"name": "Anil"},
+            "lane": "transactional",
+            "org": sandbox_event.organization_id,
+            "plan": build_send_plan(sandbox_event),
+        }
+
+    def test_direct_publish_when_outbox_disabled(self, sandbox_event, sandbox_api_key, settings):
+        settings.EVENT_OUTBOX_ENABLED = False
+        with patch("events.tasks.enqueue_event_emails") as mock_enqueue:
             client = APIClient()
             resp = client.post("/api/events/trigger/", {
                 "event": sandbox_event.slug,
                 "recipient": "test@example.com",
-                "data": {"name": "Anil"},
             }, format="json", HTTP_X_API_KEY=sandbox_api_key)
         assert resp.status_code == 202
-        assert resp.data["environment"] == "sandbox"
-        mock_task.assert_called_once_with(
-            event_id=sandbox_event.id,
-            recipient="test@example.com",
-            context_data={"name": "Anil"},
-        )
+        assert mock_enqueue.call_args.args[1] == [resp.data["task_id"]]
+        assert not OutboxMessage.objects.exists()
 
     def test_prod_key_cannot_trigger_sandbox_event(self, sandbox_event, prod_api_key):
         client = APIClient()
@@ -283,3 +300,915 @@ class TestTriggerEventView:
             "data": {},
         }, format="json")
         assert resp.status_code == 401
+
+
+@pytest.mark.django_db
+class TestBatchTriggerEventView:
+    def test_batch_queues_valid_items_and_reports_errors(self, sandbox_event, sandbox_api_key):
+        with patch("events.views.queue_event_emails") as mock_enqueue:
+            mock_enqueue.side_effect = lambda sends: [f"task-{i}" for i in range(len(sends))]
+            client = APIClient()
+            resp = client.post("/api/events/trigger/batch/", {
+                "items": [
+                    {"event": sandbox_event.slug, "recipient": "a@example.com", "data": {"name": "A"}},
+                    {"event": sandbox_event.slug, "recipient": "not-an-email"},
+                    {"event": "missing_event", "recipient": "b@example.com"},
+                    {"event": sandbox_event.slug, "recipient": "c@example.com"},
+                ],
+            }, format="json", HTTP_X_API_KEY=sandbox_api_key)
+        assert resp.status_code == 202
+        assert resp.data["queued"] == 2
+        assert resp.data["failed"] == 2
+        results = resp.data["results"]
+        assert [r["status"] for r in results] == ["queued", "error", "error", "queued"]
+        assert results[0]["task_id"] == "task-0"
+        assert results[3]["task_id"] == "task-1"
+        assert "recipient" in results[1]["errors"]
+        assert "missing_event" in results[2]["errors"]["detail"]
+        plan = build_send_plan(sandbox_event)
+        mock_enqueue.assert_called_once_with([
+            {"event_id": sandbox_event.id, "recipient": "a@example.com", "context_data": {"name": "A"},
+             "lane": "transactional", "org": sandbox_event.organization_id, "plan": plan},
+            {"event_id": sandbox_event.id, "recipient": "c@example.com", "context_data": {},
+             "lane": "transactional", "org": sandbox_event.organization_id, "plan": plan},
+        ])
+
+    def test_batch_resolves_slugs_in_one_query(self, sandbox_event, sandbox_api_key, django_assert_max_num_queries):
+        items = [
+            {"event": sandbox_event.slug, "recipient": f"user{i}@example.com"}
+            for i in range(50)
+        ]
+        with patch("events.views.queue_event_emails") as mock_enqueue:
+            mock_enqueue.side_effect = lambda sends: ["t"] * len(sends)
+            client = APIClient()
+            # API key lookup, one event lookup, one suppression filter load
+            with django_assert_max_num_queries(3):
+                resp = client.post("/api/events/trigger/batch/", {"items": items},
+                                   format="json", HTTP_X_API_KEY=sandbox_api_key)
+        assert resp.status_code == 202
+        assert resp.data["queued"] == 50
+
+    def test_batch_respects_api_key_environment(self, prod_event, sandbox_api_key):
+        with patch("events.views.queue_event_emails") as mock_enqueue:
+            mock_enqueue.return_value = []
+            client = APIClient()
+            resp = client.post("/api/events/trigger/batch/", {
+                "items": [{"event": prod_event.slug, "recipient": "a@example.com"}],
+            }, format="json", HTTP_X_API_KEY=sandbox_api_key)
+        assert resp.status_code == 202
+        assert resp.data["queued"] == 0
+        assert resp.data["results"][0]["status"] == "error"
+
+    def test_batch_rejects_empty_items(self, sandbox_api_key):
+        client = APIClient()
+        resp = client.post("/api/events/trigger/batch/", {"items": []},
+                           format="json", HTTP_X_API_KEY=sandbox_api_key)
+        assert resp.status_code == 400
+
+
+@pytest.mark.django_db
+class TestEventResolutionCache:
+    def _trigger(self, api_key, slug):
+        client = APIClient()
+        return client.post("/api/events/trigger/", {
+            "event": slug,
+            "recipient": "test@example.com",
+        }, format="json", HTTP_X_API_KEY=api_key)
+
+    def test_repeat_trigger_served_from_cache(self, sandbox_event, sandbox_api_key, django_assert_num_queries):
+        from events.cache import event_cache
+        assert self._trigger(sandbox_api_key, sandbox_event.slug).status_code == 202
+        # The API key and event are cached; only the outbox insert remains
+        with django_assert_num_queries(1):
+            assert self._trigger(sandbox_api_key, sandbox_event.slug).status_code == 202
+        stats = event_cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+
+    def test_deactivating_event_invalidates(self, sandbox_event, sandbox_api_key):
+        assert self._trigger(sandbox_api_key, sandbox_event.slug).status_code == 202
+        sandbox_event.is_active = False
+        sandbox_event.save()
+        assert self._trigger(sandbox_api_key, sandbox_event.slug).status_code == 404
+
+    def test_template_change_invalidates(self, sandbox_event, sandbox_template):
+        from events.cache import event_cache
+        org_id = sandbox_event.user.organization_id
+        cached = event_cache.get(org_id, sandbox_event.slug, "sandbox")
+        assert cached.template.subject == "Hello {{name}}"
+        sandbox_template.subject = "Changed {{name}}"
+        sandbox_template.save()
+        assert event_cache.get(org_id, sandbox_event.slug, "sandbox").template.subject == "Changed {{name}}"
+
+    def test_version_bump_from_other_process_invalidates(self, sandbox_event):
+        from django.core.cache import cache
+        from events.cache import event_cache, _version_key
+        org_id = sandbox_event.user.organization_id
+        event_cache.get(org_id, sandbox_event.slug, "sandbox")
+        cache.set(_version_key(org_id), 99, None)
+        event_cache.get(org_id, sandbox_event.slug, "sandbox")
+        assert event_cache.stats()["misses"] == 2
+
+    def test_stats_endpoint_admin_only(self, client, admin_client):
+        assert client.get("/api/events/cache-stats/").status_code == 403
+        resp = admin_client.get("/api/events/cache-stats/")
+        assert resp.status_code == 200
+        assert {"hits", "misses", "size"} <= set(resp.data)
+
+
+@pytest.mark.django_db
+class TestOutboxRelay:
+    @pytest.fixture(autouse=True)
+    def direct_publish(self, settings):
+        # These cover publishing to Celery; TestFairQueue covers the fair path
+        settings.FAIR_QUEUE_ENABLED = False
+
+    def _queue(self, count):
+        from events.outbox import queue_event_emails
+        return queue_event_emails([
+            {"event_id": 1, "recipient": f"u{i}@example.com", "context_data": {}} for i in range(count)
+        ])
+
+    def test_relay_publishes_in_order_and_marks_dispatched(self):
+        from events.outbox import relay_batch
+        task_ids = self._queue(3)
+        with patch("events.tasks.send_event_email.apply_async") as mock_publish:
+            assert relay_batch(batch_size=2) == 2
+            assert relay_batch(batch_size=2) == 1
+            assert relay_batch(batch_size=2) == 0
+        assert [c.kwargs["task_id"] for c in mock_publish.call_args_list] == task_ids
+        assert not OutboxMessage.objects.filter(dispatched_at__isnull=True).exists()
+
+    def test_partial_publish_failure_keeps_the_rest(self, caplog):
+        from events.outbox import relay_batch
+        self._queue(3)
+        with patch("events.tasks.send_event_email.apply_async") as mock_publish:
+            mock_publish.side_effect = [None, ConnectionError("broker down")]
+            assert relay_batch() == 1
+        assert OutboxMessage.objects.filter(dispatched_at__isnull=True).count() == 2
+        assert "published 1/3 before failing" in caplog.text
+
+    def test_unpublishable_message_is_dead_lettered(self):
+        from kombu.exceptions import EncodeError
+        from events.outbox import relay_batch
+        first, second, third = self._queue(3)
+        with patch("events.tasks.send_event_email.apply_async") as mock_publish:
+            mock_publish.side_effect = [None, EncodeError("cannot encode"), None]
+            assert relay_batch() == 3
+            assert relay_batch() == 0
+        dead = OutboxMessage.objects.get(task_id=second)
+        assert dead.failed_at is not None and dead.dispatched_at is None
+        assert "cannot encode" in dead.error
+        assert OutboxMessage.objects.filter(task_id__in=[first, third], dispatched_at__isnull=False).count() == 2
+
+    def test_unknown_task_is_dead_lettered(self):
+        from events.outbox import queue_event_emails, relay_batch
+        from events.tasks import send_event_email
+        self._queue(1)
+        OutboxMessage.objects.update(task_name="events.tasks.removed_task")
+        queue_event_emails([{"event_id": 1, "recipient": "v@example.com", "context_data": {}}])
+        with patch.object(send_event_email, "apply_async"):
+            assert relay_batch() == 2
+        assert OutboxMessage.objects.filter(failed_at__isnull=False).count() == 1
+        assert OutboxMessage.objects.filter(dispatched_at__isnull=False).count() == 1
+
+    def test_prune_removes_old_dispatched_and_dead_lettered_rows(self, settings):
+        from datetime import timedelta
+        from django.utils import timezone
+        from events.outbox import prune_outbox
+        settings.OUTBOX_RETENTION_HOURS = 24
+        settings.OUTBOX_FAILED_RETENTION_HOURS = 168
+        old_sent, new_sent, old_dead, new_dead, pending = self._queue(5)
+        now = timezone.now()
+        OutboxMessage.objects.filter(task_id=old_sent).update(dispatched_at=now - timedelta(hours=25))
+        OutboxMessage.objects.filter(task_id=new_sent).update(dispatched_at=now)
+        OutboxMessage.objects.filter(task_id=old_dead).update(failed_at=now - timedelta(hours=169))
+        OutboxMessage.objects.filter(task_id=new_dead).update(failed_at=now - timedelta(hours=25))
+        assert prune_outbox() == 2
+        assert set(OutboxMessage.objects.values_list("task_id", flat=True)) == {new_sent, new_dead, pending}
+
+    def test_relay_command_drains_once(self):
+        from django.core.management import call_command
+        self._queue(2)
+        with patch("events.tasks.send_event_email.apply_async"):
+            call_command("relay_outbox", "--once", stdout=MagicMock())
+        assert not OutboxMessage.objects.filter(dispatched_at__isnull=True).exists()
+
+
+@pytest.mark.django_db
+class TestTriggerIdempotency:
+    def _trigger(self, api_key, slug, key, recipient="test@example.com"):
+        client = APIClient()
+        return client.post("/api/events/trigger/", {
+            "event": slug,
+            "recipient": recipient,
+        }, format="json", HTTP_X_API_KEY=api_key, HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_replay_returns_original_task_without_enqueuing(self, sandbox_event, sandbox_api_key):
+        first = self._trigger(sandbox_api_key, sandbox_event.slug, "order-42")
+        second = self._trigger(sandbox_api_key, sandbox_event.slug, "order-42")
+        assert first.status_code == second.status_code == 202
+        assert second.data["task_id"] == first.data["task_id"]
+        assert second["Idempotent-Replayed"] == "true"
+        assert OutboxMessage.objects.count() == 1
+
+    def test_different_keys_enqueue_separately(self, sandbox_event, sandbox_api_key):
+        self._trigger(sandbox_api_key, sandbox_event.slug, "a")
+        self._trigger(sandbox_api_key, sandbox_event.slug, "b")
+        assert OutboxMessage.objects.count() == 2
+
+    def test_key_reused_with_different_body_conflicts(self, sandbox_event, sandbox_api_key):
+        self._trigger(sandbox_api_key, sandbox_event.slug, "k")
+        resp = self._trigger(sandbox_api_key, sandbox_event.slug, "k", recipient="other@example.com")
+        assert resp.status_code == 422
+
+    def test_keys_are_scoped_per_api_key(self, sandbox_event, sandbox_api_key, user):
+        from accounts.models import APIKey
+        raw_key = APIKey.generate_key()
+        APIKey.objects.create(
+            key=APIKey.hash_key(raw_key), prefix=raw_key[:8], name="Second", user=user, environment="sandbox",
+        )
+        first = self._trigger(sandbox_api_key, sandbox_event.slug, "shared")
+        second = self._trigger(raw_key, sandbox_event.slug, "shared")
+        assert first.data["task_id"] != second.data["task_id"]
+
+    def test_database_fallback_when_cache_is_down(self, sandbox_event, sandbox_api_key):
+        from events.models import IdempotencyKey
+        with patch("events.idempotency.cache.add", side_effect=ConnectionError("redis down")):
+            first = self._trigger(sandbox_api_key, sandbox_event.slug, "fallback")
+            second = self._trigger(sandbox_api_key, sandbox_event.slug, "fallback")
+        assert second.data["task_id"] == first.data["task_id"]
+        assert IdempotencyKey.objects.count() == 1
+        assert OutboxMessage.objects.count() == 1
+
+    def test_claim_made_during_outage_is_honoured_after_recovery(self, sandbox_event, sandbox_api_key):
+        with patch("events.idempotency.cache.add", side_effect=ConnectionError("redis down")):
+            first = self._trigger(sandbox_api_key, sandbox_event.slug, "outage")
+        second = self._trigger(sandbox_api_key, sandbox_event.slug, "outage")
+        third = self._trigger(sandbox_api_key, sandbox_event.slug, "outage", recipient="other@example.com")
+        assert second.data["task_id"] == first.data["task_id"]
+        assert second["Idempotent-Replayed"] == "true"
+        assert third.status_code == 422
+        assert OutboxMessage.objects.count() == 1
+
+    def test_first_claim_needs_no_query(self, sandbox_api_key, django_assert_num_queries):
+        from accounts.models import APIKey
+        from events import idempotency
+        api_key = APIKey.objects.get(key=APIKey.hash_key(sandbox_api_key))
+        with django_assert_num_queries(0):
+            assert idempotency.claim(api_key, "fresh", "fp", "task-1") is None
+
+    def test_other_processes_check_the_table_after_an_outage(self, sandbox_event, sandbox_api_key):
+        from events.idempotency import fallback_window
+        with patch("events.idempotency.cache.add", side_effect=ConnectionError("redis down")):
+            first = self._trigger(sandbox_api_key, sandbox_event.slug, "outage")
+        # The first claim after recovery shares the outage through the cache
+        self._trigger(sandbox_api_key, sandbox_event.slug, "unrelated")
+        fallback_window.clear()  # as seen by another process
+        second = self._trigger(sandbox_api_key, sandbox_event.slug, "outage")
+        assert second.data["task_id"] == first.data["task_id"]
+        assert OutboxMessage.objects.count() == 2
+
+    def test_expired_database_claims_are_pruned(self, sandbox_event, sandbox_api_key, settings):
+        from datetime import timedelta
+        from django.utils import timezone
+        from events.idempotency import prune_expired
+        from events.models import IdempotencyKey
+        with patch("events.idempotency.cache.add", side_effect=ConnectionError("redis down")):
+            self._trigger(sandbox_api_key, sandbox_event.slug, "old")
+            self._trigger(sandbox_api_key, sandbox_event.slug, "new")
+        IdempotencyKey.objects.filter(task_id=OutboxMessage.objects.first().task_id).update(
+            created_at=timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL + 1),
+        )
+        assert prune_expired() == 1
+        assert IdempotencyKey.objects.count() == 1
+
+
+@pytest.mark.django_db
+class TestSendJobs:
+    @pytest.fixture(autouse=True)
+    def media_root(self, settings, tmp_path):
+        settings.MEDIA_ROOT = str(tmp_path)
+
+    def _upload(self, client, event, content, name="audience.csv", **extra):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        return client.post("/api/events/jobs/", {
+            "event": event.slug,
+            "audience": SimpleUploadedFile(name, content),
+            **extra,
+        }, format="multipart")
+
+    def _run(self, job_id):
+        from events.tasks import run_send_job
+        run_send_job.push_request(id="fan-out", retries=0)
+        try:
+            run_send_job.run(job_id)
+        finally:
+            run_send_job.pop_request()
+
+    def _sends(self):
+        return [m.kwargs for m in OutboxMessage.objects.filter(task_name="events.tasks.send_event_email")]
+
+    def test_upload_queues_the_fan_out(self, client, sandbox_event):
+        resp = self._upload(client, sandbox_event, b"recipient,name\na@example.com,Ann\n")
+        assert resp.status_code == 202
+        assert resp.data["status"] == "pending"
+        message = OutboxMessage.objects.get()
+        assert message.task_name == "events.tasks.run_send_job"
+        assert message.kwargs == {"job_id": resp.data["id"]}
+
+    def test_csv_missing_required_column_is_rejected(self, client, sandbox_event):
+        resp = self._upload(client, sandbox_event, b"recipient,city\na@example.com,Pune\n")
+        assert resp.status_code == 400
+        assert "name" in resp.data["detail"]
+        assert not OutboxMessage.objects.exists()
+
+    def test_unknown_format_is_rejected(self, client, sandbox_event):
+        resp = self._upload(client, sandbox_event, b"a@example.com", name="audience.txt")
+        assert resp.status_code == 400
+
+    def test_fan_out_validates_rows_in_chunks(self, client, sandbox_event, settings):
+        from events.models import SendJob
+        from suppressions.index import suppress
+        settings.SEND_JOB_CHUNK_SIZE = 2
+        suppress(sandbox_event.organization_id, ["blocked@example.com"], "manual")
+        content = (
+            b"recipient,name,extra\n"
+            b"a@example.com,Ann,x\n"
+            b"not-an-email,Bob,x\n"
+            b"b@example.com,,x\n"
+            b"blocked@example.com,Eve,x\n"
+            b"c@example.com,Cal,x\n"
+        )
+        job_id = self._upload(client, sandbox_event, content).data["id"]
+        self._run(job_id)
+
+        job = SendJob.objects.get(pk=job_id)
+        assert job.status == "queued"
+        assert job.rows_processed == 5
+        assert not job.audience
+        assert [e["row"] for e in job.errors] == [2, 3]
+        sends = self._sends()
+        assert [s["recipient"] for s in sends] == ["a@example.com", "c@example.com"]
+        assert sends[0]["context_data"] == {"name": "Ann"}
+        assert sends[0]["job"] == job_id
+        assert sends[0]["lane"] == "bulk"
+        counts = client.get(f"/api/events/jobs/{job_id}/").data["counts"]
+        assert counts == {"queued": 2, "sent": 0, "failed": 0, "invalid": 2, "suppressed": 1}
+
+    def test_ndjson_rows(self, client, sandbox_event):
+        content = b'{"recipient": "a@example.com", "name": 7}\n\nnot json\n["list"]\n'
+        job_id = self._upload(client, sandbox_event, content, name="audience.ndjson").data["id"]
+        self._run(job_id)
+        [send] = self._sends()
+        assert send["context_data"] == {"name": "7"}
+        counts = client.get(f"/api/events/jobs/{job_id}/").data["counts"]
+        assert counts["queued"] == 1
+        assert counts["invalid"] == 2
+
+    def test_fan_out_resumes_after_checkpoint(self, client, sandbox_event):
+        from events.models import SendJob
+        content = b"recipient,name\na@example.com,Ann\nb@example.com,Bob\nc@example.com,Cal\n"
+        job_id = self._upload(client, sandbox_event, content).data["id"]
+        SendJob.objects.filter(pk=job_id).update(status="running", rows_processed=2)
+        self._run(job_id)
+        assert [s["recipient"] for s in self._sends()] == ["c@example.com"]
+
+    def test_resume_restores_counts_of_checkpointed_chunks(self, client, sandbox_event, settings):
+        from events.jobs import get_job_progress
+        from events.models import SendJob
+        settings.SEND_JOB_CHUNK_SIZE = 2
+        content = b"recipient,name\na@example.com,Ann\nnot-an-email,Bob\nc@example.com,Cal\n"
+        job_id = self._upload(client, sandbox_event, content).data["id"]
+        # The worker died after committing the first chunk, before counting it
+        with patch.object(type(get_job_progress()), "set", side_effect=[None, ConnectionError("worker lost")]), \
+                pytest.raises(ConnectionError):
+            self._run(job_id)
+        job = SendJob.objects.get(pk=job_id)
+        assert job.rows_processed == 2
+        assert job.progress == {"queued": 1, "invalid": 1, "suppressed": 0}
+        assert get_job_progress().get(job_id) is None
+
+        self._run(job_id)
+        counts = client.get(f"/api/events/jobs/{job_id}/").data["counts"]
+        assert counts == {"queued": 2, "sent": 0, "failed": 0, "invalid": 1, "suppressed": 0}
+
+    def test_job_completes_when_every_send_finished(self, client, sandbox_event):
+        from events.jobs import record_outcome
+        content = b"recipient,name\na@example.com,Ann\nb@example.com,Bob\n"
+        job_id = self._upload(client, sandbox_event, content).data["id"]
+        self._run(job_id)
+        record_outcome(job_id, "sent")
+        assert client.get(f"/api/events/jobs/{job_id}/").data["status"] == "queued"
+        record_outcome(job_id, "failed")
+        data = client.get(f"/api/events/jobs/{job_id}/").data
+        assert data["status"] == "completed"
+        assert data["counts"]["sent"] == data["counts"]["failed"] == 1
+
+    def test_lost_progress_does_not_complete_the_job(self, client, sandbox_event):
+        from events.jobs import get_job_progress, record_outcome
+        content = b"recipient,name\na@example.com,Ann\nb@example.com,Bob\n"
+        job_id = self._upload(client, sandbox_event, content).data["id"]
+        self._run(job_id)
+        # The Redis hash expired or was lost
+        get_job_progress().clear()
+        record_outcome(job_id, "sent")
+        data = client.get(f"/api/events/jobs/{job_id}/").data
+        assert data["status"] == "queued"
+        assert data["counts"]["queued"] == 2
+        assert get_job_progress().get(job_id) is None
+
+    def test_cancel_stops_the_fan_out(self, client, sandbox_event):
+        from events.models import SendJob
+        job_id = self._upload(client, sandbox_event, b"recipient,name\na@example.com,Ann\n").data["id"]
+        resp = client.post(f"/api/events/jobs/{job_id}/cancel/")
+        assert resp.data["status"] == "cancelled"
+        self._run(job_id)
+        assert self._sends() == []
+        assert SendJob.objects.get(pk=job_id).status == "cancelled"
+
+    def test_jobs_are_scoped_to_the_organization(self, client, sandbox_event, other_user):
+        from tests.conftest import env_client
+        job_id = self._upload(client, sandbox_event, b"recipient,name\na@example.com,Ann\n").data["id"]
+        other = env_client(other_user)
+        assert other.get(f"/api/events/jobs/{job_id}/").status_code == 404
+        assert client.get("/api/events/jobs/").data["count"] == 1
+
+
+@pytest.mark.django_db
+class TestSendLanes:
+    def test_send_tasks_are_routed_by_lane(self):
+        from celery import current_app
+        router = current_app.amqp.router
+        name = "events.tasks.send_event_email"
+        assert router.route({}, name, kwargs={"lane": "bulk"})["queue"].name == "send-bulk"
+        assert router.route({}, name, kwargs={"lane": "transactional"})["queue"].name == "send-transactional"
+        assert router.route({}, name, kwargs={})["queue"].name == "send-transactional"
+        assert router.route({}, "events.tasks.run_send_job", kwargs={"job_id": 1})["queue"].name == "send-bulk"
+
+    def test_trigger_carries_the_event_lane(self, sandbox_event, sandbox_api_key):
+        sandbox_event.lane = "bulk"
+        sandbox_event.save()
+        APIClient().post("/api/events/trigger/", {
+            "event": sandbox_event.slug, "recipient": "a@example.com",
+        }, format="json", HTTP_X_API_KEY=sandbox_api_key)
+        assert OutboxMessage.objects.get().kwargs["lane"] == "bulk"
+
+    def test_published_at_uses_eta_for_delayed_tasks(self):
+        import time
+        from datetime import datetime, timedelta, timezone
+        from events.lanes import stamp_published_at
+        headers = {}
+        stamp_published_at(sender="events.tasks.send_event_email", headers=headers)
+        assert abs(headers["published_at"] - time.time()) < 5
+        eta = datetime.now(timezone.utc) + timedelta(seconds=60)
+        headers = {"eta": eta.isoformat()}
+        stamp_published_at(sender="events.tasks.send_event_email", headers=headers)
+        assert headers["published_at"] == pytest.approx(eta.timestamp())
+
+    def test_queue_wait_is_reported_per_lane(self, admin_client):
+        import time
+        from events.lanes import record_queue_wait
+        from events.tasks import send_event_email
+        for wait, lane in [(2, "bulk"), (4, "bulk"), (0.1, "transactional")]:
+            send_event_email.push_request(published_at=time.time() - wait)
+            try:
+                record_queue_wait(task=send_event_email, kwargs={"lane": lane})
+            finally:
+                send_event_email.pop_request()
+        resp = admin_client.get("/api/events/lane-stats/")
+        assert resp.status_code == 200
+        assert resp.data["bulk"]["queue"] == "send-bulk"
+        assert resp.data["bulk"]["wait"]["samples"] == 2
+        assert resp.data["bulk"]["wait"]["max"] == pytest.approx(4, abs=0.5)
+        assert resp.data["transactional"]["wait"]["samples"] == 1
+
+    def test_lane_stats_require_admin(self, client):
+        assert client.get("/api/events/lane-stats/").status_code == 403
+
+    def test_oldest_message_age_reads_broker_headers(self):
+        import json
+        import time
+        from events.lanes import _message_age
+        now = time.time()
+        raw = json.dumps({"body": "", "headers": {"published_at": now - 30}})
+        assert _message_age(raw, now) == pytest.approx(30)
+        assert _message_age(None, now) is None
+
+
+@pytest.mark.django_db
+class TestFairQueue:
+    def _push(self, org_id, count, lane="transactional", prefix=None):
+        from events.fair_queue import push_sends
+        prefix = prefix or f"{lane}-{org_id}"
+        task_ids = [f"{prefix}-{i}" for i in range(count)]
+        push_sends((task_id, {"event_id": 1, "recipient": "a@example.com", "context_data": {},
+                              "lane": lane, "org": org_id}) for task_id in task_ids)
+        return task_ids
+
+    def _dispatch(self):
+        from events.fair_queue import Dispatcher
+        dispatcher = Dispatcher()
+        with patch("events.tasks.send_event_email.apply_async") as mock_publish:
+            dispatcher.dispatch_round()
+        return [c.kwargs["task_id"] for c in mock_publish.call_args_list]
+
+    def test_relay_hands_sends_to_the_fair_queue(self, sandbox_event, sandbox_api_key):
+        from events.fair_queue import backlog_stats
+        from events.outbox import relay_batch
+        APIClient().post("/api/events/trigger/", {
+            "event": sandbox_event.slug, "recipient": "a@example.com",
+        }, format="json", HTTP_X_API_KEY=sandbox_api_key)
+        with patch("events.tasks.send_event_email.apply_async") as mock_publish:
+            assert relay_batch() == 1
+        mock_publish.assert_not_called()
+        assert not OutboxMessage.objects.filter(dispatched_at__isnull=True).exists()
+        stats = backlog_stats()["transactional"][sandbox_event.organization_id]
+        assert stats["queued"] == 1
+        assert stats["in_flight"] == 0
+
+    def test_burst_does_not_starve_other_orgs(self, org, other_org):
+        self._push(org.id, 50)
+        small = self._push(other_org.id, 3)
+        published = self._dispatch()
+        assert len(published) == 13
+        assert set(small) <= set(published)
+
+    def test_weight_scales_the_share(self, org, other_org, settings):
+        settings.FAIR_QUEUE_QUANTUM = 2
+        org.send_weight = 3
+        org.save()
+        self._push(org.id, 20)
+        self._push(other_org.id, 20)
+        published = self._dispatch()
+        assert sum(t.startswith(f"transactional-{org.id}-") for t in published) == 6
+        assert sum(t.startswith(f"transactional-{other_org.id}-") for t in published) == 2
+
+    def test_max_in_flight_holds_until_sends_finish(self, org):
+        from events.fair_queue import release_in_flight
+        from events.tasks import send_event_email
+        org.max_in_flight = 2
+        org.save()
+        self._push(org.id, 5)
+        first = self._dispatch()
+        assert len(first) == 2
+        assert self._dispatch() == []
+
+        kwargs = {"lane": "transactional", "org": org.id}
+        release_in_flight(task_id=first[0], task=send_event_email, kwargs=kwargs, state="RETRY")
+        assert self._dispatch() == []
+        release_in_flight(task_id=first[0], task=send_event_email, kwargs=kwargs, state="SUCCESS")
+        assert self._dispatch() == ["transactional-%d-2" % org.id]
+
+    def test_lanes_are_scheduled_separately(self, org):
+        org.max_in_flight = 1
+        org.save()
+        self._push(org.id, 5, lane="bulk")
+        transactional = self._push(org.id, 1)
+        published = self._dispatch()
+        assert transactional[0] in published
+        assert len(published) == 2
+
+    def test_failed_publish_requeues_in_order(self, org):
+        from events.fair_queue import Dispatcher, backlog_stats
+        task_ids = self._push(org.id, 3)
+        with patch("events.tasks.send_event_email.apply_async") as mock_publish:
+            mock_publish.side_effect = [None, ConnectionError("broker down")]
+            with pytest.raises(ConnectionError):
+                Dispatcher().dispatch_round()
+        stats = backlog_stats()["transactional"][org.id]
+        assert stats["queued"] == 2
+        assert stats["in_flight"] == 1
+        assert self._dispatch() == task_ids[1:]
+
+    def test_sends_reserved_by_a_dead_dispatcher_are_requeued(self, org, settings):
+        from events.fair_queue import get_fair_queue
+        task_ids = self._push(org.id, 3)
+        # Popped and reserved, then the dispatcher died before publishing
+        get_fair_queue().pop("transactional", org.id, 2, 10)
+        assert self._dispatch() == task_ids[2:]
+        settings.FAIR_QUEUE_INFLIGHT_TIMEOUT = 0
+        assert self._dispatch() == task_ids[:2]
+
+    def test_stale_published_sends_are_not_published_again(self, org, settings):
+        from events.fair_queue import backlog_stats
+        org.max_in_flight = 2
+        org.save()
+        task_ids = self._push(org.id, 3)
+        assert self._dispatch() == task_ids[:2]
+        settings.FAIR_QUEUE_INFLIGHT_TIMEOUT = 0
+        assert self._dispatch() == task_ids[2:]
+        assert backlog_stats()["transactional"] == {}
+
+    def test_backlog_stats_are_scoped_for_org_admins(self, admin_client, org, other_org):
+        self._push(org.id, 4)
+        self._push(other_org.id, 2)
+        resp = admin_client.get("/api/events/fair-queue-stats/")
+        assert resp.status_code == 200
+        assert set(resp.data["transactional"]) == {org.id}
+        assert resp.data["transactional"][org.id]["queued"] == 4
+
+    def test_dispatch_command_runs_one_round(self, org):
+        from django.core.management import call_command
+        from events.fair_queue import backlog_stats
+        self._push(org.id, 3)
+        with patch("events.tasks.send_event_email.apply_async"):
+            call_command("dispatch_sends", "--once", stdout=MagicMock())
+        assert backlog_stats()["transactional"] == {}
+
+
+@pytest.mark.django_db
+class TestIngestRateLimits:
+    @pytest.fixture
+    def clock(self):
+        from accounts.ratelimit import get_rate_limiter
+        now = [1_000_000.0]
+        get_rate_limiter().clock = lambda: now[0]
+        return now
+
+    def _trigger(self, raw_key, slug):
+        return APIClient().post("/api/events/trigger/", {
+            "event": slug, "recipient": "test@example.com",
+        }, format="json", HTTP_X_API_KEY=raw_key)
+
+    def test_key_limit_returns_429_with_retry_after(self, sandbox_event, sandbox_api_key, settings, clock):
+        settings.INGEST_RATE_LIMIT_PER_KEY = 2
+        first = self._trigger(sandbox_api_key, sandbox_event.slug)
+        assert first.status_code == 202
+        assert first["X-RateLimit-Limit"] == "2"
+        assert first["X-RateLimit-Remaining"] == "1"
+        assert first["X-RateLimit-Reset"] == "30"
+        assert first["X-RateLimit-Scope"] == "key"
+        assert self._trigger(sandbox_api_key, sandbox_event.slug).status_code == 202
+
+        refused = self._trigger(sandbox_api_key, sandbox_event.slug)
+        assert refused.status_code == 429
+        assert refused["Retry-After"] == "30"
+        assert refused["X-RateLimit-Remaining"] == "0"
+        assert OutboxMessage.objects.count() == 2
+
+        clock[0] += 30
+        assert self._trigger(sandbox_api_key, sandbox_event.slug).status_code == 202
+
+    def test_key_limit_is_configured_on_the_key(self, sandbox_event, sandbox_api_key, settings, clock):
+        from accounts.models import APIKey
+        settings.INGEST_RATE_LIMIT_PER_KEY = 1
+        key = APIKey.objects.get(key=APIKey.hash_key(sandbox_api_key))
+        key.rate_limit = 0
+        key.save()
+        for _ in range(3):
+            resp = self._trigger(sandbox_api_key, sandbox_event.slug)
+            assert resp.status_code == 202
+            assert resp["X-RateLimit-Scope"] == "organization"
+
+    def test_organization_limit_is_shared_by_its_keys(self, sandbox_event, sandbox_api_key, user, org, settings,
+                                                      clock):
+        from accounts.models import APIKey
+        org.ingest_rate_limit = 3
+        org.save()
+        raw = APIKey.generate_key()
+        APIKey.objects.create(key=APIKey.hash_key(raw), prefix=raw[:8], name="Second", user=user)
+
+        assert self._trigger(sandbox_api_key, sandbox_event.slug).status_code == 202
+        assert self._trigger(sandbox_api_key, sandbox_event.slug).status_code == 202
+        resp = self._trigger(raw, sandbox_event.slug)
+        assert resp.status_code == 202
+        assert resp["X-RateLimit-Scope"] == "organization"
+        assert resp["X-RateLimit-Remaining"] == "0"
+        refused = self._trigger(raw, sandbox_event.slug)
+        assert refused.status_code == 429
+        assert refused["Retry-After"] == "20"
+
+    def test_refused_request_does_not_charge_other_scopes(self, sandbox_event, sandbox_api_key, user, org,
+                                                          settings, clock):
+        from accounts.models import APIKey
+        settings.INGEST_RATE_LIMIT_PER_KEY = 1
+        org.ingest_rate_limit = 2
+        org.save()
+        assert self._trigger(sandbox_api_key, sandbox_event.slug).status_code == 202
+        assert self._trigger(sandbox_api_key, sandbox_event.slug).status_code == 429
+
+        raw = APIKey.generate_key()
+        APIKey.objects.create(key=APIKey.hash_key(raw), prefix=raw[:8], name="Second", user=user)
+        assert self._trigger(raw, sandbox_event.slug).status_code == 202
+
+    def test_batch_items_count_against_the_limit(self, sandbox_event, sandbox_api_key, settings, clock):
+        settings.INGEST_RATE_LIMIT_PER_KEY = 5
+        client = APIClient()
+        items = [{"event": sandbox_event.slug, "recipient": f"r{i}@example.com"} for i in range(4)]
+        resp = client.post("/api/events/trigger/batch/", {"items": items},
+                           format="json", HTTP_X_API_KEY=sandbox_api_key)
+        assert resp.status_code == 202
+        assert resp["X-RateLimit-Remaining"] == "1"
+        resp = client.post("/api/events/trigger/batch/", {"items": items[:2]},
+                           format="json", HTTP_X_API_KEY=sandbox_api_key)
+        assert resp.status_code == 429
+        assert resp["Retry-After"] == "12"
+
+        oversized = [{"event": sandbox_event.slug, "recipient": f"r{i}@example.com"} for i in range(6)]
+        resp = client.post("/api/events/trigger/batch/", {"items": oversized},
+                           format="json", HTTP_X_API_KEY=sandbox_api_key)
+        assert resp.status_code == 400
+        assert "Retry-After" not in resp
+        assert resp.data["items"] == ["Batch of 6 items exceeds the rate limit of 5 per 60 seconds."]
+
+    def test_limiter_outage_lets_requests_through(self, sandbox_event, sandbox_api_key, settings):
+        settings.INGEST_RATE_LIMIT_PER_KEY = 1
+        with patch("accounts.ratelimit.MemoryRateLimiter.hit", side_effect=ConnectionError("down")):
+            resp = self._trigger(sandbox_api_key, sandbox_event.slug)
+            assert resp.status_code == 202
+            assert "X-RateLimit-Limit" not in resp
+            assert self._trigger(sandbox_api_key, sandbox_event.slug).status_code == 202
+
+
+@pytest.mark.django_db
+class TestScheduledSends:
+    def _trigger(self, raw_key, slug, send_at=None, recipient="test@example.com"):
+        body = {"event": slug, "recipient": recipient}
+        if send_at is not None:
+            body["send_at"] = send_at.isoformat()
+        return APIClient().post("/api/events/trigger/", body, format="json", HTTP_X_API_KEY=raw_key)
+
+    def _in(self, **delta):
+        from datetime import timedelta
+        from django.utils import timezone
+        return timezone.now() + timedelta(**delta)
+
+    def test_future_send_at_is_held_instead_of_queued(self, sandbox_event, sandbox_api_key):
+        from events.models import ScheduledSend
+        send_at = self._in(hours=2)
+        resp = self._trigger(sandbox_api_key, sandbox_event.slug, send_at)
+        assert resp.status_code == 202
+        assert resp.data["detail"] == "Email scheduled for sending."
+        assert not OutboxMessage.objects.exists()
+        scheduled = ScheduledSend.objects.get()
+        assert scheduled.task_id == resp.data["task_id"]
+        assert scheduled.status == "pending"
+        assert scheduled.send_at == send_at
+        assert scheduled.bucket == send_at.replace(second=0, microsecond=0)
+        assert scheduled.kwargs["recipient"] == "test@example.com"
+        assert scheduled.kwargs["org"] == sandbox_event.organization_id
+
+    def test_past_send_at_sends_now(self, sandbox_event, sandbox_api_key):
+        from events.models import ScheduledSend
+        resp = self._trigger(sandbox_api_key, sandbox_event.slug, self._in(minutes=-5))
+        assert resp.status_code == 202
+        assert resp.data["detail"] == "Email queued for sending."
+        assert OutboxMessage.objects.get().task_id == resp.data["task_id"]
+        assert not ScheduledSend.objects.exists()
+
+    def test_send_at_beyond_horizon_is_rejected(self, sandbox_event, sandbox_api_key, settings):
+        settings.SCHEDULED_SEND_MAX_AHEAD_DAYS = 30
+        resp = self._trigger(sandbox_api_key, sandbox_event.slug, self._in(days=31))
+        assert resp.status_code == 400
+        assert "send_at" in resp.data
+
+    def test_dispatch_queues_only_due_sends(self, sandbox_event, sandbox_api_key):
+        from events.models import ScheduledSend
+        from events.scheduler import dispatch_due
+        due = self._trigger(sandbox_api_key, sandbox_event.slug, self._in(hours=1)).data["task_id"]
+        later = self._trigger(sandbox_api_key, sandbox_event.slug, self._in(hours=3)).data["task_id"]
+        ScheduledSend.objects.filter(task_id=due).update(send_at=self._in(seconds=-1),
+                                                         bucket=self._in(minutes=-1))
+
+        assert dispatch_due() == 1
+        message = OutboxMessage.objects.get()
+        assert message.task_id == due
+        stored = ScheduledSend.objects.get(task_id=due).kwargs
+        assert message.kwargs["recipient"] == stored["recipient"] == "test@example.com"
+        assert message.kwargs["event_id"] == sandbox_event.id
+        assert ScheduledSend.objects.get(task_id=due).status == "dispatched"
+        assert ScheduledSend.objects.get(task_id=later).status == "pending"
+        assert dispatch_due() == 0
+
+    def _make_due(self):
+        from events.models import ScheduledSend
+        ScheduledSend.objects.update(send_at=self._in(seconds=-1), bucket=self._in(minutes=-1))
+
+    def test_dispatch_uses_the_event_as_it_is_at_send_time(self, sandbox_event, sandbox_api_key, settings):
+        from events.models import Event, ScheduledSend
+        from events.plans import build_send_plan
+        from events.scheduler import dispatch_due
+        settings.SEND_PLAN_PAYLOADS = True
+        self._trigger(sandbox_api_key, sandbox_event.slug, self._in(hours=1))
+        assert "plan" not in ScheduledSend.objects.get().kwargs
+        sandbox_event.lane = "bulk"
+        sandbox_event.save()
+        self._make_due()
+        assert dispatch_due() == 1
+        kwargs = OutboxMessage.objects.get().kwargs
+        assert kwargs["lane"] == "bulk"
+        assert kwargs["plan"] == build_send_plan(Event.objects.select_related("template", "integration").get())
+
+    def test_deactivated_event_fails_the_send(self, sandbox_event, sandbox_api_key):
+        from events.models import ScheduledSend
+        from events.scheduler import dispatch_due
+        self._trigger(sandbox_api_key, sandbox_event.slug, self._in(hours=1))
+        sandbox_event.is_active = False
+        sandbox_event.save()
+        self._make_due()
+        assert dispatch_due() == 1
+        scheduled = ScheduledSend.objects.get()
+        assert (scheduled.status, scheduled.error) == ("failed", "Event is inactive.")
+        assert not OutboxMessage.objects.exists()
+
+    def test_recipient_suppressed_after_scheduling_is_skipped(self, sandbox_event, sandbox_api_key):
+        from events.models import ScheduledSend
+        from events.scheduler import dispatch_due
+        from suppressions.index import suppress
+        self._trigger(sandbox_api_key, sandbox_event.slug, self._in(hours=1), recipient="gone@example.com")
+        self._trigger(sandbox_api_key, sandbox_event.slug, self._in(hours=1), recipient="ok@example.com")
+        suppress(sandbox_event.organization_id, ["Gone@example.com"], "bounce")
+        self._make_due()
+        assert dispatch_due() == 2
+        assert ScheduledSend.objects.get(recipient="gone@example.com").status == "suppressed"
+        assert ScheduledSend.objects.get(recipient="ok@example.com").status == "dispatched"
+        assert OutboxMessage.objects.get().kwargs["recipient"] == "ok@example.com"
+
+    def test_dispatch_claims_oldest_buckets_first_in_batches(self, sandbox_event, sandbox_api_key):
+        from events.models import ScheduledSend
+        from events.scheduler import dispatch_due, minute_bucket
+        ids = [self._trigger(sandbox_api_key, sandbox_event.slug, self._in(hours=1)).data["task_id"]
+               for _ in range(3)]
+        for minutes_ago, task_id in zip([5, 20, 10], ids):
+            send_at = self._in(minutes=-minutes_ago)
+            ScheduledSend.objects.filter(task_id=task_id).update(send_at=send_at, bucket=minute_bucket(send_at))
+
+        assert dispatch_due(batch_size=2) == 2
+        assert set(OutboxMessage.objects.values_list("task_id", flat=True)) == {ids[1], ids[2]}
+        assert dispatch_due(batch_size=2) == 1
+
+    def test_batch_schedules_items_with_send_at(self, sandbox_event, sandbox_api_key):
+        from events.models import ScheduledSend
+        resp = APIClient().post("/api/events/trigger/batch/", {"items": [
+            {"event": sandbox_event.slug, "recipient": "now@example.com"},
+            {"event": sandbox_event.slug, "recipient": "later@example.com",
+             "send_at": self._in(days=1).isoformat()},
+        ]}, format="json", HTTP_X_API_KEY=sandbox_api_key)
+        assert resp.status_code == 202
+        assert (resp.data["queued"], resp.data["scheduled"], resp.data["failed"]) == (1, 1, 0)
+        assert [r["status"] for r in resp.data["results"]] == ["queued", "scheduled"]
+        assert OutboxMessage.objects.get().kwargs["recipient"] == "now@example.com"
+        assert ScheduledSend.objects.get().task_id == resp.data["results"][1]["task_id"]
+
+    def test_cancel_pending_send(self, sandbox_event, sandbox_api_key):
+        from events.scheduler import dispatch_due
+        task_id = self._trigger(sandbox_api_key, sandbox_event.slug, self._in(hours=1)).data["task_id"]
+        client = APIClient()
+        resp = client.post(f"/api/events/scheduled/{task_id}/cancel/", HTTP_X_API_KEY=sandbox_api_key)
+        assert resp.status_code == 200
+        assert resp.data["status"] == "cancelled"
+        resp = client.post(f"/api/events/scheduled/{task_id}/cancel/", HTTP_X_API_KEY=sandbox_api_key)
+        assert resp.status_code == 400
+
+        from events.models import ScheduledSend
+        ScheduledSend.objects.filter(task_id=task_id).update(send_at=self._in(minutes=-2),
+                                                             bucket=self._in(minutes=-2))
+        assert dispatch_due() == 0
+
+    def test_reschedule_pending_send(self, client, sandbox_event, sandbox_api_key):
+        from events.models import ScheduledSend
+        from events.scheduler import minute_bucket
+        task_id = self._trigger(sandbox_api_key, sandbox_event.slug, self._in(hours=1)).data["task_id"]
+        send_at = self._in(days=2)
+        resp = client.post(f"/api/events/scheduled/{task_id}/reschedule/",
+                           {"send_at": send_at.isoformat()}, format="json")
+        assert resp.status_code == 200
+        scheduled = ScheduledSend.objects.get()
+        assert scheduled.send_at == send_at
+        assert scheduled.bucket == minute_bucket(send_at)
+
+        resp = client.post(f"/api/events/scheduled/{task_id}/reschedule/",
+                           {"send_at": self._in(minutes=-1).isoformat()}, format="json")
+        assert resp.status_code == 400
+
+        ScheduledSend.objects.update(status="dispatched")
+        resp = client.post(f"/api/events/scheduled/{task_id}/reschedule/",
+                           {"send_at": self._in(hours=5).isoformat()}, format="json")
+        assert resp.status_code == 400
+        assert "dispatched" in resp.data["detail"]
+
+    def test_scheduled_sends_are_scoped_to_organization(self, sandbox_event, sandbox_api_key, other_user):
+        from tests.conftest import env_client
+        task_id = self._trigger(sandbox_api_key, sandbox_event.slug, self._in(hours=1)).data["task_id"]
+        other = env_client(other_user, "sandbox")
+        assert other.get(f"/api/events/scheduled/{task_id}/").status_code == 404
+        assert other.post(f"/api/events/scheduled/{task_id}/cancel/").status_code == 404
+        assert other.get("/api/events/scheduled/").data["count"] == 0
+
+    def test_list_filters_by_status(self, client, sandbox_event, sandbox_api_key):
+        first = self._trigger(sandbox_api_key, sandbox_event.slug, self._in(hours=1)).data["task_id"]
+        self._trigger(sandbox_api_key, sandbox_event.slug, self._in(hours=2))
+        client.post(f"/api/events/scheduled/{first}/cancel/")
+        resp = client.get("/api/events/scheduled/?status=pending")
+        assert resp.data["count"] == 1
+        assert resp.data["results"][0]["event_slug"] == sandbox_event.slug
+
+    def test_dispatch_scheduled_command(self, sandbox_event, sandbox_api_key):
+        from django.core.management import call_command
+        from events.models import ScheduledSend
+        self._trigger(sandbox_api_key, sandbox_event.slug, self._in(hours=1))
+        ScheduledSend.objects.update(send_at=self._in(seconds=-1), bucket=self._in(minutes=-1))
+        call_command("dispatch_scheduled", "--once", stdout=MagicMock())
+        assert ScheduledSend.objects.get().status == "dispatched"
+        assert OutboxMessage.objects.count() == 1
@@ -1,7 +1,8 @@
 """
-Tests for SES integrations: CRUD and environment scoping.
+Tests for SES integrations: CRUD, environment scoping and the client registry.
 """
 import pytest
+from unittest.mock import patch
 from rest_framework.test import APIClient
 
 
@@ -62,3 +63,101 @@ class TestIntegrationsEnvironmentScoping:
     def test_unauthenticated_blocked(self):
         resp = APIClient().get("/api/integrations/")
         assert resp.status_code == 401
+
+
+@pytest.mark.django_db
+class TestSESClientRegistry:
+    def test_client_built_once_per_integration(self, sandbox_integration):
+        from integrations.clients import ses_clients
+        with patch("boto3.client") as mock_client:
+            first = ses_clients.get(sandbox_integration)
+            second = ses_clients.get(sandbox_integration)
+        assert first is second
+        assert mock_client.call_count == 1
+        assert mock_client.call_args.kwargs["config"].max_pool_connections == 10
+
+    def test_saved_change_builds_new_client(self, sandbox_integration):
+        from integrations.clients import ses_clients
+        with patch("boto3.client", side_effect=lambda *a, **kw: object()):
+            first = ses_clients.get(sandbox_integration)
+            sandbox_integration.region = "eu-west-1"
+            sandbox_integration.save()
+            second = ses_clients.get(sandbox_integration)
+        assert first is not second
+        assert len(ses_clients) == 1
+
+    def test_set_aws_credentials_invalidates(self, sandbox_integration):
+        from integrations.clients import ses_clients
+        with patch("boto3.client", side_effect=lambda *a, **kw: object()):
+            first = ses_clients.get(sandbox_integration)
+            sandbox_integration.set_aws_credentials("AKIANEW", "newsecret")
+            assert len(ses_clients) == 0
+            assert ses_clients.get(sandbox_integration) is not first
+
+    def test_registry_is_bounded(self, settings, user):
+        from integrations.clients import ses_clients
+        from integrations.models import SESIntegration
+        settings.SES_CLIENT_CACHE_SIZE = 2
+        with patch("boto3.client", side_effect=lambda *a, **kw: object()):
+            for i in range(3):
+                integration = SESIntegration(
+                    name=f"I{i}", user=user, region="us-east-1", sender_email="s@example.com",
+                )
+                integration.set_aws_credentials("A", "B")
+                integration.save()
+                ses_clients.get(integration)
+        assert len(ses_clients) == 2
+
+
+@pytest.mark.django_db
+class TestSendRateGovernor:
+    def _governor(self):
+        from integrations.governor import MemorySendRateGovernor
+        self.now = 0.0
+        return MemorySendRateGovernor(clock=lambda: self.now)
+
+    def test_override_skips_quota_call(self, sandbox_integration):
+        from integrations.governor import get_max_send_rate
+        sandbox_integration.max_send_rate = 5
+        with patch("integrations.models.SESIntegration.get_cached_ses_client") as mock_client:
+            assert get_max_send_rate(sandbox_integration) == 5.0
+        mock_client.assert_not_called()
+
+    def test_quota_is_cached(self, sandbox_integration):
+        from integrations.governor import get_max_send_rate
+        with patch("integrations.models.SESIntegration.get_cached_ses_client") as mock_client:
+            mock_client.return_value.get_send_quota.return_value = {"MaxSendRate": 14.0}
+            assert get_max_send_rate(sandbox_integration) == 14.0
+            assert get_max_send_rate(sandbox_integration) == 14.0
+        assert mock_client.return_value.get_send_quota.call_count == 1
+
+    def test_quota_access_denied_falls_back_to_default(self, sandbox_integration, settings):
+        from integrations.governor import get_max_send_rate
+        settings.SES_DEFAULT_SEND_RATE = 2.0
+        with patch("integrations.models.SESIntegration.get_cached_ses_client") as mock_client:
+            mock_client.return_value.get_send_quota.side_effect = Exception("AccessDenied")
+            assert get_max_send_rate(sandbox_integration) == 2.0
+
+    def test_reserves_short_waits_and_rejects_long_ones(self, sandbox_integration, settings):
+        settings.SES_GOVERNOR_MAX_WAIT = 1.0
+        sandbox_integration.max_send_rate = 2
+        governor = self._governor()
+        assert governor.acquire(sandbox_integration) == (True, 0.0)
+        assert governor.acquire(sandbox_integration) == (True, 0.0)
+        assert governor.acquire(sandbox_integration) == (True, 0.5)
+        assert governor.acquire(sandbox_integration) == (True, 1.0)
+        granted, wait = governor.acquire(sandbox_integration)
+        assert not granted and wait == 1.5
+        self.now = 2.0
+        assert governor.acquire(sandbox_integration) == (True, 0.0)
+
+    def test_throttle_lowers_rate_and_recovers(self, sandbox_integration, settings):
+        settings.SES_THROTTLE_DECREASE = 0.5
+        settings.SES_RATE_RECOVERY_PER_SEC = 0.1
+        sandbox_integration.max_send_rate = 10
+        governor = self._governor()
+        assert governor.record_throttle(sandbox_integration) == 0.5
+        # Bucket is drained and refills at 5/s instead of 10/s
+        assert governor.acquire(sandbox_integration) == (True, pytest.approx(0.2))
+        self.now = 10.0
+        assert governor._factor(sandbox_integration.pk, self.now) == 1.0
@@ -1,9 +1,13 @@
 """
 Tests for email logs and dashboard stats — environment scoping.
 """
+import io
+
 import pytest
 from logs.models import EmailLog
 
+from .conftest import env_client
+
 
 def make_log(user, environment, status="sent", **kwargs):
     return EmailLog.objects.create(
@@ -90,7 +94,395 @@ class TestDashboardStats:
         # sandbox_event belongs to user (same org), so admin sees 1 active sandbox event.
         assert resp.data["active_events"] == 1
 
+    def test_recent_logs_are_newest_first_by_id(self, admin_client, admin_user):
+        from django.utils import timezone
+        ids = [make_log(admin_user, "sandbox").id for _ in range(12)]
+        EmailLog.objects.filter(id__in=ids).update(sent_at=timezone.now())
+        resp = admin_client.get("/api/logs/dashboard-stats/")
+        assert [r["id"] for r in resp.data["recent_logs"]] == sorted(ids, reverse=True)[:10]
+
+    def test_recent_logs_use_keyset_index(self, admin_user):
+        from django.db import connection
+        qs = EmailLog.objects.filter(
+            organization_id=admin_user.organization_id, environment="sandbox",
+        ).order_by("-sent_at", "-id")[:10]
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            plan = qs.explain()
+        assert "logs_emaill_organiz_125ea4_idx" in plan
+        assert "Sort" not in plan
+
     def test_stats_unauthenticated(self):
         from rest_framework.test import APIClient
         resp = APIClient().get("/api/logs/dashboard-stats/")
         assert resp.status_code == 401
+
+
+@pytest.mark.django_db
+class TestLogsCursorPagination:
+    def _walk(self, client, url):
+        seen = []
+        while url:
+            resp = client.get(url)
+            assert resp.status_code == 200
+            assert "count" not in resp.data
+            seen.extend(item["id"] for item in resp.data["results"])
+            url = resp.data["next"]
+        return seen
+
+    def test_default_stays_page_number(self, client, user):
+        make_log(user, "sandbox")
+        resp = client.get("/api/logs/")
+        assert resp.data["count"] == 1
+
+    def test_walks_all_rows_newest_first(self, client, user):
+        ids = [make_log(user, "sandbox").id for _ in range(5)]
+        seen = self._walk(client, "/api/logs/?pagination=cursor&page_size=2")
+        assert seen == list(reversed(ids))
+
+    def test_ties_on_sent_at_are_broken_by_id(self, client, user):
+        from django.utils import timezone
+        ids = [make_log(user, "sandbox").id for _ in range(5)]
+        EmailLog.objects.filter(id__in=ids).update(sent_at=timezone.now())
+        seen = self._walk(client, "/api/logs/?pagination=cursor&page_size=2")
+        assert seen == sorted(ids, reverse=True)
+
+    def test_combines_with_filters(self, client, user):
+        sent = [make_log(user, "sandbox", status="sent").id for _ in range(3)]
+        make_log(user, "sandbox", status="failed")
+        seen = self._walk(client, "/api/logs/?pagination=cursor&page_size=2&status=sent")
+        assert seen == list(reversed(sent))
+
+    def test_invalid_cursor(self, client, user):
+        resp = client.get("/api/logs/?cursor=not-a-cursor")
+        assert resp.status_code == 404
+
+
+@pytest.mark.django_db
+class TestLogsSearch:
+    def test_email_term_is_exact_recipient_match(self, client, user):
+        EmailLog.objects.create(user=user, environment="sandbox", recipient="jane@example.com", subject="A")
+        EmailLog.objects.create(user=user, environment="sandbox", recipient="xjane@example.com", subject="B")
+        resp = client.get("/api/logs/?search=jane@example.com")
+        assert [r["recipient"] for r in resp.data["results"]] == ["jane@example.com"]
+
+    def test_email_term_ignores_case(self, client, user):
+        EmailLog.objects.create(user=user, environment="sandbox", recipient="alice@example.com", subject="A")
+        resp = client.get("/api/logs/?search=Alice@Example.com")
+        assert [r["recipient"] for r in resp.data["results"]] == ["alice@example.com"]
+
+    def test_email_term_uses_lower_recipient_index(self, user):
+        from django.db import connection
+        from logs.filters import EmailLogFilter
+        qs = EmailLogFilter({"search": "Jane@example.com"}, queryset=EmailLog.objects.all()).qs
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            plan = qs.explain()
+        assert "logs_emaillog_rcpt_lower_idx" in plan
+
+    def test_ses_message_id_is_exact_match(self, client, user):
+        message_id = "0100018d2c3b4a5e-1a2b3c4d-5e6f-7a8b-9c0d-1e2f3a4b5c6d-000000"
+        make_log(user, "sandbox", ses_message_id=message_id)
+        make_log(user, "sandbox", ses_message_id="other")
+        resp = client.get(f"/api/logs/?search={message_id}")
+        assert resp.data["count"] == 1
+
+    def test_free_text_prefix_matches_subject_words(self, client, user):
+        EmailLog.objects.create(user=user, environment="sandbox", recipient="a@example.com", subject="Your invoice is ready")
+        EmailLog.objects.create(user=user, environment="sandbox", recipient="b@example.com", subject="Welcome aboard")
+        resp = client.get("/api/logs/?search=invoi")
+        assert [r["recipient"] for r in resp.data["results"]] == ["a@example.com"]
+
+    def test_contains_mode_keeps_substring_match(self, client, user):
+        EmailLog.objects.create(user=user, environment="sandbox", recipient="a@example.com", subject="Your invoice is ready")
+        resp = client.get("/api/logs/?search=voice&search_mode=contains")
+        assert resp.data["count"] == 1
+        resp = client.get("/api/logs/?search=voice")
+        assert resp.data["count"] == 0
+
+    def test_free_text_uses_gin_index(self, user):
+        from django.db import connection
+        from logs.filters import EmailLogFilter
+        qs = EmailLogFilter({"search": "invoice"}, queryset=EmailLog.objects.all()).qs
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            plan = qs.explain()
+        assert "logs_emaillog_search_idx" in plan
+
+
+@pytest.mark.django_db
+class TestDeliveryRollups:
+    def _counts(self, **filters):
+        from logs.models import DeliveryRollup
+        return {
+            r.status: r.count
+            for r in DeliveryRollup.objects.filter(**filters)
+            if r.count
+        }
+
+    def test_status_change_moves_count(self, user):
+        log = make_log(user, "sandbox", status="pending")
+        assert self._counts() == {"pending": 1}
+        log.status = "sent"
+        log.save(update_fields=["status"])
+        assert self._counts() == {"sent": 1}
+
+    def test_reloaded_log_tracks_persisted_status(self, user):
+        log = make_log(user, "sandbox", status="sent")
+        log = EmailLog.objects.get(pk=log.pk)
+        log.status = "bounced"
+        log.save()
+        assert self._counts() == {"bounced": 1}
+
+    def test_delete_removes_count(self, user):
+        make_log(user, "sandbox", status="sent")
+        EmailLog.objects.all().delete()
+        assert self._counts() == {}
+
+    def test_failed_rollup_update_rolls_back_the_save(self, user):
+        from unittest.mock import patch
+        log = make_log(user, "sandbox", status="pending")
+        log.status = "sent"
+        with patch("logs.rollups.apply_deltas", side_effect=RuntimeError("lock timeout")), \
+                pytest.raises(RuntimeError):
+            log.save(update_fields=["status"])
+        assert EmailLog.objects.get(pk=log.pk).status == "pending"
+        assert self._counts() == {"pending": 1}
+
+    def test_rebuild_matches_incremental(self, user, sandbox_event):
+        from django.core.management import call_command
+        from logs.models import DeliveryRollup
+        make_log(user, "sandbox", status="sent", event=sandbox_event)
+        make_log(user, "sandbox", status="sent", event=sandbox_event)
+        make_log(user, "production", status="failed")
+        incremental = sorted(DeliveryRollup.objects.values_list("environment", "event_id", "status", "count"))
+        DeliveryRollup.objects.all().delete()
+        call_command("rebuild_delivery_rollups", stdout=io.StringIO())
+        rebuilt = sorted(DeliveryRollup.objects.values_list("environment", "event_id", "status", "count"))
+        assert rebuilt == incremental
+
+    def test_dashboard_reads_rollups(self, admin_client, admin_user):
+        from logs.models import DeliveryRollup
+        make_log(admin_user, "sandbox", status="sent")
+        DeliveryRollup.objects.update(count=42)
+        resp = admin_client.get("/api/logs/dashboard-stats/")
+        assert resp.data["total_sent"] == 42
+        assert resp.data["sent_today"] == 42
+        assert resp.data["daily_breakdown"][-1]["sent"] == 42
+
+
+def ses_notification(kind, message_id, **extra):
+    import json
+    body = {"notificationType": kind, "mail": {"messageId": message_id}}
+    if kind == "Bounce":
+        body["bounce"] = {"bounceType": extra.get("bounce_type", "Permanent"), "bounceSubType": "General"}
+    if kind == "Complaint":
+        body["complaint"] = {"complaintFeedbackType": "abuse"}
+    return json.dumps(body)
+
+
+@pytest.mark.django_db
+class TestSESNotifications:
+    def _rollups(self):
+        from logs.models import DeliveryRollup
+        return {r.status: r.count for r in DeliveryRollup.objects.all() if r.count}
+
+    def test_parse(self):
+        import json
+        from logs.notifications import Notification, parse_notification
+        assert parse_notification(ses_notification("Delivery", "m1")) == Notification("m1", "delivered", "")
+        assert parse_notification(ses_notification("Bounce", "m1")).status == "bounced"
+        assert parse_notification(ses_notification("Bounce", "m1", bounce_type="Transient")) is None
+        assert parse_notification(ses_notification("Complaint", "m1")).detail == "Complaint: abuse"
+        envelope = json.dumps({"Type": "Notification", "Message": ses_notification("Delivery", "m2")})
+        assert parse_notification(envelope).message_id == "m2"
+        with pytest.raises(ValueError):
+            parse_notification('{"hello": "world"}')
+
+    def test_bulk_apply_updates_rollups_and_suppresses(self, user, django_assert_max_num_queries):
+        from django.core.management import call_command
+        from logs.notifications import apply_notifications, parse_notification
+        from suppressions.models import Suppression
+        EmailLog.objects.bulk_create([
+            EmailLog(user=user, organization_id=user.organization_id, recipient=f"r{i}@example.com",
+                     subject="s", status="sent", ses_message_id=f"m{i}")
+            for i in range(300)
+        ])
+        call_command("rebuild_delivery_rollups", stdout=io.StringIO())
+        notifications = (
+            [parse_notification(ses_notification("Delivery", f"m{i}")) for i in range(300)]
+            + [parse_notification(ses_notification("Bounce", f"m{i}")) for i in range(10)]
+            + [parse_notification(ses_notification("Complaint", "m299"))]
+            + [parse_notification(ses_notification("Delivery", "unknown"))]
+        )
+        with django_assert_max_num_queries(20):
+            found = apply_notifications(notifications)
+        assert len(found) == 300
+        assert self._rollups() == {"delivered": 289, "bounced": 10, "complained": 1}
+        assert EmailLog.objects.get(ses_message_id="m0").error_message == "Bounce: Permanent/General"
+        assert set(Suppression.objects.values_list("reason", flat=True)) == {"bounce", "complaint"}
+        assert Suppression.objects.count() == 11
+
+    def test_status_never_moves_backwards(self, user):
+        from logs.notifications import apply_notifications, parse_notification
+        make_log(user, "sandbox", status="complained", ses_message_id="m1")
+        found = apply_notifications([parse_notification(ses_notification("Delivery", "m1"))])
+        assert found == {"m1"}
+        assert EmailLog.objects.get().status == "complained"
+
+    @pytest.fixture
+    def clock(self):
+        from logs.notification_queues import get_webhook_queue
+        now = [1_000_000.0]
+        get_webhook_queue().clock = lambda: now[0]
+        return now
+
+    def test_unknown_message_is_retried_until_log_exists(self, user, settings, clock):
+        from logs.notification_queues import get_webhook_queue
+        from logs.notifications import process_batch
+        settings.SES_NOTIFICATION_RETRY_BASE = 2
+        queue = get_webhook_queue()
+        queue.push(ses_notification("Delivery", "late"))
+        queue.push("not json")
+        assert process_batch(queue, 100) == (1, 1)
+        assert len(queue) == 1
+        make_log(user, "sandbox", ses_message_id="late")
+        # Not due again until the backoff has passed
+        assert process_batch(queue, 100) == (0, 0)
+        clock[0] += 2
+        assert process_batch(queue, 100) == (1, 0)
+        assert EmailLog.objects.get().status == "delivered"
+        assert len(queue) == 0
+
+    def test_retries_back_off_exponentially(self, settings, clock):
+        from logs.notification_queues import get_webhook_queue
+        from logs.notifications import process_batch
+        settings.SES_NOTIFICATION_RETRY_BASE = 2
+        settings.SES_NOTIFICATION_RETRY_MAX = 5
+        queue = get_webhook_queue()
+        queue.push(ses_notification("Bounce", "late"))
+        for delay in (2, 4, 5):
+            assert process_batch(queue, 100) == (0, 1)
+            clock[0] += delay - 0.5
+            assert process_batch(queue, 100) == (0, 0)
+            clock[0] += 0.5
+
+    def test_unacknowledged_batch_is_received_again(self, settings, clock):
+        from logs.notification_queues import get_webhook_queue
+        settings.SES_NOTIFICATION_VISIBILITY_TIMEOUT = 60
+        queue = get_webhook_queue()
+        queue.push(ses_notification("Delivery", "m1"))
+        # A poller that dies before acknowledging what it received
+        assert len(queue.receive(100)) == 1
+        assert queue.receive(100) == []
+        clock[0] += 60
+        messages = queue.receive(100)
+        assert len(messages) == 1
+        queue.ack(messages)
+        assert len(queue) == 0
+
+    def test_sqs_client_takes_region_and_endpoint_from_settings(self, settings):
+        from unittest.mock import patch
+        from logs.notification_queues import SQSNotificationQueue
+        url = "https://vpce-1.sqs.eu-west-1.vpce.amazonaws.com/123456789012/ses"
+        settings.SES_NOTIFICATION_SQS_REGION = ""
+        settings.SES_NOTIFICATION_SQS_ENDPOINT_URL = ""
+        with patch("boto3.client") as client:
+            SQSNotificationQueue(url).client
+        client.assert_called_once_with("sqs", region_name=None, endpoint_url=None)
+
+        settings.SES_NOTIFICATION_SQS_REGION = "eu-west-1"
+        settings.SES_NOTIFICATION_SQS_ENDPOINT_URL = "https://vpce-1.sqs.eu-west-1.vpce.amazonaws.com"
+        with patch("boto3.client") as client:
+            SQSNotificationQueue(url).client
+        client.assert_called_once_with(
+            "sqs", region_name="eu-west-1", endpoint_url="https://vpce-1.sqs.eu-west-1.vpce.amazonaws.com",
+        )
+
+    def test_webhook_queues_verified_notifications(self, settings):
+        import json
+        from unittest.mock import patch
+        from rest_framework.test import APIClient
+        from logs.notification_queues import get_webhook_queue
+        topic = "arn:aws:sns:us-east-1:123456789012:ses"
+        settings.SES_SNS_TOPIC_ARNS = [topic]
+        envelope = {"Type": "Notification", "TopicArn": topic, "Message": ses_notification("Delivery", "m1")}
+        client = APIClient()
+
+        with patch("logs.views.verify_sns_message", return_value=False):
+            resp = client.post("/api/logs/ses-notifications/", json.dumps(envelope), content_type="text/plain")
+        assert resp.status_code == 403
+        assert len(get_webhook_queue()) == 0
+
+        with patch("logs.views.verify_sns_message", return_value=True):
+            resp = client.post("/api/logs/ses-notifications/", json.dumps(envelope), content_type="text/plain")
+        assert resp.status_code == 200
+        assert len(get_webhook_queue()) == 1
+
+    def test_webhook_rejects_everything_without_a_topic_allowlist(self, settings):
+        import json
+        from unittest.mock import patch
+        from rest_framework.test import APIClient
+        from logs.notification_queues import get_webhook_queue
+        settings.SES_SNS_TOPIC_ARNS = []
+        envelope = {"Type": "Notification", "TopicArn": "arn:aws:sns:us-east-1:999999999999:any",
+                    "Message": ses_notification("Delivery", "m1")}
+        with patch("logs.views.verify_sns_message", return_value=True):
+            resp = APIClient().post("/api/logs/ses-notifications/", json.dumps(envelope), content_type="text/plain")
+        assert resp.status_code == 403
+        assert len(get_webhook_queue()) == 0
+
+    def test_webhook_rejects_a_body_that_is_not_an_object(self):
+        from rest_framework.test import APIClient
+        resp = APIClient().post("/api/logs/ses-notifications/", "[1, 2]", content_type="text/plain")
+        assert resp.status_code == 400
+
+    def test_webhook_answers_503_when_the_certificate_cannot_be_fetched(self, settings):
+        import json
+        from unittest.mock import patch
+        from urllib.error import URLError
+        from rest_framework.test import APIClient
+        from logs.notification_queues import get_webhook_queue
+        topic = "arn:aws:sns:us-east-1:123456789012:ses"
+        settings.SES_SNS_TOPIC_ARNS = [topic]
+        envelope = {
+            "Type": "Notification", "TopicArn": topic, "Message": ses_notification("Delivery", "m1"),
+            "SigningCertURL": "https://sns.us-east-1.amazonaws.com/SimpleNotificationService-abc.pem",
+        }
+        with patch("logs.sns.urllib.request.urlopen", side_effect=URLError("timed out")):
+            resp = APIClient().post("/api/logs/ses-notifications/", json.dumps(envelope), content_type="text/plain")
+        assert resp.status_code == 503
+        assert len(get_webhook_queue()) == 0
+
+    def test_failed_batch_goes_back_to_the_queue(self, user):
+        from unittest.mock import patch
+        from logs.notification_queues import get_webhook_queue
+        from logs.notifications import process_batch
+        make_log(user, "sandbox", ses_message_id="m1")
+        queue = get_webhook_queue()
+        queue.push(ses_notification("Delivery", "m1"))
+        queue.push("not json")
+        with patch("logs.notifications.apply_notifications", side_effect=RuntimeError("db down")):
+            with pytest.raises(RuntimeError):
+                process_batch(queue, 100)
+        assert len(queue) == 1
+        assert process_batch(queue, 100) == (1, 0)
+        assert EmailLog.objects.get().status == "delivered"
+
+    def test_command_survives_a_failed_batch(self, settings):
+        from unittest.mock import patch
+        from django.core.management import call_command
+        stderr = io.StringIO()
+        with patch("logs.management.commands.process_ses_notifications.process_batch",
+                   side_effect=[RuntimeError("db down"), KeyboardInterrupt]), \
+                patch("logs.management.commands.process_ses_notifications.time.sleep"):
+            with pytest.raises(KeyboardInterrupt):
+                call_command("process_ses_notifications", "--source", "webhook", stdout=io.StringIO(), stderr=stderr)
+        assert "db down" in stderr.getvalue()
+
+    def test_dashboard_counts_delivered_as_sent(self, user):
+        from logs.notifications import apply_notifications, parse_notification
+        make_log(user, "sandbox", ses_message_id="m1")
+        apply_notifications([parse_notification(ses_notification("Delivery", "m1"))])
+        resp = env_client(user).get("/api/logs/dashboard-stats/")
+        assert resp.data["total_sent"] == 1
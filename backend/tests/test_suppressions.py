@@ -0,0 +1,169 @@
+"""
+Tests for the suppression list: Bloom filter, in-process index, feeding
+from bounces/complaints, the management API and trigger rejection.
+"""
+import pytest
+from rest_framework.test import APIClient
+
+from events.models import OutboxMessage
+from logs.models import EmailLog
+from suppressions.bloom import BloomFilter
+from suppressions.index import suppress, suppression_index
+from suppressions.models import Suppression
+
+from .conftest import auth_client
+
+
+class TestBloomFilter:
+    def test_no_false_negatives_and_low_false_positive_rate(self):
+        bloom = BloomFilter(capacity=2000, fp_rate=0.01)
+        members = [f"user{i}@example.com" for i in range(2000)]
+        for email in members:
+            bloom.add(email)
+        assert all(email in bloom for email in members)
+        false_positives = sum(f"other{i}@example.com" in bloom for i in range(10000))
+        assert false_positives < 300
+
+
+@pytest.mark.django_db
+class TestSuppressionIndex:
+    def test_miss_needs_no_query_after_build(self, org, django_assert_num_queries):
+        suppress(org.id, ["gone@example.com"], "manual")
+        suppression_index.suppressed(org.id, ["warmup@example.com"])
+        with django_assert_num_queries(0):
+            assert not suppression_index.is_suppressed(org.id, "fresh@example.com")
+
+    def test_hit_is_confirmed_and_normalized(self, org, other_org):
+        suppress(org.id, ["Gone@Example.com "], "manual")
+        assert suppression_index.is_suppressed(org.id, "gone@example.com")
+        assert suppression_index.is_suppressed(org.id, "GONE@example.com")
+        assert not suppression_index.is_suppressed(other_org.id, "gone@example.com")
+
+    def test_unsuppressed_address_passes_confirmation(self, org):
+        suppress(org.id, ["back@example.com"], "manual")
+        assert suppression_index.is_suppressed(org.id, "back@example.com")
+        Suppression.objects.filter(email="back@example.com").delete()
+        assert not suppression_index.is_suppressed(org.id, "back@example.com")
+
+    def test_rows_from_other_processes_are_loaded_incrementally(self, org, settings):
+        settings.SUPPRESSION_FILTER_REFRESH = 0
+        assert not suppression_index.is_suppressed(org.id, "late@example.com")
+        Suppression.objects.create(organization=org, email="late@example.com")
+        assert suppression_index.is_suppressed(org.id, "late@example.com")
+
+    def test_row_committed_behind_a_newer_id_is_loaded(self, org, settings):
+        settings.SUPPRESSION_FILTER_REFRESH = 0
+        # A higher id that committed first
+        Suppression.objects.create(id=10**6, organization=org, email="first@example.com")
+        assert not suppression_index.is_suppressed(org.id, "slow@example.com")
+        Suppression.objects.create(organization=org, email="slow@example.com")
+        assert suppression_index.is_suppressed(org.id, "slow@example.com")
+
+    def test_overlap_reads_do_not_inflate_the_filter(self, org, settings):
+        settings.SUPPRESSION_FILTER_REFRESH = 0
+        suppress(org.id, [f"u{i}@example.com" for i in range(3)], "manual")
+        for _ in range(3):
+            suppression_index.is_suppressed(org.id, "other@example.com")
+        assert suppression_index._filters[org.id].bloom.count == 3
+
+    def test_filter_is_rebuilt_periodically(self, org, settings):
+        from datetime import timedelta
+        from django.utils import timezone
+        settings.SUPPRESSION_FILTER_REFRESH = 0
+        suppress(org.id, ["seen@example.com"], "manual")
+        assert not suppression_index.is_suppressed(org.id, "old@example.com")
+        row = Suppression.objects.create(organization=org, email="old@example.com")
+        # Committed long after it was created, outside the overlap window
+        Suppression.objects.filter(pk=row.pk).update(created_at=timezone.now() - timedelta(hours=1))
+        assert not suppression_index.is_suppressed(org.id, "old@example.com")
+        settings.SUPPRESSION_FILTER_REBUILD = 0
+        assert suppression_index.is_suppressed(org.id, "old@example.com")
+
+    def test_first_build_is_sized_from_the_row_count(self, org):
+        suppress(org.id, [f"u{i}@example.com" for i in range(1500)], "manual")
+        suppression_index.is_suppressed(org.id, "other@example.com")
+        assert suppression_index._filters[org.id].bloom.capacity == 3000
+
+    def test_rows_are_read_without_the_shared_lock(self, org):
+        from unittest.mock import patch
+        fetch = suppression_index._fetch
+        held = []
+
+        def checked_fetch(*args):
+            held.append(suppression_index._lock.locked())
+            return fetch(*args)
+
+        suppress(org.id, ["gone@example.com"], "manual")
+        with patch.object(suppression_index, "_fetch", side_effect=checked_fetch):
+            assert suppression_index.is_suppressed(org.id, "gone@example.com")
+        assert held == [False]
+
+    def test_address_added_during_a_build_reaches_the_new_filter(self, org):
+        from unittest.mock import patch
+        fetch = suppression_index._fetch
+
+        def racing_fetch(*args):
+            rows = fetch(*args)
+            suppression_index.add(org.id, ["Racing@Example.com"])
+            return rows
+
+        with patch.object(suppression_index, "_fetch", side_effect=racing_fetch):
+            suppression_index.is_suppressed(org.id, "other@example.com")
+        assert "racing@example.com" in suppression_index._filters[org.id].bloom
+
+    def test_bounce_and_complaint_feed_the_list(self, user):
+        log = EmailLog.objects.create(user=user, recipient="Hard@Example.com", subject="s", status="sent")
+        log.status = "bounced"
+        log.save(update_fields=["status"])
+        suppression = Suppression.objects.get()
+        assert (suppression.email, suppression.reason, suppression.source_log_id) == \
+            ("hard@example.com", "bounce", log.id)
+
+
+@pytest.mark.django_db
+class TestSuppressionAPI:
+    def test_manual_add_list_and_delete(self, client, other_user):
+        resp = client.post("/api/suppressions/", {"email": "Manual@Example.com"}, format="json")
+        assert resp.status_code == 201
+        assert resp.data["email"] == "manual@example.com"
+        assert resp.data["reason"] == "manual"
+
+        assert auth_client(other_user).get("/api/suppressions/").data["count"] == 0
+        assert client.get("/api/suppressions/").data["count"] == 1
+
+        assert client.delete(f"/api/suppressions/{resp.data['id']}/").status_code == 204
+        assert not Suppression.objects.exists()
+
+    def test_import_reports_new_existing_and_invalid(self, client, user):
+        suppress(user.organization_id, ["old@example.com"], "bounce")
+        resp = client.post("/api/suppressions/import/", {
+            "emails": ["old@example.com", "new@example.com", "NEW@example.com", "not-an-email"],
+        }, format="json")
+        assert resp.status_code == 200
+        assert resp.data["imported"] == 1
+        assert resp.data["already_suppressed"] == 1
+        assert resp.data["invalid"] == ["not-an-email"]
+        assert Suppression.objects.count() == 2
+
+
+@pytest.mark.django_db
+class TestTriggerRejectsSuppressed:
+    def test_single_trigger_is_rejected_before_enqueue(self, sandbox_event, sandbox_api_key, user):
+        suppress(user.organization_id, ["blocked@example.com"], "complaint")
+        resp = APIClient().post("/api/events/trigger/", {
+            "event": sandbox_event.slug,
+            "recipient": "Blocked@example.com",
+        }, format="json", HTTP_X_API_KEY=sandbox_api_key)
+        assert resp.status_code == 422
+        assert not OutboxMessage.objects.exists()
+
+    def test_batch_rejects_only_suppressed_items(self, sandbox_event, sandbox_api_key, user):
+        suppress(user.organization_id, ["blocked@example.com"], "bounce")
+        resp = APIClient().post("/api/events/trigger/batch/", {
+            "items": [
+                {"event": sandbox_event.slug, "recipient": "blocked@example.com"},
+                {"event": sandbox_event.slug, "recipient": "ok@example.com"},
+            ],
+        }, format="json", HTTP_X_API_KEY=sandbox_api_key)
+        assert [r["status"] for r in resp.data["results"]] == ["error", "queued"]
+        assert OutboxMessage.objects.count() == 1
@@ -0,0 +1,482 @@
+"""
+Tests for the send_event_email worker path and the buffered log writer.
+"""
+import pytest
+from unittest.mock import MagicMock, patch
+
+from django.utils import timezone
+from events.tasks import send_event_email
+from logs.models import DeliveryRollup, EmailLog
+from logs.writer import EmailLogWriter
+
+
+def fake_ses_client(message_id="ses-msg-1"):
+    client = MagicMock()
+    client.send_raw_email.return_value = {"MessageId": message_id}
+    return client
+
+
+def run_task(event_id, recipient="to@example.com", context=None, task_id="task-1", retries=0, deferrals=0, **extra):
+    kwargs = {
+        "event_id": event_id, "recipient": recipient, "context_data": context or {}, "deferrals": deferrals, **extra,
+    }
+    send_event_email.push_request(id=task_id, retries=retries, kwargs=kwargs)
+    try:
+        return send_event_email.run(**kwargs)
+    finally:
+        send_event_email.pop_request()
+
+
+def ses_error(code, message=""):
+    from botocore.exceptions import ClientError
+    return ClientError({"Error": {"Code": code, "Message": message}}, "SendRawEmail")
+
+
+@pytest.mark.django_db
+class TestSendEventEmail:
+    def test_sent_email_is_logged(self, sandbox_event):
+        with patch("integrations.models.SESIntegration.get_cached_ses_client", return_value=fake_ses_client()):
+            run_task(sandbox_event.id, context={"name": "Anil"})
+        log = EmailLog.objects.get()
+        assert log.status == "sent"
+        assert log.ses_message_id == "ses-msg-1"
+        assert log.subject == "Hello Anil"
+        assert log.organization_id == sandbox_event.organization_id
+
+    def test_buffered_send_writes_one_row_with_final_status(self, sandbox_event, settings):
+        from logs.writer import log_writer
+        settings.EMAIL_LOG_BUFFERED = True
+        with patch("integrations.models.SESIntegration.get_cached_ses_client", return_value=fake_ses_client()):
+            run_task(sandbox_event.id)
+        assert EmailLog.objects.count() == 0
+        log_writer.flush()
+        log = EmailLog.objects.get()
+        assert log.status == "sent"
+        assert DeliveryRollup.objects.get(status="sent").count == 1
+
+    def test_duplicate_publish_is_not_sent_again(self, sandbox_event):
+        client = fake_ses_client()
+        with patch("integrations.models.SESIntegration.get_cached_ses_client", return_value=client):
+            run_task(sandbox_event.id)
+            run_task(sandbox_event.id)
+        assert client.send_raw_email.call_count == 1
+        assert EmailLog.objects.get().status == "sent"
+
+    def test_retry_takes_over_the_claim_but_a_stale_copy_does_not(self, sandbox_event):
+        from celery.exceptions import Retry
+        client = fake_ses_client()
+        client.send_raw_email.side_effect = ses_error("ServiceUnavailable")
+        with patch("integrations.models.SESIntegration.get_cached_ses_client", return_value=client), \
+                patch.object(send_event_email, "retry", side_effect=Retry()):
+            with pytest.raises(Retry):
+                run_task(sandbox_event.id)
+            client.send_raw_email.side_effect = None
+            # A late copy of the original message
+            run_task(sandbox_event.id)
+            assert client.send_raw_email.call_count == 1
+            run_task(sandbox_event.id, retries=1)
+        assert client.send_raw_email.call_count == 2
+        assert EmailLog.objects.get().status == "sent"
+
+
+@pytest.mark.django_db
+class TestEmailLogWriter:
+    def _create(self, writer, user, **fields):
+        return writer.create(**{
+            "user_id": user.id,
+            "organization_id": user.organization_id,
+            "environment": "sandbox",
+            "recipient": "r@example.com",
+            "subject": "s",
+            "status": "pending",
+            **fields,
+        })
+
+    def test_flushes_when_batch_is_full(self, user, settings):
+        settings.EMAIL_LOG_BUFFERED = True
+        settings.EMAIL_LOG_WRITER_BATCH_SIZE = 3
+        writer = EmailLogWriter()
+        for _ in range(2):
+            self._create(writer, user)
+        assert EmailLog.objects.count() == 0
+        self._create(writer, user)
+        assert EmailLog.objects.count() == 3
+        assert len(writer) == 0
+
+    def test_update_after_flush_uses_bulk_update_and_moves_rollup(self, user, settings, django_assert_num_queries):
+        settings.EMAIL_LOG_BUFFERED = True
+        writer = EmailLogWriter()
+        logs = [self._create(writer, user) for _ in range(3)]
+        writer.flush()
+        for log in logs:
+            writer.update(log, status="failed", error_message="boom")
+        # savepoint, bulk UPDATE, rollup upsert, release
+        with django_assert_num_queries(4):
+            writer.flush()
+        assert set(EmailLog.objects.values_list("status", flat=True)) == {"failed"}
+        counts = {r.status: r.count for r in DeliveryRollup.objects.all()}
+        assert counts == {"pending": 0, "failed": 3}
+
+    def test_write_through_when_unbuffered(self, user):
+        writer = EmailLogWriter()
+        log = self._create(writer, user)
+        assert log.pk is not None
+        writer.update(log, status="sent")
+        assert EmailLog.objects.get(pk=log.pk).status == "sent"
+
+    def test_failed_flush_keeps_entries(self, user, settings):
+        from django.db import OperationalError
+        settings.EMAIL_LOG_BUFFERED = True
+        writer = EmailLogWriter()
+        self._create(writer, user)
+        with patch("logs.writer.EmailLog.objects.bulk_create", side_effect=OperationalError("db down")):
+            writer.flush()
+        assert len(writer) == 1
+        writer.flush()
+        assert EmailLog.objects.count() == 1
+
+    def test_outage_buffer_is_capped(self, user, settings):
+        from django.db import OperationalError
+        settings.EMAIL_LOG_BUFFERED = True
+        settings.EMAIL_LOG_WRITER_MAX_BUFFERED = 2
+        writer = EmailLogWriter()
+        for subject in ["a", "b", "c"]:
+            self._create(writer, user, task_id=subject)
+        with patch("logs.writer.EmailLog.objects.bulk_create", side_effect=OperationalError("db down")):
+            writer.flush()
+        assert len(writer) == 2
+        writer.flush()
+        assert sorted(EmailLog.objects.values_list("task_id", flat=True)) == ["b", "c"]
+
+    def test_bad_row_is_dropped_and_the_rest_written(self, user, settings):
+        settings.EMAIL_LOG_BUFFERED = True
+        writer = EmailLogWriter()
+        self._create(writer, user, task_id="good-1")
+        self._create(writer, user, task_id="bad", recipient=None)
+        self._create(writer, user, task_id="good-2")
+        writer.flush()
+        assert len(writer) == 0
+        assert sorted(EmailLog.objects.values_list("task_id", flat=True)) == ["good-1", "good-2"]
+        assert sum(r.count for r in DeliveryRollup.objects.all()) == 2
+
+    def test_long_fields_are_clipped(self, user, settings):
+        settings.EMAIL_LOG_BUFFERED = True
+        writer = EmailLogWriter()
+        log = self._create(writer, user, task_id="t")
+        writer.update(log, subject="s" * 600, error_message="e" * 5000)
+        writer.flush()
+        log = EmailLog.objects.get()
+        assert len(log.subject) == 500
+        assert len(log.error_message) == 2000
+
+
+@pytest.mark.django_db
+class TestSendRateGovernance:
+    def test_over_rate_send_is_requeued_without_a_log(self, sandbox_event, settings):
+        from celery.exceptions import Retry
+        settings.SES_GOVERNOR_MAX_WAIT = 0
+        sandbox_event.integration.max_send_rate = 1
+        sandbox_event.integration.save()
+        client = fake_ses_client()
+        with patch("integrations.models.SESIntegration.get_cached_ses_client", return_value=client):
+            run_task(sandbox_event.id)
+            with pytest.raises(Retry):
+                run_task(sandbox_event.id, task_id="task-2")
+        assert client.send_raw_email.call_count == 1
+        assert EmailLog.objects.count() == 1
+
+    def test_deferrals_do_not_use_up_retries(self, sandbox_event):
+        from celery.exceptions import Retry
+        client = fake_ses_client()
+        client.send_raw_email.side_effect = ConnectionError("reset")
+        # Three earlier runs, all of them throttling deferrals
+        send_event_email.push_request(id="task-1", retries=3, kwargs={})
+        try:
+            with patch("integrations.models.SESIntegration.get_cached_ses_client", return_value=client), \
+                    patch.object(send_event_email, "retry", side_effect=Retry()) as retry:
+                with pytest.raises(Retry):
+                    send_event_email.run(sandbox_event.id, "to@example.com", {}, deferrals=3)
+        finally:
+            send_event_email.pop_request()
+        retry.assert_called_once()
+
+    def test_governor_waits_have_their_own_counter(self, sandbox_event, settings):
+        from celery.exceptions import Retry
+        settings.SES_GOVERNOR_MAX_WAIT = 0
+        sandbox_event.integration.max_send_rate = 1
+        sandbox_event.integration.save()
+        with patch("integrations.models.SESIntegration.get_cached_ses_client", return_value=fake_ses_client()):
+            run_task(sandbox_event.id)
+            with patch.object(send_event_email, "retry", side_effect=Retry()) as retry, pytest.raises(Retry):
+                run_task(sandbox_event.id, task_id="task-2", retries=2, deferrals=2, governor_waits=2)
+        kwargs = retry.call_args.kwargs["kwargs"]
+        assert kwargs["governor_waits"] == 3
+        assert kwargs["deferrals"] == 2
+
+    def test_send_fails_after_max_governor_waits(self, sandbox_event, settings):
+        settings.SES_GOVERNOR_MAX_WAIT = 0
+        settings.SEND_MAX_GOVERNOR_WAITS = 3
+        sandbox_event.integration.max_send_rate = 1
+        sandbox_event.integration.save()
+        client = fake_ses_client()
+        with patch("integrations.models.SESIntegration.get_cached_ses_client", return_value=client):
+            run_task(sandbox_event.id)
+            run_task(sandbox_event.id, task_id="task-2", retries=3, governor_waits=3)
+        assert client.send_raw_email.call_count == 1
+        log = EmailLog.objects.get(task_id="task-2")
+        assert log.status == "failed"
+        assert "No send slot" in log.error_message
+
+    def test_throttle_after_governor_waits_still_defers(self, sandbox_event, settings):
+        from celery.exceptions import Retry
+        settings.SEND_MAX_GOVERNOR_WAITS = 3
+        client = fake_ses_client()
+        client.send_raw_email.side_effect = ses_error("Throttling", "Maximum sending rate exceeded.")
+        with patch("integrations.models.SESIntegration.get_cached_ses_client", return_value=client), \
+                patch.object(send_event_email, "retry", side_effect=Retry()) as retry, pytest.raises(Retry):
+            run_task(sandbox_event.id, retries=3, governor_waits=3)
+        kwargs = retry.call_args.kwargs["kwargs"]
+        assert kwargs["deferrals"] == 1
+        assert kwargs["governor_waits"] == 3
+        assert EmailLog.objects.get().status == "pending"
+
+    def test_governor_outage_sends_ungoverned(self, sandbox_event):
+        client = fake_ses_client()
+        with patch("integrations.models.SESIntegration.get_cached_ses_client", return_value=client), \
+                patch("integrations.governor.MemorySendRateGovernor.acquire", side_effect=ConnectionError("down")):
+            run_task(sandbox_event.id)
+        assert client.send_raw_email.call_count == 1
+        assert EmailLog.objects.get().status == "sent"
+
+    def test_throttling_error_lowers_rate(self, sandbox_event):
+        from botocore.exceptions import ClientError
+        from integrations.governor import get_send_governor
+        client = fake_ses_client()
+        client.send_raw_email.side_effect = ClientError(
+            {"Error": {"Code": "Throttling", "Message": "Maximum sending rate exceeded."}}, "SendRawEmail",
+        )
+        with patch("integrations.models.SESIntegration.get_cached_ses_client", return_value=client):
+            # Called directly, retry() re-raises the original error
+            with pytest.raises(ClientError):
+                run_task(sandbox_event.id)
+        governor = get_send_governor()
+        assert governor._factors[sandbox_event.integration_id][0] < 1.0
+
+
+class TestClassifySendError:
+    def test_botocore_codes(self):
+        from events.errors import PERMANENT, THROTTLED, TRANSIENT, classify_send_error
+        assert classify_send_error(ses_error("MessageRejected")) == PERMANENT
+        assert classify_send_error(ses_error("MailFromDomainNotVerifiedException")) == PERMANENT
+        assert classify_send_error(ses_error("Throttling", "Maximum sending rate exceeded.")) == THROTTLED
+        assert classify_send_error(ses_error("Throttling", "Daily message quota exceeded.")) == TRANSIENT
+        assert classify_send_error(ses_error("ServiceUnavailable")) == TRANSIENT
+
+    def test_local_failures(self):
+        from botocore.exceptions import EndpointConnectionError, NoCredentialsError
+        from cryptography.fernet import InvalidToken
+        from events.errors import PERMANENT, TRANSIENT, PermanentSendError, classify_send_error
+        assert classify_send_error(PermanentSendError("no template")) == PERMANENT
+        assert classify_send_error(InvalidToken()) == PERMANENT
+        assert classify_send_error(NoCredentialsError()) == PERMANENT
+        assert classify_send_error(EndpointConnectionError(endpoint_url="https://email")) == TRANSIENT
+        assert classify_send_error(ConnectionResetError()) == TRANSIENT
+
+    def test_backoff_is_capped_and_jittered(self):
+        from events.errors import backoff_delay
+        delays = [backoff_delay(10, base=10, cap=600) for _ in range(50)]
+        assert all(0 <= d <= 600 for d in delays)
+        assert len(set(delays)) > 1
+
+
+@pytest.mark.django_db
+class TestSendRetries:
+    def _run_with_client(self, event, client, **kwargs):
+        from celery.exceptions import Retry
+        with patch("integrations.models.SESIntegration.get_cached_ses_client", return_value=client), \
+                patch.object(send_event_email, "retry", side_effect=Retry()) as retry:
+            try:
+                run_task(event.id, **kwargs)
+            except Retry:
+                pass
+        return retry
+
+    def test_permanent_error_fails_without_retry(self, sandbox_event):
+        client = fake_ses_client()
+        client.send_raw_email.side_effect = ses_error("MessageRejected", "Email address is not verified.")
+        retry = self._run_with_client(sandbox_event, client)
+        retry.assert_not_called()
+        log = EmailLog.objects.get()
+        assert log.status == "failed"
+        assert "not verified" in log.error_message
+
+    def test_missing_template_fails_without_sending(self, sandbox_event):
+        sandbox_event.template = None
+        sandbox_event.save()
+        client = fake_ses_client()
+        retry = self._run_with_client(sandbox_event, client)
+        retry.assert_not_called()
+        client.send_raw_email.assert_not_called()
+        assert EmailLog.objects.get().status == "failed"
+
+    def test_transient_error_retries_with_backoff(self, sandbox_event, settings):
+        settings.SEND_RETRY_BACKOFF_BASE = 10
+        client = fake_ses_client()
+        client.send_raw_email.side_effect = ses_error("ServiceUnavailable")
+        retry = self._run_with_client(sandbox_event, client, retries=2)
+        assert 0 <= retry.call_args.kwargs["countdown"] <= 40
+
+    def test_transient_error_stops_when_budget_is_spent(self, sandbox_event, settings):
+        settings.SEND_MAX_RETRIES = 3
+        client = fake_ses_client()
+        client.send_raw_email.side_effect = ses_error("ServiceUnavailable")
+        retry = self._run_with_client(sandbox_event, client, retries=3)
+        retry.assert_not_called()
+        assert EmailLog.objects.get().status == "failed"
+
+    def test_log_failure_after_send_does_not_retry(self, sandbox_event):
+        client = fake_ses_client()
+        with patch("logs.writer.log_writer.update", side_effect=ConnectionError("db down")):
+            retry = self._run_with_client(sandbox_event, client)
+        retry.assert_not_called()
+        assert client.send_raw_email.call_count == 1
+        # The claim is finished, so a redelivered copy is skipped
+        self._run_with_client(sandbox_event, client)
+        assert client.send_raw_email.call_count == 1
+
+    def test_throttling_does_not_consume_retry_budget(self, sandbox_event, settings):
+        settings.SEND_MAX_RETRIES = 3
+        client = fake_ses_client()
+        client.send_raw_email.side_effect = ses_error("ServiceUnavailable")
+        # Five earlier retries, all of them throttle deferrals
+        retry = self._run_with_client(sandbox_event, client, retries=5, deferrals=5)
+        retry.assert_called_once()
+
+        client.send_raw_email.side_effect = ses_error("Throttling", "Maximum sending rate exceeded.")
+        retry = self._run_with_client(sandbox_event, client, retries=5, deferrals=0, task_id="task-2")
+        assert retry.call_args.kwargs["kwargs"]["deferrals"] == 1
+
+
+@pytest.mark.django_db
+class TestDeliveryAttempts:
+    def _attempt(self, event, client, **kwargs):
+        from celery.exceptions import Retry
+        with patch("integrations.models.SESIntegration.get_cached_ses_client", return_value=client), \
+                patch.object(send_event_email, "retry", side_effect=Retry()):
+            try:
+                run_task(event.id, **kwargs)
+            except Retry:
+                pass
+
+    def test_retries_reuse_one_log_row(self, sandbox_event):
+        from logs.models import DeliveryAttempt
+        client = fake_ses_client()
+        client.send_raw_email.side_effect = ses_error("ServiceUnavailable")
+        self._attempt(sandbox_event, client)
+        assert EmailLog.objects.get().status == "pending"
+
+        client.send_raw_email.side_effect = None
+        self._attempt(sandbox_event, client, retries=1)
+
+        log = EmailLog.objects.get()
+        assert log.status == "sent"
+        assert log.attempts == 2
+        assert log.task_id == "task-1"
+        assert log.error_message == ""
+        attempts = list(DeliveryAttempt.objects.filter(log=log))
+        assert [(a.attempt, a.error_code) for a in attempts] == [(1, "ServiceUnavailable"), (2, "")]
+        assert all(a.finished_at >= a.started_at for a in attempts)
+        assert DeliveryRollup.objects.get(status="sent").count == 1
+        assert not DeliveryRollup.objects.filter(status="pending", count__gt=0).exists()
+
+    def test_buffered_retries_reuse_one_log_row(self, sandbox_event, settings):
+        from logs.models import DeliveryAttempt
+        from logs.writer import log_writer
+        settings.EMAIL_LOG_BUFFERED = True
+        client = fake_ses_client()
+        client.send_raw_email.side_effect = ses_error("ServiceUnavailable")
+        self._attempt(sandbox_event, client)
+        self._attempt(sandbox_event, client, retries=1)
+        log_writer.flush()
+        client.send_raw_email.side_effect = None
+        self._attempt(sandbox_event, client, retries=2)
+        log_writer.flush()
+
+        log = EmailLog.objects.get()
+        assert (log.status, log.attempts) == ("sent", 3)
+        assert DeliveryAttempt.objects.filter(log=log).count() == 3
+
+    def test_buffered_insert_merges_into_existing_row(self, sandbox_event, settings):
+        from logs.writer import log_writer
+        fields = dict(
+            user_id=sandbox_event.user_id, environment="sandbox", recipient="to@example.com", subject="s",
+        )
+        first = log_writer.get_or_create("task-9", **fields)
+        settings.EMAIL_LOG_BUFFERED = True
+        again = log_writer.get_or_create("task-9", maybe_exists=False, **fields)
+        log_writer.update(again, status="sent")
+        log_writer.flush()
+        assert EmailLog.objects.get().pk == first.pk == again.pk
+        assert EmailLog.objects.get().status == "sent"
+        counts = {r.status: r.count for r in DeliveryRollup.objects.all()}
+        assert counts == {"pending": 0, "sent": 1}
+
+    def test_stale_attempt_number_is_moved_past_stored_attempts(self, sandbox_event, settings):
+        from logs.models import DeliveryAttempt
+        from logs.writer import log_writer
+        fields = dict(
+            user_id=sandbox_event.user_id, environment="sandbox", recipient="to@example.com", subject="s",
+        )
+        now = timezone.now()
+        timing = dict(started_at=now, finished_at=now, latency_ms=0)
+        first = log_writer.get_or_create("task-9", **fields)
+        log_writer.record_attempt(first, attempt=1, **timing)
+        settings.EMAIL_LOG_BUFFERED = True
+        # Another worker that never saw the stored row
+        again = log_writer.get_or_create("task-9", maybe_exists=False, **fields)
+        log_writer.record_attempt(again, attempt=1, error_code="Throttling", **timing)
+        log_writer.update(again, attempts=1)
+        log_writer.flush()
+        attempts = DeliveryAttempt.objects.filter(log=first)
+        assert [(a.attempt, a.error_code) for a in attempts] == [(1, ""), (2, "Throttling")]
+        assert EmailLog.objects.get().attempts == 2
+
+
+@pytest.mark.django_db
+class TestSendPlans:
+    def _send(self, plan, task_id="task-1"):
+        kwargs = {"event_id": plan["event"][0], "recipient": "to@example.com", "context_data": {}, "plan": plan}
+        send_event_email.push_request(id=task_id, retries=0, kwargs=kwargs)
+        try:
+            with patch("integrations.models.SESIntegration.get_cached_ses_client", return_value=fake_ses_client()):
+                send_event_email.run(**kwargs)
+        finally:
+            send_event_email.pop_request()
+
+    def test_warm_worker_skips_config_queries(self, sandbox_event):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from events.plans import build_send_plan
+        plan = build_send_plan(sandbox_event)
+        self._send(plan)
+        with CaptureQueriesContext(connection) as queries:
+            self._send(plan, task_id="task-2")
+        tables = ("events_event", "templates_app_emailtemplate", "integrations_sesintegration")
+        assert not [q for q in queries if any(f'FROM "{t}"' in q["sql"] for t in tables)]
+        assert EmailLog.objects.filter(status="sent", event=sandbox_event).count() == 2
+
+    def test_newer_version_is_reloaded(self, sandbox_event):
+        from events.plans import build_send_plan
+        self._send(build_send_plan(sandbox_event))
+        template = sandbox_event.template
+        template.subject = "Updated {{name}}"
+        template.save()
+        self._send(build_send_plan(sandbox_event), task_id="task-2")
+        assert EmailLog.objects.get(task_id="task-2").subject.startswith("Updated")
+
+    def test_deleted_event_is_skipped(self, sandbox_event):
+        from events.plans import build_send_plan
+        plan = build_send_plan(sandbox_event)
+        sandbox_event.delete()
+        self._send(plan)
+        assert not EmailLog.objects.exists()
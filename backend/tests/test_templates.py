@@ -149,3 +149,72 @@ class TestTemplatePreview:
             "context": {}
         }, format="json")
         assert resp.status_code == 200
+
+
+class TestCompiledTemplate:
+    def test_segments_alternate_literals_and_slots(self):
+        from templates_app.compiler import CompiledText
+        compiled = CompiledText("Hi {{name}}, order {{order_id}}!")
+        assert compiled.segments == ["Hi ", "name", ", order ", "order_id", "!"]
+        assert compiled.names == ["name", "order_id"]
+
+    def test_unknown_placeholders_left_in_place(self):
+        from templates_app.compiler import CompiledText
+        assert CompiledText("{{a}} {{b}}").render({"a": 1}) == "1 {{b}}"
+
+    def test_values_are_not_re_expanded(self):
+        from templates_app.compiler import CompiledText
+        assert CompiledText("{{a}}{{b}}").render({"a": "{{b}}", "b": "x"}) == "{{b}}x"
+
+
+@pytest.mark.django_db
+class TestCompiledTemplateCache:
+    def test_render_compiles_once_per_version(self, sandbox_template):
+        from unittest.mock import patch
+        from templates_app import compiler
+        with patch.object(compiler, "CompiledTemplate", wraps=compiler.CompiledTemplate) as spy:
+            assert sandbox_template.render({"name": "A"}) == ("Hello A", "<p>Hi A, welcome!</p>")
+            assert sandbox_template.render({"name": "B"}) == ("Hello B", "<p>Hi B, welcome!</p>")
+        assert spy.call_count == 1
+
+    def test_saved_change_recompiles(self, sandbox_template):
+        sandbox_template.render({"name": "A"})
+        sandbox_template.subject = "Bye {{name}}"
+        sandbox_template.save()
+        assert sandbox_template.render({"name": "A"})[0] == "Bye A"
+
+    def test_defaults_fill_missing_context(self, sandbox_template):
+        sandbox_template.placeholders = [{"name": "name", "default_value": "friend"}]
+        assert sandbox_template.render({})[0] == "Hello friend"
+
+
+@pytest.mark.django_db
+class TestRenderMany:
+    def test_render_many_is_lazy_generator(self, sandbox_template):
+        import types
+        rendered = sandbox_template.render_many({"name": n} for n in ["A", "B"])
+        assert isinstance(rendered, types.GeneratorType)
+        assert list(rendered) == [
+            ("Hello A", "<p>Hi A, welcome!</p>"),
+            ("Hello B", "<p>Hi B, welcome!</p>"),
+        ]
+
+    def test_render_many_resolves_defaults_once(self, sandbox_template):
+        from unittest.mock import patch
+        with patch.object(type(sandbox_template), "_get_defaults_map", return_value={"name": "friend"}) as spy:
+            results = list(sandbox_template.render_many([{}, {"name": "B"}, {}]))
+        assert spy.call_count == 1
+        assert [subject for subject, _ in results] == ["Hello friend", "Hello B", "Hello friend"]
+
+    def test_preview_many_endpoint(self, client, sandbox_template):
+        resp = client.post(f"/api/templates/{sandbox_template.id}/preview-many/", {
+            "contexts": [{"name": "A"}, {"name": "B"}],
+        }, format="json")
+        assert resp.status_code == 200
+        assert [r["subject"] for r in resp.data["results"]] == ["Hello A", "Hello B"]
+
+    def test_preview_many_requires_contexts(self, client, sandbox_template):
+        resp = client.post(f"/api/templates/{sandbox_template.id}/preview-many/", {
+            "contexts": [],
+        }, format="json")
+        assert resp.status_code == 400
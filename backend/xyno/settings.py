@@ -19,6 +19,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'whitenoise.runserver_nostatic',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     # Third party
     'rest_framework',
     'rest_framework_simplejwt',
@@ -32,6 +33,7 @@ INSTALLED_APPS = [
     'events',
     'logs',
     'brand_components',
+    'suppressions',
 ]
 
 MIDDLEWARE = [
@@ -91,6 +93,7 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
+MEDIA_ROOT = config('MEDIA_ROOT', default=str(BASE_DIR / 'media'))
 STORAGES = {
     "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
     "staticfiles": {"BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage"},
@@ -103,7 +106,7 @@ AUTH_USER_MODEL = 'accounts.User'
 # REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.CachedJWTAuthentication',
         'accounts.authentication.APIKeyAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
@@ -149,9 +152,20 @@ CSRF_TRUSTED_ORIGINS = config(
 USE_X_FORWARDED_HOST = True
 SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
 
+REDIS_URL = config('REDIS_URL', default='redis://localhost:6379/0')
+
+# Cache (shared across web and worker processes, used for cross-process
+# invalidation counters and short-lived coordination keys)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': config('CACHE_URL', default=REDIS_URL),
+    }
+}
+
 # Celery
-CELERY_BROKER_URL = config('REDIS_URL', default='redis://localhost:6379/0')
-CELERY_RESULT_BACKEND = config('REDIS_URL', default='redis://localhost:6379/0')
+CELERY_BROKER_URL = REDIS_URL
+CELERY_RESULT_BACKEND = REDIS_URL
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
@@ -159,6 +173,127 @@ CELERY_BROKER_TRANSPORT_OPTIONS = {
     'socket_keepalive': True,
     'retry_on_timeout': True,
 }
+# Send tasks go to per-lane queues (events/lanes.py). Workers take one
+# message at a time so a busy worker does not hold others' sends.
+CELERY_TASK_ROUTES = ('events.lanes.route_task',)
+CELERY_WORKER_PREFETCH_MULTIPLIER = config('CELERY_WORKER_PREFETCH_MULTIPLIER', default=1, cast=int)
+
+# Request authentication caches (accounts/cache.py) and API key usage (accounts/usage.py)
+API_KEY_CACHE_TTL = config('API_KEY_CACHE_TTL', default=60, cast=int)
+API_KEY_CACHE_MAX_SIZE = config('API_KEY_CACHE_MAX_SIZE', default=10000, cast=int)
+API_KEY_USAGE_FLUSH_INTERVAL = config('API_KEY_USAGE_FLUSH_INTERVAL', default=10.0, cast=float)
+USER_CACHE_TTL = config('USER_CACHE_TTL', default=60, cast=int)
+USER_CACHE_MAX_SIZE = config('USER_CACHE_MAX_SIZE', default=10000, cast=int)
+
+# Trigger rate limits per API key and organization (accounts/ratelimit.py); 0 means unlimited
+INGEST_RATE_LIMIT_ENABLED = config('INGEST_RATE_LIMIT_ENABLED', default=True, cast=bool)
+INGEST_RATE_LIMIT_BACKEND = config('INGEST_RATE_LIMIT_BACKEND', default='redis')  # 'redis' or 'memory'
+INGEST_RATE_LIMIT_PERIOD = config('INGEST_RATE_LIMIT_PERIOD', default=60, cast=int)
+INGEST_RATE_LIMIT_PER_KEY = config('INGEST_RATE_LIMIT_PER_KEY', default=6000, cast=int)
+INGEST_RATE_LIMIT_PER_ORG = config('INGEST_RATE_LIMIT_PER_ORG', default=30000, cast=int)
+
+# Event trigger
+TRIGGER_BATCH_MAX_SIZE = config('TRIGGER_BATCH_MAX_SIZE', default=1000, cast=int)
+EVENT_CACHE_MAX_SIZE = config('EVENT_CACHE_MAX_SIZE', default=5000, cast=int)
+EVENT_CACHE_TTL = config('EVENT_CACHE_TTL', default=300, cast=int)
+
+# Template rendering
+TEMPLATE_COMPILE_CACHE_SIZE = config('TEMPLATE_COMPILE_CACHE_SIZE', default=256, cast=int)
+TEMPLATE_PREVIEW_MAX_CONTEXTS = config('TEMPLATE_PREVIEW_MAX_CONTEXTS', default=100, cast=int)
+
+# SES clients (cached per worker process)
+SES_CLIENT_CACHE_SIZE = config('SES_CLIENT_CACHE_SIZE', default=64, cast=int)
+SES_CLIENT_POOL_CONNECTIONS = config('SES_CLIENT_POOL_CONNECTIONS', default=10, cast=int)
+
+# SES send-rate governor
+SES_GOVERNOR_BACKEND = config('SES_GOVERNOR_BACKEND', default='redis')  # 'redis' or 'memory'
+SES_GOVERNOR_MAX_WAIT = config('SES_GOVERNOR_MAX_WAIT', default=1.0, cast=float)
+SES_DEFAULT_SEND_RATE = config('SES_DEFAULT_SEND_RATE', default=1.0, cast=float)
+SES_QUOTA_CACHE_TTL = config('SES_QUOTA_CACHE_TTL', default=3600, cast=int)
+SES_THROTTLE_DECREASE = config('SES_THROTTLE_DECREASE', default=0.7, cast=float)
+SES_RATE_RECOVERY_PER_SEC = config('SES_RATE_RECOVERY_PER_SEC', default=0.01, cast=float)
+SES_RATE_MIN_FACTOR = config('SES_RATE_MIN_FACTOR', default=0.1, cast=float)
+
+# Transactional outbox (events/outbox.py); run `manage.py relay_outbox` alongside workers
+EVENT_OUTBOX_ENABLED = config('EVENT_OUTBOX_ENABLED', default=True, cast=bool)
+OUTBOX_RELAY_BATCH_SIZE = config('OUTBOX_RELAY_BATCH_SIZE', default=500, cast=int)
+OUTBOX_RELAY_INTERVAL = config('OUTBOX_RELAY_INTERVAL', default=0.2, cast=float)
+OUTBOX_RETENTION_HOURS = config('OUTBOX_RETENTION_HOURS', default=24, cast=int)
+OUTBOX_FAILED_RETENTION_HOURS = config('OUTBOX_FAILED_RETENTION_HOURS', default=168, cast=int)
+OUTBOX_PRUNE_INTERVAL = config('OUTBOX_PRUNE_INTERVAL', default=3600, cast=int)
+
+# Scheduled sends (events/scheduler.py); run `manage.py dispatch_scheduled` alongside the relay
+SCHEDULED_SEND_BATCH_SIZE = config('SCHEDULED_SEND_BATCH_SIZE', default=1000, cast=int)
+SCHEDULED_SEND_INTERVAL = config('SCHEDULED_SEND_INTERVAL', default=1.0, cast=float)
+SCHEDULED_SEND_MAX_AHEAD_DAYS = config('SCHEDULED_SEND_MAX_AHEAD_DAYS', default=365, cast=int)
+SCHEDULED_SEND_RETENTION_DAYS = config('SCHEDULED_SEND_RETENTION_DAYS', default=7, cast=int)
+
+# Suppression list membership filter (suppressions/index.py)
+SUPPRESSION_FILTER_FP_RATE = config('SUPPRESSION_FILTER_FP_RATE', default=0.001, cast=float)
+SUPPRESSION_FILTER_REFRESH = config('SUPPRESSION_FILTER_REFRESH', default=5.0, cast=float)
+SUPPRESSION_FILTER_OVERLAP = config('SUPPRESSION_FILTER_OVERLAP', default=60.0, cast=float)
+SUPPRESSION_FILTER_REBUILD = config('SUPPRESSION_FILTER_REBUILD', default=900.0, cast=float)
+
+# Idempotency-Key on the trigger endpoint (events/idempotency.py)
+IDEMPOTENCY_KEY_TTL = config('IDEMPOTENCY_KEY_TTL', default=86400, cast=int)
+
+# Send plans (events/plans.py): enqueue ids + versions so workers skip the Event query
+SEND_PLAN_PAYLOADS = config('SEND_PLAN_PAYLOADS', default=True, cast=bool)
+SEND_PLAN_CACHE_SIZE = config('SEND_PLAN_CACHE_SIZE', default=2048, cast=int)
+
+# Send retries (events/errors.py)
+SEND_MAX_RETRIES = config('SEND_MAX_RETRIES', default=5, cast=int)
+SEND_RETRY_BACKOFF_BASE = config('SEND_RETRY_BACKOFF_BASE', default=10.0, cast=float)
+SEND_RETRY_BACKOFF_MAX = config('SEND_RETRY_BACKOFF_MAX', default=600.0, cast=float)
+SEND_THROTTLE_BACKOFF_BASE = config('SEND_THROTTLE_BACKOFF_BASE', default=1.0, cast=float)
+SEND_THROTTLE_BACKOFF_MAX = config('SEND_THROTTLE_BACKOFF_MAX', default=60.0, cast=float)
+SEND_MAX_DEFERRALS = config('SEND_MAX_DEFERRALS', default=100, cast=int)
+SEND_MAX_GOVERNOR_WAITS = config('SEND_MAX_GOVERNOR_WAITS', default=100, cast=int)
+
+# Per-task-id send claims (events/send_claims.py) that skip duplicate publishes
+SEND_CLAIM_LEASE = config('SEND_CLAIM_LEASE', default=300, cast=int)
+SEND_CLAIM_TTL = config('SEND_CLAIM_TTL', default=86400, cast=int)
+
+# SES notifications (logs/notifications.py)
+SES_NOTIFICATION_BACKEND = config('SES_NOTIFICATION_BACKEND', default='redis')  # webhook queue: 'redis' or 'memory'
+SES_NOTIFICATION_QUEUE_URL = config('SES_NOTIFICATION_QUEUE_URL', default='')  # optional SQS queue
+SES_NOTIFICATION_SQS_REGION = config('SES_NOTIFICATION_SQS_REGION', default='')  # empty: boto3's default region
+SES_NOTIFICATION_SQS_ENDPOINT_URL = config('SES_NOTIFICATION_SQS_ENDPOINT_URL', default='')  # e.g. a VPC endpoint
+SES_NOTIFICATION_BATCH_SIZE = config('SES_NOTIFICATION_BATCH_SIZE', default=1000, cast=int)
+SES_NOTIFICATION_MAX_ATTEMPTS = config('SES_NOTIFICATION_MAX_ATTEMPTS', default=10, cast=int)
+SES_NOTIFICATION_RETRY_BASE = config('SES_NOTIFICATION_RETRY_BASE', default=2.0, cast=float)
+SES_NOTIFICATION_RETRY_MAX = config('SES_NOTIFICATION_RETRY_MAX', default=300.0, cast=float)
+SES_NOTIFICATION_VISIBILITY_TIMEOUT = config('SES_NOTIFICATION_VISIBILITY_TIMEOUT', default=300, cast=int)
+SES_SNS_VERIFY_SIGNATURE = config('SES_SNS_VERIFY_SIGNATURE', default=True, cast=bool)
+SES_SNS_TOPIC_ARNS = config('SES_SNS_TOPIC_ARNS', default='', cast=Csv())  # required while SES_SNS_VERIFY_SIGNATURE is on
+
+# Send lanes (events/lanes.py)
+SEND_TRANSACTIONAL_QUEUE = config('SEND_TRANSACTIONAL_QUEUE', default='send-transactional')
+SEND_BULK_QUEUE = config('SEND_BULK_QUEUE', default='send-bulk')
+SEND_LANE_METRICS_BACKEND = config('SEND_LANE_METRICS_BACKEND', default='redis')  # 'redis' or 'memory'
+SEND_LANE_WAIT_SAMPLES = config('SEND_LANE_WAIT_SAMPLES', default=1000, cast=int)
+
+# Per-organization fair queuing (events/fair_queue.py); run `manage.py dispatch_sends` alongside workers
+FAIR_QUEUE_ENABLED = config('FAIR_QUEUE_ENABLED', default=True, cast=bool)
+FAIR_QUEUE_BACKEND = config('FAIR_QUEUE_BACKEND', default='redis')  # 'redis' or 'memory'
+FAIR_QUEUE_QUANTUM = config('FAIR_QUEUE_QUANTUM', default=10, cast=int)
+FAIR_QUEUE_MAX_IN_FLIGHT = config('FAIR_QUEUE_MAX_IN_FLIGHT', default=100, cast=int)
+FAIR_QUEUE_INFLIGHT_TIMEOUT = config('FAIR_QUEUE_INFLIGHT_TIMEOUT', default=900, cast=int)
+FAIR_QUEUE_SETTINGS_TTL = config('FAIR_QUEUE_SETTINGS_TTL', default=10, cast=int)
+FAIR_QUEUE_DISPATCH_INTERVAL = config('FAIR_QUEUE_DISPATCH_INTERVAL', default=0.05, cast=float)
+
+# Send jobs (events/jobs.py): audience uploads fanned out by the run_send_job task
+SEND_JOB_PROGRESS_BACKEND = config('SEND_JOB_PROGRESS_BACKEND', default='redis')  # 'redis' or 'memory'
+SEND_JOB_PROGRESS_TTL = config('SEND_JOB_PROGRESS_TTL', default=7 * 86400, cast=int)
+SEND_JOB_CHUNK_SIZE = config('SEND_JOB_CHUNK_SIZE', default=1000, cast=int)
+SEND_JOB_MAX_UPLOAD_SIZE = config('SEND_JOB_MAX_UPLOAD_SIZE', default=512 * 1024 * 1024, cast=int)
+SEND_JOB_MAX_ERRORS = config('SEND_JOB_MAX_ERRORS', default=100, cast=int)
+
+# Email log writer (buffered bulk writes in Celery workers)
+EMAIL_LOG_BUFFERED = config('EMAIL_LOG_BUFFERED', default=True, cast=bool)
+EMAIL_LOG_WRITER_BATCH_SIZE = config('EMAIL_LOG_WRITER_BATCH_SIZE', default=200, cast=int)
+EMAIL_LOG_WRITER_MAX_DELAY = config('EMAIL_LOG_WRITER_MAX_DELAY', default=2.0, cast=float)
+EMAIL_LOG_WRITER_MAX_BUFFERED = config('EMAIL_LOG_WRITER_MAX_BUFFERED', default=10000, cast=int)
 
 # Encryption
 FERNET_KEY = config('FERNET_KEY', default='')
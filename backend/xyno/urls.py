@@ -18,5 +18,6 @@ urlpatterns = [
     path('api/events/', include('events.urls')),
     path('api/logs/', include('logs.urls')),
     path('api/brand-components/', include('brand_components.urls')),
+    path('api/suppressions/', include('suppressions.urls')),
     path('api/media/upload/', MediaUploadView.as_view(), name='media-upload'),
 ]